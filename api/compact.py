@@ -0,0 +1,201 @@
+import gzip
+import json
+import os
+from typing import Any, Dict, List, Optional, Sequence
+
+from fastapi import Request, Response
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# /ordering, /inserting 의 압축 응답 형식 (format="compact").
+# 문제마다 안내문, 보기 다섯 줄, 지문을 되풀이하는 대신 문장 목록과 문구(template)를 한 번만 보내고
+# 문제마다 작은 정수 배열만 보낸다. expand() 로 full 형식과 글자 하나 다르지 않은 문제 목록을 다시 만든다.
+#
+#   ordering:  problems[i] = [덩어리1 문장 수, 덩어리2, 덩어리3, 덩어리4, 정답 번호(1~5)]
+#              덩어리1 이 주어진 글, 2~4 가 정답 배치(template.perms[정답-1])대로 (A)(B)(C) 가 된다.
+#   inserting: problems[i] = [주어진 문장 번호, 보기 ① 앞 문장 번호, 정답 번호(1~5)]  (문장 번호는 0부터)
+#
+# 본문 인코딩은 Accept 로 고른다: application/msgpack 을 받아들이고 msgpack 이 설치되어 있으면 MessagePack,
+# 아니면 JSON. Accept-Encoding 에 따라 br(brotli 설치 시) 또는 gzip 으로 압축한다 (COMPRESS_MIN_BYTES 이상일 때).
+# expand/decode 는 api 의 다른 모듈에 기대지 않으므로 파이썬 클라이언트에서도 이 모듈을 불러 쓸 수 있다.
+
+COMPACT_VERSION = 1
+MSGPACK_TYPES = ("application/msgpack", "application/x-msgpack", "application/vnd.msgpack")
+COMPRESS_MIN_BYTES = int(os.getenv("COMPRESS_MIN_BYTES", "1024"))
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "6"))
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", "5"))
+# negotiated_response 의 표현을 고르는 요청 헤더 (304 에도 같은 값을 보낸다)
+VARY = "Accept, Accept-Encoding"
+
+def compact_payload(
+    kind: str,
+    generator_version: str,
+    sentences: Sequence[str],
+    template: Optional[Dict[str, Any]] = None,
+    problems: Optional[List[List[int]]] = None,
+    error: Optional[str] = None,
+) -> Dict[str, Any]:
+    data: Dict[str, Any] = {
+        "format": "compact",
+        "compact_version": COMPACT_VERSION,
+        "kind": kind,
+        "generator_version": generator_version,
+    }
+    if error is not None:
+        data["error"] = error
+        return data
+    data["sentences"] = list(sentences)
+    data["template"] = template
+    data["problems"] = problems
+    return data
+
+# ---------------------------------------------------------------- 펼치기 (클라이언트)
+
+def _joiner(sentences: Sequence[str]):
+    text = " ".join(sentences)
+    starts, pos = [], 0
+    for sentence in sentences:
+        starts.append(pos)
+        pos += len(sentence) + 1
+    starts.append(pos)
+    return lambda a, b: text[starts[a]:starts[b] - 1] if a < b else ""
+
+def expand_ordering(data: Dict[str, Any]) -> List[Dict[str, Any]]:
+    sentences, template = data["sentences"], data["template"]
+    join = _joiner(sentences)
+    results = []
+    for i, (s1, s2, s3, s4, answer) in enumerate(data["problems"]):
+        o, p, q, r = join(0, s1), join(s1, s1 + s2), join(s1 + s2, s1 + s2 + s3), join(s1 + s2 + s3, s1 + s2 + s3 + s4)
+        la, lb, lc = template["perms"][answer - 1]
+        labels = {la: p, lb: q, lc: r}
+        lines = [
+            template["header"],
+            o + "\n",
+            f"(A) {labels['a']}",
+            f"(B) {labels['b']}",
+            f"(C) {labels['c']}\n",
+            *template["choices"],
+        ]
+        results.append({"number": i + 1, "problem": "\n".join(lines), "answer": template["circled"][answer - 1]})
+    return results
+
+def expand_inserting(data: Dict[str, Any]) -> List[Dict[str, Any]]:
+    sentences, template = data["sentences"], data["template"]
+    join = _joiner(sentences)
+    n = len(sentences)
+    labels = template["labels"]
+    results = []
+    for i, (insert_index, window, answer) in enumerate(data["problems"]):
+        pieces = [join(0, window)] if window > 0 else []
+        label = 0
+        for k in range(window, window + 5):
+            if k == insert_index:
+                continue
+            pieces += [labels[label], sentences[k]]
+            label += 1
+        pieces.append(labels[4])
+        if window + 5 < n:
+            pieces.append(join(window + 5, n))
+        text = template["header"] + sentences[insert_index] + "\n\n" + " ".join(pieces)
+        results.append({"number": i + 1, "problem": text, "answer": template["circled"][answer - 1]})
+    return results
+
+def expand(data: Dict[str, Any]) -> List[Dict[str, Any]]:
+    # 압축 응답을 format="full" 응답과 같은 문제 목록으로 되돌린다
+    if "error" in data:
+        return [{"error": data["error"]}]
+    if data["kind"] == "ordering":
+        return expand_ordering(data)
+    if data["kind"] == "inserting":
+        return expand_inserting(data)
+    raise ValueError(f"unknown compact kind: {data['kind']}")
+
+def decode(body: bytes, content_type: str = "application/json", content_encoding: Optional[str] = None) -> Any:
+    # HTTP 클라이언트가 압축을 풀어 주지 않을 때를 위해 Content-Encoding 도 처리한다
+    if content_encoding == "gzip":
+        body = gzip.decompress(body)
+    elif content_encoding == "br":
+        body = brotli.decompress(body)
+    if content_type.split(";")[0].strip() in MSGPACK_TYPES:
+        return msgpack.unpackb(body, raw=False)
+    return json.loads(body)
+
+# ---------------------------------------------------------------- 응답 (서버)
+
+def _accepted(header: Optional[str]) -> Dict[str, float]:
+    # "gzip;q=0.8, br" -> {"gzip": 0.8, "br": 1.0}
+    accepted = {}
+    for item in (header or "").split(","):
+        name, _, params = item.strip().partition(";")
+        if not name:
+            continue
+        q = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        accepted[name.strip().lower()] = q
+    return accepted
+
+def choose_media_type(request: Request) -> str:
+    accepted = _accepted(request.headers.get("accept"))
+    if msgpack is not None and any(accepted.get(t, 0) > 0 for t in MSGPACK_TYPES):
+        return "application/msgpack"
+    return "application/json"
+
+def choose_encoding(request: Request) -> Optional[str]:
+    accepted = _accepted(request.headers.get("accept-encoding"))
+    wildcard = accepted.get("*", 0)
+    if brotli is not None and accepted.get("br", wildcard) > 0:
+        return "br"
+    if accepted.get("gzip", wildcard) > 0:
+        return "gzip"
+    return None
+
+# JSON 은 접미사 없이 두어 예전 ETag 와 같게 한다
+MEDIA_SUFFIXES = {"application/msgpack": "msgpack"}
+
+def representation_etag(etag: str, media_type: str, encoding: Optional[str]) -> str:
+    # 같은 내용이라도 본문 형식과 압축에 따라 바이트가 다르므로 강한 ETag 에 접미사를 붙인다 ('"...-msgpack-gzip"')
+    suffix = "".join(f"-{part}" for part in (MEDIA_SUFFIXES.get(media_type), encoding) if part)
+    return f'{etag[:-1]}{suffix}"' if suffix else etag
+
+def etag_variants(request: Request, etag: str) -> List[str]:
+    # 이 요청에 돌려줄 수 있는 표현의 ETag 들 (http_cache.check_if_none_match 에 넘긴다).
+    # 압축 여부는 본문을 만들어 봐야 알 수 있으므로 압축한 것과 하지 않은 것을 모두 넣는다
+    media_type = choose_media_type(request)
+    tags = [representation_etag(etag, media_type, None)]
+    encoding = choose_encoding(request)
+    if encoding is not None:
+        tags.append(representation_etag(etag, media_type, encoding))
+    return tags
+
+def negotiated_response(request: Request, data: Any, headers: Optional[Dict[str, str]] = None) -> Response:
+    media_type = choose_media_type(request)
+    if media_type == "application/msgpack":
+        body = msgpack.packb(data, use_bin_type=True)
+    else:
+        # JSONResponse 와 같은 직렬화 (format="full" 응답의 바이트가 예전과 같도록)
+        body = json.dumps(data, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode("utf-8")
+    headers = dict(headers or {})
+    headers["Vary"] = VARY
+    encoding = choose_encoding(request) if len(body) >= COMPRESS_MIN_BYTES else None
+    if encoding == "br":
+        body = brotli.compress(body, quality=BROTLI_QUALITY)
+    elif encoding == "gzip":
+        body = gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+    if encoding is not None:
+        headers["Content-Encoding"] = encoding
+    if "ETag" in headers:
+        headers["ETag"] = representation_etag(headers["ETag"], media_type, encoding)
+    return Response(body, media_type=media_type, headers=headers)
@@ -0,0 +1,250 @@
+import asyncio
+import json
+import os
+import random
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, Optional
+
+import httpx
+from fastapi import HTTPException
+
+from api.metrics import GEMINI_BYTES, GEMINI_RETRIES, GEMINI_SECONDS, record_gemini_usage
+from api.upstream_guard import UpstreamGuard, estimate_tokens
+
+RETRY_STATUS = {429, 500, 502, 503, 504}
+# 업스트림이 Retry-After 를 주지 않았을 때 503 에 붙일 값 (초)
+UPSTREAM_RETRY_AFTER = os.getenv("GEMINI_UPSTREAM_RETRY_AFTER", "5")
+
+class UpstreamError(HTTPException):
+    # 재시도를 다 쓰고도 실패한 Gemini 호출. FastAPI 는 HTTPException 과 같이 그 상태 코드로 응답하고,
+    # 호출하는 쪽은 보호 장치의 거절(HTTPException)과 구분해서 잡을 수 있다.
+    pass
+
+def upstream_error(exc: httpx.HTTPError) -> UpstreamError:
+    # httpx 오류를 클라이언트에 돌려줄 상태 코드로 바꾸는 곳은 여기 하나다.
+    # - 429/5xx: 업스트림이 잠시 못 받는 것이므로 503 + Retry-After
+    # - 그 밖의 4xx: 우리 요청을 거절한 것이므로 502
+    # - 시간 초과: 504, 연결 실패 등: 502
+    if isinstance(exc, httpx.HTTPStatusError):
+        code = exc.response.status_code
+        if code == 429 or code >= 500:
+            retry_after = exc.response.headers.get("retry-after", "")
+            return UpstreamError(
+                status_code=503,
+                detail=f"Gemini 가 일시적으로 응답하지 못했습니다 ({code}). 잠시 후 다시 시도해 주세요.",
+                headers={"Retry-After": retry_after if retry_after.isdigit() else UPSTREAM_RETRY_AFTER},
+            )
+        return UpstreamError(status_code=502, detail=f"Gemini 가 요청을 거절했습니다 ({code}).")
+    if isinstance(exc, httpx.TimeoutException):
+        return UpstreamError(status_code=504, detail="Gemini 응답 시간이 초과되었습니다.")
+    return UpstreamError(status_code=502, detail="Gemini 에 연결하지 못했습니다.")
+
+class GeminiClient:
+    # keep-alive 커넥션 풀을 공유하는 비동기 Gemini 클라이언트.
+    # transport 를 넘기면 (httpx.MockTransport, httpx.ASGITransport 등) 로컬 스텁을 상대로 돌릴 수 있다.
+    # guard 를 넘기면 호출(재시도 포함)마다 속도 제한과 서킷 브레이커를 거친다 (api/upstream_guard.py).
+    # 재시도 뒤에도 실패하면 httpx 오류 대신 UpstreamError(503/502/504)를 던진다.
+
+    def __init__(
+        self,
+        api_url: str,
+        api_key: Optional[str] = None,
+        timeout: float = float(os.getenv("GEMINI_TIMEOUT", "60")),
+        connect_timeout: float = float(os.getenv("GEMINI_CONNECT_TIMEOUT", "5")),
+        max_connections: int = int(os.getenv("GEMINI_MAX_CONNECTIONS", "20")),
+        max_concurrency: int = int(os.getenv("GEMINI_MAX_CONCURRENCY", "16")),
+        max_retries: int = int(os.getenv("GEMINI_MAX_RETRIES", "3")),
+        backoff_base: float = 0.5,
+        backoff_max: float = 8.0,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+        guard: Optional[UpstreamGuard] = None,
+    ):
+        self.api_url = api_url
+        self.api_key = api_key
+        self.timeout = httpx.Timeout(timeout, connect=connect_timeout)
+        self.limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.transport = transport
+        self.guard = guard
+        self._client: Optional[httpx.AsyncClient] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def _ensure_client(self) -> httpx.AsyncClient:
+        # 커넥션과 세마포어는 이벤트 루프에 묶이므로, 루프가 바뀌면 (asyncio.run 반복 등) 새로 만든다
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._loop is not loop:
+            self._client = httpx.AsyncClient(timeout=self.timeout, limits=self.limits, transport=self.transport)
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._loop = loop
+        return self._client
+
+    @asynccontextmanager
+    async def _attempt(self, estimated_tokens: int):
+        # 호출 한 번: 보호 장치를 통과한 뒤 동시 호출 수 안에서 보내고, outcome["ok"] 를 브레이커에 남긴다.
+        # 결과를 정하지 못하고 끝나면 (취소 등) 기록하지 않고 half-open 시험 자리만 돌려준다.
+        if self.guard is not None:
+            await self.guard.admit(estimated_tokens)
+        outcome: Dict[str, bool] = {}
+        try:
+            async with self._semaphore:
+                yield outcome
+        finally:
+            if self.guard is not None:
+                if "ok" in outcome:
+                    self.guard.record(outcome["ok"])
+                else:
+                    self.guard.release()
+
+    def _backoff(self, attempt: int, retry_after: Optional[str] = None) -> float:
+        if retry_after:
+            try:
+                return min(float(retry_after), self.backoff_max)
+            except ValueError:
+                pass
+        # full jitter
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    async def post(
+        self, url: str, body: Dict[str, Any], timeout: Optional[float] = None, label: str = ""
+    ) -> Dict[str, Any]:
+        # label 은 지표에 붙일 프롬프트 키
+        client = self._ensure_client()
+        params = {"key": self.api_key} if self.api_key else None
+        request_timeout = httpx.Timeout(timeout, connect=self.timeout.connect) if timeout else self.timeout
+
+        estimated = estimate_tokens(body) if self.guard is not None else 0
+
+        started = time.perf_counter()
+        status = "error"
+        attempt = 0
+        try:
+            while True:
+                async with self._attempt(estimated) as outcome:
+                    try:
+                        res = await client.post(url, json=body, params=params, timeout=request_timeout)
+                        outcome["ok"] = res.status_code not in RETRY_STATUS
+                    except (httpx.TimeoutException, httpx.TransportError):
+                        outcome["ok"] = False
+                        if attempt >= self.max_retries:
+                            raise
+                        res = None
+                if res is not None and (res.status_code not in RETRY_STATUS or attempt >= self.max_retries):
+                    status = str(res.status_code)
+                    res.raise_for_status()
+                    GEMINI_BYTES.observe(len(res.request.content), prompt_key=label, direction="sent")
+                    GEMINI_BYTES.observe(len(res.content), prompt_key=label, direction="received")
+                    data = res.json()
+                    record_gemini_usage(label, data.get("usageMetadata"))
+                    if self.guard is not None:
+                        self.guard.settle(estimated, data.get("usageMetadata"))
+                    return data
+                GEMINI_RETRIES.inc(reason=str(res.status_code) if res is not None else "transport")
+                retry_after = res.headers.get("retry-after") if res is not None else None
+                await asyncio.sleep(self._backoff(attempt, retry_after))
+                attempt += 1
+        except HTTPException:
+            status = "rejected"
+            raise
+        except httpx.HTTPError as exc:
+            raise upstream_error(exc) from exc
+        finally:
+            GEMINI_SECONDS.observe(time.perf_counter() - started, prompt_key=label, status=status)
+
+    async def generate(self, body: Dict[str, Any], timeout: Optional[float] = None, label: str = "") -> Dict[str, Any]:
+        return await self.post(self.api_url, body, timeout, label)
+
+    async def stream(
+        self, url: str, body: Dict[str, Any], timeout: Optional[float] = None, label: str = ""
+    ) -> AsyncIterator[Dict[str, Any]]:
+        # streamGenerateContent?alt=sse 응답의 data: 줄을 하나씩 JSON으로 돌려준다.
+        # 이미 일부를 내보낸 뒤에 끊기면 재시도하지 않는다 (같은 내용이 두 번 나가지 않도록).
+        client = self._ensure_client()
+        params = {"alt": "sse"}
+        if self.api_key:
+            params["key"] = self.api_key
+        request_timeout = httpx.Timeout(timeout, connect=self.timeout.connect) if timeout else self.timeout
+
+        estimated = estimate_tokens(body) if self.guard is not None else 0
+
+        started = time.perf_counter()
+        status = "error"
+        received = 0
+        usage = None
+        attempt = 0
+        yielded = False
+        try:
+            while True:
+                retry_after = None
+                async with self._attempt(estimated) as outcome:
+                    try:
+                        async with client.stream("POST", url, json=body, params=params, timeout=request_timeout) as res:
+                            outcome["ok"] = res.status_code not in RETRY_STATUS
+                            if res.status_code in RETRY_STATUS and attempt < self.max_retries:
+                                retry_after = res.headers.get("retry-after")
+                            else:
+                                status = str(res.status_code)
+                                res.raise_for_status()
+                                GEMINI_BYTES.observe(len(res.request.content), prompt_key=label, direction="sent")
+                                async for line in res.aiter_lines():
+                                    received += len(line) + 1
+                                    if line.startswith("data:"):
+                                        yielded = True
+                                        data = json.loads(line[5:].strip())
+                                        usage = data.get("usageMetadata") or usage
+                                        yield data
+                                GEMINI_BYTES.observe(received, prompt_key=label, direction="received")
+                                record_gemini_usage(label, usage)
+                                if self.guard is not None:
+                                    self.guard.settle(estimated, usage)
+                                return
+                    except (httpx.TimeoutException, httpx.TransportError):
+                        outcome["ok"] = False
+                        if yielded or attempt >= self.max_retries:
+                            raise
+                        retry_after = None
+                GEMINI_RETRIES.inc(reason="stream")
+                await asyncio.sleep(self._backoff(attempt, retry_after))
+                attempt += 1
+        except HTTPException:
+            status = "rejected"
+            raise
+        except httpx.HTTPError as exc:
+            raise upstream_error(exc) from exc
+        finally:
+            GEMINI_SECONDS.observe(time.perf_counter() - started, prompt_key=label, status=status)
+
+    async def delete(self, url: str, label: str = "") -> None:
+        # cachedContents 정리 등에 쓴다. 실패해도 재시도하지 않는다 (TTL 이 지나면 어차피 지워진다).
+        client = self._ensure_client()
+        params = {"key": self.api_key} if self.api_key else None
+        started = time.perf_counter()
+        status = "error"
+        try:
+            async with self._semaphore:
+                res = await client.delete(url, params=params)
+            status = str(res.status_code)
+            res.raise_for_status()
+        except httpx.HTTPError as exc:
+            raise upstream_error(exc) from exc
+        finally:
+            GEMINI_SECONDS.observe(time.perf_counter() - started, prompt_key=label, status=status)
+
+    async def warm(self, url: str, connections: int = 1) -> int:
+        # 시작할 때 커넥션(TCP/TLS)을 미리 열어 풀에 넣어 둔다. 응답 상태는 보지 않는다 (404 여도 커넥션은 남는다).
+        # 보호 장치와 지표를 거치지 않으며, 열린 커넥션 수를 돌려준다.
+        client = self._ensure_client()
+        params = {"key": self.api_key} if self.api_key else None
+        results = await asyncio.gather(
+            *(client.get(url, params=params) for _ in range(max(1, connections))), return_exceptions=True
+        )
+        return sum(1 for res in results if isinstance(res, httpx.Response))
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
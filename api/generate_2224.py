@@ -2,31 +2,110 @@
 # 이 코드는 기존 JavaScript 기반 Gemini API 호출 로직을 Python으로 완전히 이식한 버전입니다.
 # 텍스트 문제 생성 (요지, 주제, 제목)을 지원합니다.
 
-from fastapi import APIRouter
+from fastapi import APIRouter, Response
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from typing import Literal, Dict
-import requests
+from typing import Awaitable, Callable, Literal, Dict, List, Optional, Tuple
+import asyncio
+import json
 import os
 import re
 
+from api.gemini_client import GeminiClient, UpstreamError
+from api.metrics import GEMINI_CALLS_SAVED, GEMINI_TOKENS_SAVED, CallbackMetric, timed
+from api.prompt_templates import load_prompt_set
+from api.precomputed import lookup
+from api.result_cache import make_result_cache, normalize_passage, result_key
+from api.singleflight import SingleFlight
+from api.upstream_guard import estimate_text_tokens, upstream_guard
+
 router = APIRouter()
 
 class GeneratePayload(BaseModel):
     type: Literal["gist", "topic", "title"]
     text: str
+    mode: Literal["sequential", "parallel", "batch"] = "sequential"
+    # True면 캐시를 무시하고 새로 생성한다 (결과는 다시 캐시에 저장)
+    force: bool = False
+    # cached: 지문을 Gemini cachedContents 로 한 번만 올리고 각 단계 프롬프트에서는 참조만 한다
+    context: Literal["inline", "cached"] = "inline"
 
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
-GEMINI_API_URL = "https://generativelanguage.googleapis.com/v1beta/models/gemini-2.0-pro:generateContent"
+GEMINI_API_URL = os.getenv(
+    "GEMINI_API_URL",
+    "https://generativelanguage.googleapis.com/v1beta/models/gemini-2.0-pro:generateContent",
+)
 
 number_labels = ['①', '②', '③', '④', '⑤']
 
-def fill_template(template: str, values: Dict[str, str]) -> str:
-    for k, v in values.items():
-        template = template.replace(f"{{{{{k}}}}}", v)
-    return template
-
-def call_gemini(prompt: str) -> str:
-    headers = {"Content-Type": "application/json"}
+# prompt 템플릿은 api/prompts/generate_2224.json 에서 관리한다 (시작할 때 한 번 읽고 미리 나눠 둔다).
+# 내용을 고치면 파일의 version 도 올린다. inlinePrompts 는 예전 코드와의 호환을 위해 남겨 둔 원문 dict.
+PROMPTS_PATH = os.getenv(
+    "GENERATE_PROMPTS_PATH", os.path.join(os.path.dirname(__file__), "prompts", "generate_2224.json")
+)
+prompts = load_prompt_set(PROMPTS_PATH)
+inlinePrompts = prompts.sources()
+
+GEMINI_STREAM_URL = os.getenv("GEMINI_STREAM_URL", GEMINI_API_URL.replace(":generateContent", ":streamGenerateContent"))
+
+# context="cached" 에서 쓰는 cachedContents 엔드포인트와 모델 이름 (generateContent URL 에서 끌어낸다)
+GEMINI_CACHE_URL = os.getenv("GEMINI_CACHE_URL", GEMINI_API_URL.split("/models/")[0] + "/cachedContents")
+GEMINI_MODEL = os.getenv("GEMINI_MODEL", "models/" + GEMINI_API_URL.split("/models/")[-1].split(":")[0])
+GEMINI_CACHE_TTL = os.getenv("GEMINI_CACHE_TTL", "600s")
+# cachedContents 가 받아 주는 최소 토큰 수 (모델마다 다르므로 쓰는 모델에 맞춘다).
+# 추정 토큰 수가 이보다 적은 지문은 올리지 않고 처음부터 지문을 프롬프트에 넣는다.
+GEMINI_CACHE_MIN_TOKENS = int(os.getenv("GEMINI_CACHE_MIN_TOKENS", "4096"))
+
+gemini = GeminiClient(GEMINI_API_URL, GEMINI_API_KEY, guard=upstream_guard)
+
+# 스트리밍 모드에서 단계별 진행 상황을 내보내는 콜백: emit(event, data)
+Emit = Optional[Callable[[str, Dict], Awaitable[None]]]
+
+class SeriesSession:
+    # 한 문제 시리즈의 Gemini 호출들이 함께 쓰는 상태: 올려 둔 지문 캐시 이름과 토큰 사용량.
+    # saved 는 캐시에서 읽힌 입력 토큰에서 캐시를 만들 때 한 번 올린 토큰을 뺀 값이다.
+
+    def __init__(self, context: str = "inline"):
+        self.context = context
+        self.cached_content: Optional[str] = None
+        # 캐시를 만들지 못해 지문을 프롬프트에 그대로 넣는 방식으로 돌아갔는지
+        self.fallback = False
+        # 지문이 GEMINI_CACHE_MIN_TOKENS 보다 짧아 캐시를 만들려 하지 않았는지 (요청 없이 바로 inline)
+        self.skipped = False
+        self.calls = 0
+        self.input_tokens = 0
+        self.cached_tokens = 0
+        self.uploaded_tokens = 0
+        self.output_tokens = 0
+        # 같은 요청이 이미 생성 중이어서 그 결과를 같이 받았는지 (이 요청으로는 Gemini 를 부르지 않음)
+        self.shared = False
+
+    def record(self, usage: Optional[Dict[str, int]]) -> None:
+        self.calls += 1
+        if usage:
+            self.input_tokens += usage.get("promptTokenCount", 0)
+            self.cached_tokens += usage.get("cachedContentTokenCount", 0)
+            self.output_tokens += usage.get("candidatesTokenCount", 0)
+
+    @property
+    def saved_tokens(self) -> int:
+        return max(0, self.cached_tokens - self.uploaded_tokens)
+
+    def report(self) -> Dict[str, object]:
+        return {
+            "context": self.context,
+            "fallback": self.fallback,
+            "skipped": self.skipped,
+            "calls": self.calls,
+            "input_tokens": self.input_tokens,
+            "cached_tokens": self.cached_tokens,
+            "uploaded_tokens": self.uploaded_tokens,
+            "output_tokens": self.output_tokens,
+            "saved_tokens": self.saved_tokens,
+            "shared": self.shared,
+        }
+
+def build_gemini_body(prompt: str, cached_content: Optional[str] = None) -> Dict:
     body = {
         "contents": [
             {"role": "user", "parts": [{"text": "Never respond conversationally."}]},
@@ -42,11 +121,66 @@ def call_gemini(prompt: str) -> str:
             {"category": "HARM_CATEGORY_DANGEROUS_CONTENT", "threshold": "BLOCK_NONE"}
         ]
     }
-
-    res = requests.post(f"{GEMINI_API_URL}?key={GEMINI_API_KEY}", json=body, headers=headers)
-    res.raise_for_status()
-    data = res.json()
-    return data['candidates'][0]['content']['parts'][0]['text'].strip()
+    if cached_content:
+        body["cachedContent"] = cached_content
+    return body
+
+async def call_gemini(
+    prompt: str,
+    on_delta: Optional[Callable[[str], Awaitable[None]]] = None,
+    prompt_key: str = "",
+    session: Optional[SeriesSession] = None,
+) -> str:
+    body = build_gemini_body(prompt, session.cached_content if session is not None else None)
+    if on_delta is None:
+        data = await gemini.generate(body, label=prompt_key)
+        if session is not None:
+            session.record(data.get("usageMetadata"))
+        return data['candidates'][0]['content']['parts'][0]['text'].strip()
+
+    chunks = []
+    usage = None
+    async for data in gemini.stream(GEMINI_STREAM_URL, body, label=prompt_key):
+        usage = data.get("usageMetadata") or usage
+        for candidate in data.get("candidates", [])[:1]:
+            for part in candidate.get("content", {}).get("parts", []):
+                if part.get("text"):
+                    chunks.append(part["text"])
+                    await on_delta(part["text"])
+    if session is not None:
+        session.record(usage)
+    return "".join(chunks).strip()
+
+async def open_passage_cache(full_passage: str, session: SeriesSession) -> None:
+    # 지문을 cachedContents 로 한 번 올려 둔다. 최소 토큰 수에 못 미치면 올리지 않고,
+    # 올리다 실패하면 기존처럼 지문을 매번 보낸다.
+    text = prompts.render("context", {"p": full_passage})
+    if estimate_text_tokens(text) < GEMINI_CACHE_MIN_TOKENS:
+        session.skipped = True
+        return
+    body = {
+        "model": GEMINI_MODEL,
+        "contents": [{"role": "user", "parts": [{"text": text}]}],
+        "ttl": GEMINI_CACHE_TTL,
+    }
+    try:
+        data = await gemini.post(GEMINI_CACHE_URL, body, label="context")
+    except UpstreamError:
+        session.fallback = True
+        return
+    session.cached_content = data.get("name")
+    session.fallback = session.cached_content is None
+    session.uploaded_tokens = data.get("usageMetadata", {}).get("totalTokenCount", 0)
+
+async def close_passage_cache(session: SeriesSession) -> None:
+    name, session.cached_content = session.cached_content, None
+    if name is None:
+        return
+    GEMINI_TOKENS_SAVED.inc(session.saved_tokens)
+    try:
+        await gemini.delete(GEMINI_CACHE_URL.rsplit("/cachedContents", 1)[0] + "/" + name, label="context")
+    except UpstreamError:
+        pass
 
 def extract_passage_and_star(passage: str):
     match = re.match(r"^(.*?)(\*.+)$", passage.strip(), flags=re.DOTALL)
@@ -54,22 +188,108 @@ def extract_passage_and_star(passage: str):
         return match.group(1).strip() + "\n" + match.group(2).strip()
     return passage.strip()
 
-def generate_problem_series(base_key: str, explanation_key: str, passage: str):
-    full_passage = extract_passage_and_star(passage)
-
-    c = call_gemini(fill_template(inlinePrompts[f"{base_key}c"], {"p": full_passage}))
-    w = call_gemini(fill_template(inlinePrompts[f"{base_key}w"], {"p": full_passage, "c": c}))
-    x = call_gemini(fill_template(inlinePrompts[f"{base_key}x"], {"p": full_passage, "c": c, "w": w}))
-    y = call_gemini(fill_template(inlinePrompts[f"{base_key}y"], {"p": full_passage, "c": c, "w": w, "x": x}))
-    z = call_gemini(fill_template(inlinePrompts[f"{base_key}z"], {"p": full_passage, "c": c, "w": w, "x": x, "y": y}))
+OPTION_KEYS = ["c", "w", "x", "y", "z"]
+DISTRACTOR_KEYS = ["w", "x", "y", "z"]
+
+# 선택지 생성 단계의 의존 관계: 단계 이름 -> (템플릿 접미사, 선행 단계들)
+# - sequential: 기존과 같이 c -> w -> x -> y -> z 순서로, 앞선 선택지를 모두 보고 만든다.
+# - parallel: 정답(c)이 나오면 네 오답을 같은 정답만 보고 동시에 만든다.
+# - batch: 정답(c)이 나오면 한 번의 호출로 오답 네 개를 함께 만든다.
+STAGE_GRAPHS: Dict[str, Dict[str, Tuple[str, List[str]]]] = {
+    "sequential": {
+        "c": ("c", []),
+        "w": ("w", ["c"]),
+        "x": ("x", ["c", "w"]),
+        "y": ("y", ["c", "w", "x"]),
+        "z": ("z", ["c", "w", "x", "y"]),
+    },
+    "parallel": {
+        "c": ("c", []),
+        "w": ("w", ["c"]),
+        "x": ("w", ["c"]),
+        "y": ("w", ["c"]),
+        "z": ("w", ["c"]),
+    },
+    "batch": {
+        "c": ("c", []),
+        "d": ("d", ["c"]),
+    },
+}
 
-    options = [
-        {"key": "c", "value": c},
-        {"key": "w", "value": w},
-        {"key": "x", "value": x},
-        {"key": "y", "value": y},
-        {"key": "z", "value": z},
-    ]
+def split_distractors(text: str) -> List[str]:
+    lines = [re.sub(r"^\s*(?:[①②③④⑤]|\d+[.)]|[-*•])\s*", "", line).strip() for line in text.splitlines()]
+    return [line for line in lines if line][:len(DISTRACTOR_KEYS)]
+
+async def call_stage(
+    name: str,
+    prompt: str,
+    emit: Emit = None,
+    stream_tokens: bool = False,
+    prompt_key: str = "",
+    session: Optional[SeriesSession] = None,
+) -> str:
+    on_delta = None
+    if emit is not None and stream_tokens:
+        async def on_delta(text: str) -> None:
+            await emit("delta", {"stage": name, "text": text})
+
+    value = await call_gemini(prompt, on_delta, prompt_key, session)
+    if emit is not None:
+        await emit("stage", {"stage": name, "value": value})
+    return value
+
+async def run_stage_graph(
+    graph: Dict[str, Tuple[str, List[str]]],
+    base_key: str,
+    known: Dict[str, str],
+    emit: Emit = None,
+    stream_tokens: bool = False,
+    session: Optional[SeriesSession] = None,
+) -> Dict[str, str]:
+    tasks: Dict[str, asyncio.Task] = {}
+
+    async def run(name: str) -> str:
+        suffix, deps = graph[name]
+        values = {"p": known["p"]}
+        for dep in deps:
+            values[dep] = known[dep] if dep in known else await tasks[dep]
+        prompt_key = f"{base_key}{suffix}"
+        prompt = prompts.render(prompt_key, values)
+        return await call_stage(name, prompt, emit, stream_tokens, prompt_key, session)
+
+    for name in graph:
+        tasks[name] = asyncio.ensure_future(run(name))
+    try:
+        await asyncio.gather(*tasks.values())
+    finally:
+        for task in tasks.values():
+            task.cancel()
+    return {**known, **{name: task.result() for name, task in tasks.items()}}
+
+async def generate_options(
+    base_key: str,
+    full_passage: str,
+    mode: str,
+    emit: Emit = None,
+    stream_tokens: bool = False,
+    session: Optional[SeriesSession] = None,
+) -> Dict[str, str]:
+    values = await run_stage_graph(STAGE_GRAPHS[mode], base_key, {"p": full_passage}, emit, stream_tokens, session)
+    if "d" in values:
+        distractors = dict(zip(DISTRACTOR_KEYS, split_distractors(values.pop("d"))))
+        values.update(distractors)
+        if emit is not None:
+            for key, value in distractors.items():
+                await emit("stage", {"stage": key, "value": value})
+        # 한 번에 네 개를 받지 못했으면 모자란 만큼만 병렬 모드로 채운다
+        missing = [key for key in DISTRACTOR_KEYS if key not in values]
+        if missing:
+            fill_graph = {key: STAGE_GRAPHS["parallel"][key] for key in missing}
+            values = await run_stage_graph(fill_graph, base_key, values, emit, stream_tokens, session)
+    return values
+
+def build_question(full_passage: str, values: Dict[str, str]):
+    options = [{"key": key, "value": values[key]} for key in OPTION_KEYS]
 
     sorted_options = sorted(options, key=lambda x: len(x["value"]))
     for i, opt in enumerate(sorted_options):
@@ -78,7 +298,36 @@ def generate_problem_series(base_key: str, explanation_key: str, passage: str):
 
     question_text = f"{full_passage}\n\n" + "\n".join(opt["text"] for opt in sorted_options)
     answer = next((opt["number"] for opt in sorted_options if opt["key"] == "c"), None)
-    explanation = call_gemini(fill_template(inlinePrompts[explanation_key], {"p": question_text}))
+    return question_text, answer
+
+@timed("generator.generate")
+async def generate_problem_series(
+    base_key: str,
+    explanation_key: str,
+    passage: str,
+    mode: str = "sequential",
+    emit: Emit = None,
+    stream_tokens: bool = False,
+    session: Optional[SeriesSession] = None,
+):
+    full_passage = extract_passage_and_star(passage)
+    session = session or SeriesSession()
+
+    if session.context == "cached":
+        await open_passage_cache(full_passage, session)
+    try:
+        # 캐시에 올려 둔 경우 프롬프트에는 지문 대신 참조 문구만 넣는다
+        prompt_passage = prompts.render("contextref", {}) if session.cached_content else full_passage
+        values = await generate_options(base_key, prompt_passage, mode, emit, stream_tokens, session)
+        question_text, answer = build_question(full_passage, values)
+        if emit is not None:
+            await emit("problem", {"problem": question_text, "answer": answer})
+        prompt_question = build_question(prompt_passage, values)[0] if session.cached_content else question_text
+        explanation = await call_stage(
+            "e", prompts.render(explanation_key, {"p": prompt_question}), emit, stream_tokens, explanation_key, session
+        )
+    finally:
+        await close_passage_cache(session)
 
     return {
         "problem": question_text,
@@ -86,316 +335,186 @@ def generate_problem_series(base_key: str, explanation_key: str, passage: str):
         "explanation": explanation
     }
 
-@router.post("/generate")
-def generate_2224_problem(payload: GeneratePayload):
-    mapping = {
-        "gist": ("const", "conste"),
-        "topic": ("const", "constee"),
-        "title": ("const", "consteee")
-    }
-    base_key, explanation_key = mapping[payload.type]
-    return generate_problem_series(base_key, explanation_key, payload.text)
-
-# 아래 prompt 템플릿은 외부에서 관리하는 게 좋지만, 여기에 포함합니다.
-inlinePrompts = {
-     "constc": """영어 지문을 읽고 글의 요지를 파악해서 고르는 객관식 문제를 만들려고 한다. 지금 현재 준비된 것은 다음과 같다.
-
-======================
-다음 글의 요지로 가장 적절한 것은?
-{{p}}
-
-①
-②
-③
-④
-⑤
-======================
-
-지금 당장 필요한 것은, 정답 선택지를 만드는 것이다. 정답 선택지는 지문의 요지를 담아내는 '~다' 체의 25자 이내의 한국어 문장이어야 한다. 설명 없이, 네가 만든 정답 선택지를 출력하라.""",
-
-    "constw": """영어 지문을 읽고 글의 요지를 파악해서 고르는 이지선다형 객관식 문제를 만들려고 한다. 지금 현재 준비된 것은 다음과 같다.
-
-======================
-다음 글의 요지로 가장 적절한 것은?
-{{p}}
-
-① {{c}}
-② 
-======================
-
-지금 당장 필요한 것은, 오답 선택지를 채우는 것이다. [중요!] 정답 선택지와 길이만 유사할 뿐 충분히 달라야 한다. (문장 구조나 단어를 흉내내는 것 절대 금지)
-오답 선택지를 만들기 위해 영어지문에 사용된 어휘를 사용할 수는 있지만, 영어지문 내용과 부분적으로 일치하는 것이 오답이 되어서는 안된다. (복수정답 방지)
-다른 설명 없이, 네가 만든 오답 문장을(번호 제외) 출력하라.""",
-
-    "constx": """영어 지문을 읽고 글의 요지를 파악해서 고르는 삼지선다형 객관식 문제를 만들려고 한다. 지금 현재 준비된 것은 다음과 같다.
-
-======================
-다음 글의 요지로 가장 적절한 것은?
-{{p}}
-
-① {{c}}
-② {{w}}
-③
-======================
-
-지금 당장 필요한 것은, 딱 하나 남은 오답 선택지를 채우는 것이다. [중요!] 다른 선택지와 충분히 달라야 한다. (문장 구조나 단어를 흉내내는 것 절대 금지) 
-오답 선택지를 만들기 위해 영어지문에 사용된 어휘를 사용할 수는 있지만, 영어지문 내용과 부분적으로 일치하는 것이 오답이 되어서는 안된다. (복수정답 방지)
-다른 설명 없이, 네가 만든 남은 하나의 오답 문장을(번호 제외)  출력하라.""",
-
-    "consty": """영어 지문을 읽고 글의 요지를 파악해서 고르는 사지선다형 객관식 문제를 만들려고 한다. 지금 현재 준비된 것은 다음과 같다.
-
-======================
-다음 글의 요지로 가장 적절한 것은?
-{{p}}
+# 문제 유형 -> (선택지 프롬프트 접두어, 해설 프롬프트 키)
+GENERATE_TYPES = {
+    "gist": ("const", "conste"),
+    "topic": ("const", "constee"),
+    "title": ("const", "consteee")
+}
 
-① {{c}}
-② {{w}}
-③ {{x}}
-④
-======================
-
-지금 당장 필요한 것은, 딱 하나 남은 오답 선택지를 채우는 것이다. [중요!] 다른 선택지와 충분히 달라야 한다. (문장 구조나 단어를 흉내내는 것 절대 금지) 
-오답 선택지를 만들기 위해 영어지문에 사용된 어휘를 사용할 수는 있지만, 영어지문 내용과 부분적으로 일치하는 것이 오답이 되어서는 안된다. (복수정답 방지)
-다른 설명 없이, 네가 만든 남은 하나의 오답 문장을(번호 제외)  출력하라.""",
-
-    "constz": """영어 지문을 읽고 글의 요지를 파악해서 고르는 오지선다형 객관식 문제를 만들려고 한다. 지금 현재 준비된 것은 다음과 같다.
+def series_prompt_keys(base_key: str, explanation_key: str, mode: str, context: str = "inline") -> List[str]:
+    suffixes = {suffix for suffix, _ in STAGE_GRAPHS[mode].values()}
+    if mode == "batch":
+        # 오답이 모자랄 때 병렬 모드 프롬프트로 채우므로 함께 버전에 반영한다
+        suffixes |= {suffix for suffix, _ in STAGE_GRAPHS["parallel"].values()}
+    keys = sorted(f"{base_key}{suffix}" for suffix in suffixes) + [explanation_key]
+    if context == "cached":
+        keys += ["context", "contextref"]
+    return keys
+
+def prompt_version(keys: List[str]) -> str:
+    return prompts.version_hash(keys)
+
+def generate_cache_key(payload: "GeneratePayload") -> str:
+    base_key, explanation_key = GENERATE_TYPES[payload.type]
+    version = prompt_version(series_prompt_keys(base_key, explanation_key, payload.mode, payload.context))
+    # inline 의 키는 예전과 같게 두어 이미 저장된 결과를 계속 쓴다
+    mode = payload.mode if payload.context == "inline" else f"{payload.mode}+{payload.context}"
+    return result_key(payload.type, mode, version, normalize_passage(payload.text))
+
+result_cache = make_result_cache()
+
+def _result_cache_stats():
+    if result_cache is None:
+        return []
+    stats = result_cache.stats()
+    return [({"event": event}, stats[event]) for event in ("hits", "misses", "evictions")]
+
+CallbackMetric(
+    "workbook_generate_cache_events_total", "/generate result cache hits, misses and evictions.",
+    "counter", ["event"], _result_cache_stats,
+)
+
+# 같은 문제(유형, 지문, 템플릿 버전, 모드, context = generate_cache_key)를 동시에 요청하면
+# Gemini 호출 체인은 한 번만 돌리고 모두 그 결과를 받는다 (GENERATE_SINGLEFLIGHT=0 이면 끔)
+GENERATE_SINGLEFLIGHT = os.getenv("GENERATE_SINGLEFLIGHT", "1") != "0"
+inflight: SingleFlight = SingleFlight("generate")
+
+class EmitFanout:
+    # 공유 생성의 진행 이벤트를 합류한 요청 모두에게 보낸다. 늦게 합류한 요청은 그 뒤의 이벤트부터 받고,
+    # 토큰 delta 는 stream_tokens 를 요청한 쪽에만 보낸다.
+
+    def __init__(self):
+        self.subscribers: List[Tuple[Emit, bool]] = []
+
+    def subscribe(self, emit: Emit, stream_tokens: bool) -> None:
+        if emit is not None:
+            self.subscribers.append((emit, stream_tokens))
+
+    def unsubscribe(self, emit: Emit) -> None:
+        self.subscribers = [(e, tokens) for e, tokens in self.subscribers if e is not emit]
+
+    async def emit(self, event: str, data: Dict) -> None:
+        for subscriber, tokens in list(self.subscribers):
+            if event != "delta" or tokens:
+                await subscriber(event, data)
+
+async def generate_with_cache(
+    payload: GeneratePayload,
+    emit: Emit = None,
+    stream_tokens: bool = False,
+    session: Optional[SeriesSession] = None,
+) -> Tuple[Dict[str, str], bool]:
+    key = generate_cache_key(payload)
+    if not payload.force:
+        cached = result_cache.get(key) if result_cache is not None else None
+        if cached is None:
+            # precompute.py 로 미리 만들어 둔 결과도 같은 키로 찾는다
+            cached = lookup(key)
+        if cached is not None:
+            return cached, True
+
+    base_key, explanation_key = GENERATE_TYPES[payload.type]
+    session = session or SeriesSession(payload.context)
+    if not GENERATE_SINGLEFLIGHT:
+        result = await generate_problem_series(
+            base_key, explanation_key, payload.text, payload.mode, emit, stream_tokens, session,
+        )
+        if result_cache is not None:
+            result_cache.set(key, result)
+        return result, False
+
+    async def run(fanout: EmitFanout) -> Tuple[Dict[str, str], SeriesSession]:
+        result = await generate_problem_series(
+            base_key, explanation_key, payload.text, payload.mode, fanout.emit, stream_tokens, session,
+        )
+        if result_cache is not None:
+            result_cache.set(key, result)
+        return result, session
+
+    # force 요청도 합류한다 (진행 중인 생성은 캐시가 아니라 지금 새로 만드는 결과이므로)
+    fanout = inflight.context(key) or EmitFanout()
+    fanout.subscribe(emit, stream_tokens)
+    try:
+        (result, leader), shared = await inflight.do(key, lambda: run(fanout), context=fanout)
+    finally:
+        fanout.unsubscribe(emit)
+    if shared:
+        session.shared = True
+        GEMINI_CALLS_SAVED.inc(leader.calls)
+    return result, False
+
+def prompt_versions() -> Dict[str, object]:
+    # 유형/모드별로 실제로 쓰이는 템플릿 묶음의 버전 (캐시 키에 들어가는 값과 같다)
+    series = {
+        f"{problem_type}/{mode}" + ("" if context == "inline" else f"+{context}"):
+            prompt_version(series_prompt_keys(base_key, explanation_key, mode, context))
+        for problem_type, (base_key, explanation_key) in GENERATE_TYPES.items()
+        for mode in STAGE_GRAPHS
+        for context in ("inline", "cached")
+    }
+    return {"version": prompts.version, "templates": prompts.hashes(), "series": series}
 
-======================
-다음 글의 요지로 가장 적절한 것은?
-{{p}}
+@router.get("/generate/prompts")
+def generate_prompts_api():
+    return prompt_versions()
 
-① {{c}}
-② {{w}}
-③ {{x}}
-④ {{y}}
-⑤
-======================
-
-지금 당장 필요한 것은, 딱 하나 남은 오답 선택지를 채우는 것이다. [중요!] 다른 선택지와 충분히 달라야 한다. (문장 구조나 단어를 흉내내는 것 절대 금지) 
-오답 선택지를 만들기 위해 영어지문에 사용된 어휘를 사용할 수는 있지만, 영어지문 내용과 부분적으로 일치하는 것이 오답이 되어서는 안된다. (복수정답 방지)
-다른 설명 없이, 네가 만든 남은 하나의 오답 문장을(번호 제외)  출력하라.""",
-
-    "conste": """다음 영어지문의 요지를 파악하는 문제의 해설을 작성해야 한다. 다른 설명은 하지말고 아래 예시의 포맷에 맞추어 주어진 문제를 풀고 그에 대한 해설을 작성해 출력하라.
-
-===포맷===
-정답: 번호
-(정답의 근거가 될 수 있는 내용)라는 내용의 글이다. 이러한 글의 요지는, 문장 "(지문에 사용된 영어 문장)" (인용 문장에 대한 한국어해석)에서 가장 명시적으로 드러난다. 따라서 글의 요지는 (정답번호)가 가장 적절하다.
-===예시===
-정답: ④
-정체성은 행동의 반영이며, 믿는 정체성에 따라 행동한다는 내용의 글이다. 이러한 글의 요지는, 문장 "Your behaviors are usually a reflection of your identity." (당신의 행동은 대개 당신의 정체성을 반영하는 것이다.)에서 가장 명시적으로 드러난다. 따라서, 글의 요지는 ④가 가장 적절하다.
-=========
-
-===네가 해설을 만들어야할 문제===
-{{p}}""",
-
-    "constcc": """영어 지문을 읽고 글의 주제를 파악해서 고르는 객관식 문제를 만들려고 한다. 지금 현재 준비된 것은 다음과 같다.
-
-======================
-다음 글의 주제로 가장 적절한 것은?
-{{p}}
-
-①
-②
-③
-④
-⑤
-======================
-
-지금 당장 필요한 것은, 정답 선택지를 만드는 것이다. 정답 선택지는 지문의 요지를 담아내는 영어 명사구여야 한다. 다른 설명 없이, 네가 만든 정답 선택지 하나의 영어 명사구만을(번호 제외) 출력하라. 
-문장이 아니므로 첫단어도 소문자로 써라.
-
-===예시===
-shift in the work-time paradigm brought about by industrialization
-effects of standardizing production procedures on labor markets
-influence of industrialization on the machine-human relationship
-efficient ways to increase the value of time in the Industrial Age
-problems that excessive work hours have caused for laborers
-=========""",
-
-    "constww": """영어 지문을 읽고 글의 주제를 파악해서 고르는 이지선다형 객관식 문제를 만들려고 한다. 지금 현재 준비된 것은 다음과 같다.
-
-======================
-다음 글의 주제로 가장 적절한 것은?
-{{p}}
-
-① {{c}}
-② 
-======================
-
-지금 당장 필요한 것은, 오답 선택지를 채우는 것이다. [중요!] 정답 선택지와 길이만 유사할 뿐 충분히 달라야 한다. (똑같은 단어로 시작하는 것은 금지)
-오답 선택지를 만들기 위해 영어지문에 사용된 어휘를 사용할 수는 있지만, 영어지문 내용과 부분적으로 일치하는 것이 오답이 되어서는 안된다. (복수정답 방지)
-다른 설명 없이, 네가 만든 오답 문장을(번호 제외) 출력하라.
-문장이 아니므로 첫단어도 소문자로 써라.""",
-
-    "constxx": """영어 지문을 읽고 글의 주제를 파악해서 고르는 삼지선다형 객관식 문제를 만들려고 한다. 지금 현재 준비된 것은 다음과 같다.
-
-======================
-다음 글의 주제로 가장 적절한 것은?
-{{p}}
-
-① {{c}}
-② {{w}}
-③
-======================
-
-지금 당장 필요한 것은, 딱 하나 남은 오답 선택지를 채우는 것이다. [중요!] 다른 선택지와 충분히 달라야 한다. (똑같은 단어로 시작하는 것은 금지)
-오답 선택지를 만들기 위해 영어지문에 사용된 어휘를 사용할 수는 있지만, 영어지문 내용과 부분적으로 일치하는 것이 오답이 되어서는 안된다. (복수정답 방지)
-다른 설명 없이, 네가 만든 남은 하나의 오답 문장을(번호 제외)  출력하라.
-문장이 아니므로 첫단어도 소문자로 써라.""",
-
-    "constyy": """영어 지문을 읽고 글의 주제를 파악해서 고르는 사지선다형 객관식 문제를 만들려고 한다. 지금 현재 준비된 것은 다음과 같다.
-
-======================
-다음 글의 주제로 가장 적절한 것은?
-{{p}}
-
-① {{c}}
-② {{w}}
-③ {{x}}
-④
-======================
-
-지금 당장 필요한 것은, 딱 하나 남은 오답 선택지를 채우는 것이다. [중요!] 다른 선택지와 충분히 달라야 한다. (똑같은 단어로 시작하는 것은 금지)
-오답 선택지를 만들기 위해 영어지문에 사용된 어휘를 사용할 수는 있지만, 영어지문 내용과 부분적으로 일치하는 것이 오답이 되어서는 안된다. (복수정답 방지)
-다른 설명 없이, 네가 만든 남은 하나의 오답 문장을(번호 제외)  출력하라.
-문장이 아니므로 첫단어도 소문자로 써라.""",
-
-    "constzz": """영어 지문을 읽고 글의 주제를 파악해서 고르는 오지선다형 객관식 문제를 만들려고 한다. 지금 현재 준비된 것은 다음과 같다.
-
-======================
-다음 글의 주제로 가장 적절한 것은?
-{{p}}
-
-① {{c}}
-② {{w}}
-③ {{x}}
-④ {{y}}
-⑤
-======================
-
-지금 당장 필요한 것은, 딱 하나 남은 오답 선택지를 채우는 것이다. [중요!] 다른 선택지와 충분히 달라야 한다. (똑같은 단어로 시작하는 것은 금지) 
-오답 선택지를 만들기 위해 영어지문에 사용된 어휘를 사용할 수는 있지만, 영어지문 내용과 부분적으로 일치하는 것이 오답이 되어서는 안된다. (복수정답 방지)
-다른 설명 없이, 네가 만든 남은 하나의 오답 문장을(번호 제외)  출력하라.
-문장이 아니므로 첫단어도 소문자로 써라.""",
-
-    "constee": """다음 영어지문의 주제를 파악하는 문제의 해설을 작성해야 한다. 다른 설명은 하지말고 아래 예시의 포맷에 맞추어 주어진 문제를 풀고 그에 대한 해설을 작성해 출력하라.
-
-===포맷===
-정답: 원숫자
-한국어 해설
-[정답 해석] 정답 선택지의 한국어 번역
-[오답 해석] 오답 번호 오답 선택지의 한국어 번역 (차례대로)
-===예시===
-정답: ⑤
-자신을 과대평가 또는 과소평가하지 말고 객관적으로 평가하라는 내용의 글이다. 따라서, 글의 주제는 ⑤가 가장 적절하다.
-[정답 해석] ⑤ 인생에서 자신의 강점과 약점을 정확하게 평가하는 것의 중요성
-[오답 해석] ① 디지털 정보 접근성에서 장애인 고려 부족 ② 정보 접근성과 데이터 분석 효율성 ③ 웹 페이지 접근성 및 정보 획득의 중요성 ④ 건축 설계의 핵심 고려 사항
-===네가 해설을 만들어야할 문제===
-{{p}}""",
-
-
-    "constccc": """영어 지문을 읽고 글의 제목을 파악해서 고르는 객관식 문제를 만들려고 한다. 지금 현재 준비된 것은 다음과 같다.
-
-======================
-다음 글의 제목으로 가장 적절한 것은?
-{{p}}
-
-①
-②
-③
-④
-⑤
-======================
-
-지금 당장 필요한 것은, 정답 선택지를 만드는 것이다. 정답 선택지는 지문의 요지를 담아내는 제목이야 한다. 다른 설명 없이, 네가 만든 정답 선택지에 들어갈 영어 제목을 (번호 제외) 출력하라.
-
-===예시===
-Are Selfies Just a Temporary Trend in Art History?
-Fantasy or Reality: Your Selfie Is Not the Real You
-The Selfie: A Symbol of Self-oriented Global Culture
-The End of Self-portraits: How Selfies Are Taking Over
-Selfies, the Latest Innovation in Representing Ourselves
-""",
-
-    "constwww": """영어 지문을 읽고 글의 제목을 파악해서 고르는 이지선다형 객관식 문제를 만들려고 한다. 지금 현재 준비된 것은 다음과 같다.
-
-======================
-다음 글의 제목으로 가장 적절한 것은?
-{{p}}
-
-① {{c}}
-② 
-======================
-
-지금 당장 필요한 것은, 오답 선택지를 채우는 것이다. [중요!] 정답 선택지와 길이만 유사할 뿐 충분히 달라야 한다. (똑같은 단어로 시작하는 것은 금지)
-오답 선택지를 만들기 위해 영어지문에 사용된 어휘를 사용할 수는 있지만, 영어지문 내용과 부분적으로 일치하는 것이 오답이 되어서는 안된다. (복수정답 방지)
-다른 설명 없이, 네가 만든 오답 제목을(번호 제외) 출력하라.
-""",
-
-    "constxxx": """영어 지문을 읽고 글의 제목를 파악해서 고르는 삼지선다형 객관식 문제를 만들려고 한다. 지금 현재 준비된 것은 다음과 같다.
-
-======================
-다음 글의 제목으로 가장 적절한 것은?
-{{p}}
-
-① {{c}}
-② {{w}}
-③
-======================
-
-지금 당장 필요한 것은, 딱 하나 남은 오답 선택지를 채우는 것이다. [중요!] 다른 선택지와 충분히 달라야 한다. (똑같은 단어로 시작하는 것은 금지)
-오답 선택지를 만들기 위해 영어지문에 사용된 어휘를 사용할 수는 있지만, 영어지문 내용과 부분적으로 일치하는 것이 오답이 되어서는 안된다. (복수정답 방지)
-다른 설명 없이, 네가 만든 남은 하나의 오답 제목을(번호 제외)  출력하라.
-""",
-
-    "constyyy": """영어 지문을 읽고 글의 제목를 파악해서 고르는 사지선다형 객관식 문제를 만들려고 한다. 지금 현재 준비된 것은 다음과 같다.
-
-======================
-다음 글의 제목으로 가장 적절한 것은?
-{{p}}
-
-① {{c}}
-② {{w}}
-③ {{x}}
-④
-======================
-
-지금 당장 필요한 것은, 딱 하나 남은 오답 선택지를 채우는 것이다. [중요!] 다른 선택지와 충분히 달라야 한다. (똑같은 단어로 시작하는 것은 금지)
-오답 선택지를 만들기 위해 영어지문에 사용된 어휘를 사용할 수는 있지만, 영어지문 내용과 부분적으로 일치하는 것이 오답이 되어서는 안된다. (복수정답 방지)
-다른 설명 없이, 네가 만든 남은 하나의 오답 제목을(번호 제외)  출력하라.
-""",
-
-    "constzzz": """영어 지문을 읽고 글의 제목을 파악해서 고르는 오지선다형 객관식 문제를 만들려고 한다. 지금 현재 준비된 것은 다음과 같다.
-
-======================
-다음 글의 제목으로 가장 적절한 것은?
-{{p}}
-
-① {{c}}
-② {{w}}
-③ {{x}}
-④ {{y}}
-⑤
-======================
-
-지금 당장 필요한 것은, 딱 하나 남은 오답 선택지를 채우는 것이다. [중요!] 다른 선택지와 충분히 달라야 한다. (똑같은 단어로 시작하는 것은 금지) 
-오답 선택지를 만들기 위해 영어지문에 사용된 어휘를 사용할 수는 있지만, 영어지문 내용과 부분적으로 일치하는 것이 오답이 되어서는 안된다. (복수정답 방지)
-다른 설명 없이, 네가 만든 남은 하나의 오답 제목을(번호 제외)  출력하라.
-""",
-
-    "consteee": """다음 영어지문의 제목을 파악하는 문제의 해설을 작성해야 한다. 다른 설명은 하지말고 아래 예시의 포맷에 맞추어 주어진 문제를 풀고 그에 대한 해설을 작성해 출력하라.
-
-===포맷===
-정답: 원숫자
-한국어 해설
-[정답 해석] 정답 선택지의 한국어 번역
-[오답 해석] 오답 번호 오답 선택지의 한국어 번역 (차례대로)
-===예시===
-정답: ⑤
-자신을 과대평가 또는 과소평가하지 말고 객관적으로 평가하라는 내용의 글이다. 따라서, 글의 제목은 ⑤가 가장 적절하다.
-[정답 해석] ⑤ 인생에서 약점파악이 왜 중요한가?
-[오답 해석] ① 디지털 정보 접근성: 여전히 소외된 장애인 ② 정보 접근성과 데이터 분석 효율성 ③ 웹 페이지 접근성 및 정보 획득이 가장 중요하다 ④ 건축 설계의 핵심 고려 사항들
-===네가 해설을 만들어야할 문제===
-{{p}}"""
-}
+@router.get("/generate/upstream")
+def generate_upstream_api():
+    return upstream_guard.stats()
 
+@router.post("/generate")
+async def generate_2224_problem(payload: GeneratePayload, response: Response):
+    session = SeriesSession(payload.context)
+    result, hit = await generate_with_cache(payload, session=session)
+    response.headers["X-Cache"] = "HIT" if hit else ("SHARED" if session.shared else "MISS")
+    if not hit and not session.shared:
+        response.headers["X-Gemini-Input-Tokens"] = str(session.input_tokens)
+        response.headers["X-Gemini-Cached-Tokens"] = str(session.cached_tokens)
+        response.headers["X-Gemini-Tokens-Saved"] = str(session.saved_tokens)
+    return result
+
+class GenerateStreamPayload(GeneratePayload):
+    # True면 Gemini 스트리밍 엔드포인트로 토큰 단위 delta 이벤트도 보낸다
+    stream_tokens: bool = True
+
+def sse_event(event: str, data: Dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+@router.post("/generate/stream")
+async def generate_2224_stream(payload: GenerateStreamPayload):
+    # Server-Sent Events: stage(선택지/해설 한 단계 완료), delta(토큰 조각), problem(문제 본문 확정),
+    # usage(토큰 사용량, 새로 만든 경우만), result(최종 결과), error 순으로 내보낸다.
+    queue: asyncio.Queue = asyncio.Queue()
+
+    async def emit(event: str, data: Dict) -> None:
+        await queue.put(sse_event(event, data))
+
+    async def produce() -> None:
+        try:
+            session = SeriesSession(payload.context)
+            result, hit = await generate_with_cache(payload, emit, payload.stream_tokens, session)
+            if not hit:
+                await emit("usage", session.report())
+            await emit("result", {**result, "cached": hit})
+        except Exception as e:
+            await emit("error", {"error": "문제 생성에 실패했습니다.", "detail": str(e)})
+        finally:
+            await queue.put(None)
+
+    async def events():
+        task = asyncio.ensure_future(produce())
+        try:
+            while True:
+                item = await queue.get()
+                if item is None:
+                    break
+                yield item
+        finally:
+            task.cancel()
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -0,0 +1,49 @@
+import hashlib
+import json
+from typing import Optional, Sequence
+
+from fastapi import Request, Response
+
+def make_etag(*parts) -> str:
+    # 응답을 결정하는 입력들만으로 강한 ETag 를 만든다 (결과를 만들기 전에 비교할 수 있도록)
+    raw = json.dumps(parts, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return '"' + hashlib.sha256(raw.encode("utf-8")).hexdigest()[:32] + '"'
+
+def matching_etag(if_none_match: Optional[str], tags: Sequence[str]) -> Optional[str]:
+    # If-None-Match 에서 tags 중 하나와 같은 태그를 찾아 돌려준다 (없으면 None).
+    # tags 는 같은 내용의 표현별 ETag 들이다 (본문 형식/압축 접미사, api/compact.py 의 etag_variants).
+    # If-None-Match 는 약한 비교를 쓰므로 W/ 접두어는 무시한다
+    if not if_none_match:
+        return None
+    if if_none_match.strip() == "*":
+        return tags[0]
+    for tag in (tag.strip() for tag in if_none_match.split(",")):
+        tag = tag[2:] if tag.startswith("W/") else tag
+        if tag in tags:
+            return tag
+    return None
+
+def not_modified(etag: str, cache_control: Optional[str] = None, vary: Optional[str] = None) -> Response:
+    # 304 도 200 과 같은 Vary 를 보내야 캐시가 표현별로 따로 갱신한다
+    headers = {"ETag": etag}
+    if cache_control:
+        headers["Cache-Control"] = cache_control
+    if vary:
+        headers["Vary"] = vary
+    return Response(status_code=304, headers=headers)
+
+def check_if_none_match(
+    request: Request,
+    etag: str,
+    cache_control: Optional[str] = None,
+    vary: Optional[str] = None,
+    variants: Optional[Sequence[str]] = None,
+) -> Optional[Response]:
+    # If-None-Match 가 맞으면 GET/HEAD 는 304, 그 밖의 메서드(POST)는 412 를 돌려준다 (RFC 9110 13.1.2).
+    # 응답에는 맞은 표현의 ETag 를 그대로 싣는다. 맞지 않으면 None (평소대로 응답을 만든다)
+    matched = matching_etag(request.headers.get("if-none-match"), variants or [etag])
+    if matched is None:
+        return None
+    if request.method in ("GET", "HEAD"):
+        return not_modified(matched, cache_control, vary)
+    return Response(status_code=412, headers={"ETag": matched})
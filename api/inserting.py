@@ -1,67 +1,109 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Request
 from pydantic import BaseModel
-from typing import List, Dict
-import re
+from typing import Any, List, Dict, Literal
+
+from api.compact import compact_payload, negotiated_response
+from api.metrics import timed
+from api.precomputed import lookup, passage_key
+from api.segmenter import JoinedSentences, Passage
 
 router = APIRouter()
 
 class TextPayload(BaseModel):
     text: str
+    # True면 마지막 다섯 문장만이 아니라 모든 문장을 주어진 문장으로 하는 문제를 만든다
+    all_positions: bool = False
+    # compact: 문장 목록과 문제별 번호 배열만 보낸다 (api/compact.py 의 expand 로 펼친다)
+    format: Literal["full", "compact"] = "full"
+
+# 문제를 만드는 방식이 바뀌면 올린다 (미리 만들어 둔 결과의 키가 함께 바뀌도록)
+GENERATOR_VERSION = "1"
 
 CIRCLED = ["①", "②", "③", "④", "⑤"]
 
-def split_paragraph_into_sentences(text: str) -> List[str]:
-    text = text.replace("\r\n", " ").replace("\n", " ")
-    matches = re.findall(r"[^.!?]+[.!?]+", text)
-    return [m.strip() for m in matches] if matches else []
-
-def generate_insertion_problem(sentences: List[str], insert_index: int) -> Dict[str, str]:
-    n = len(sentences)
-    given = sentences[insert_index]
-    rest = sentences[:insert_index] + sentences[insert_index + 1:]
-    paragraph = []
-    answer = None
-
-    if n == 5:
-        for i in range(len(rest) + 1):
-            if i < 5:
-                paragraph.append(f"( {CIRCLED[i]} )")
-            if i < len(rest):
-                paragraph.append(rest[i])
-        answer = CIRCLED[insert_index]
-    else:
-        base = n - 6
-        insertion_points = [base + i for i in range(5)]
-        label_map = {p: CIRCLED[i] for i, p in enumerate(insertion_points)}
-        if insert_index in insertion_points:
-            answer = CIRCLED[insertion_points.index(insert_index)]
-        for i in range(len(rest) + 1):
-            if i in label_map:
-                paragraph.append(f"( {label_map[i]} )")
-            if i < len(rest):
-                paragraph.append(rest[i])
-
-    text = (
-        "글의 흐름으로 보아, 주어진 문장이 들어가기에 가장 적절한 곳은?\n\n"
-        + given + "\n\n" + " ".join(paragraph)
-    )
-    return {"text": text, "answer": answer}
-
-def generate_all_insertion_problems(text: str) -> List[Dict[str, str]]:
-    sentences = split_paragraph_into_sentences(text)
+HEADER = "글의 흐름으로 보아, 주어진 문장이 들어가기에 가장 적절한 곳은?\n\n"
+LABELS = [f"( {c} )" for c in CIRCLED]
+
+class InsertionEngine:
+    # 지문 전체를 한 번만 이어 붙여 두고(joined), 각 문제는 그 문자열의 앞/뒤 조각과
+    # 보기 다섯 칸 주변의 문장 네 개만으로 만든다. 문제마다 문장 목록을 다시 자르거나 잇지 않는다.
+
+    def __init__(self, sentences: List[str]):
+        self.sentences = sentences
+        self.n = len(sentences)
+        self.joined = JoinedSentences(sentences)
+
+    def window_start(self, insert_index: int, all_positions: bool = False) -> int:
+        # 보기 ① 이 놓이는 위치. 기본은 기존과 같이 끝에서 여섯 번째 문장 앞 (5문장 지문은 맨 앞),
+        # all_positions 이면 주어진 문장의 원래 자리가 가운데 오도록 잡는다.
+        if all_positions:
+            return min(max(insert_index - 2, 0), self.n - 5)
+        return 0 if self.n == 5 else self.n - 6
+
+    def problem(self, insert_index: int, window: int) -> Dict[str, str]:
+        pieces = []
+        if window > 0:
+            pieces.append(self.joined.join(0, window))
+        label = 0
+        for k in range(window, window + 5):
+            if k == insert_index:
+                continue
+            pieces.append(LABELS[label])
+            pieces.append(self.sentences[k])
+            label += 1
+        pieces.append(LABELS[4])
+        if window + 5 < self.n:
+            pieces.append(self.joined.join(window + 5, self.n))
+
+        text = HEADER + self.sentences[insert_index] + "\n\n" + " ".join(pieces)
+        return {"text": text, "answer": CIRCLED[insert_index - window]}
+
+    def positions(self, all_positions: bool = False) -> List[int]:
+        if all_positions:
+            return list(range(self.n))
+        start = self.window_start(0)
+        return list(range(start, start + 5))
+
+def generate_all_insertion_problems(text: str, all_positions: bool = False) -> List[Dict[str, str]]:
+    return problems_from_passage(Passage(text), all_positions)
+
+@timed("generator.inserting")
+def problems_from_passage(passage: Passage, all_positions: bool = False) -> List[Dict[str, str]]:
+    sentences = passage.sentences
     if len(sentences) < 5:
         return [{"error": "문장 수가 5개 이상이어야 합니다."}]
-    
-    eligible = list(range(5)) if len(sentences) == 5 else [len(sentences) - 6 + i for i in range(5)]
-    return [
-        {
-            "number": i + 1,
-            "problem": generate_insertion_problem(sentences, idx)["text"],
-            "answer": generate_insertion_problem(sentences, idx)["answer"],
-        }
-        for i, idx in enumerate(eligible)
-    ]
+
+    engine = InsertionEngine(sentences)
+    results = []
+    for i, idx in enumerate(engine.positions(all_positions)):
+        problem = engine.problem(idx, engine.window_start(idx, all_positions))
+        results.append({"number": i + 1, "problem": problem["text"], "answer": problem["answer"]})
+    return results
+
+@timed("generator.inserting.compact")
+def compact_insertion_problems(passage: Passage, all_positions: bool = False) -> Dict[str, Any]:
+    sentences = passage.sentences
+    if len(sentences) < 5:
+        return compact_payload("inserting", GENERATOR_VERSION, sentences, error="문장 수가 5개 이상이어야 합니다.")
+
+    engine = InsertionEngine(sentences)
+    problems = []
+    for idx in engine.positions(all_positions):
+        window = engine.window_start(idx, all_positions)
+        problems.append([idx, window, idx - window + 1])
+    template = {"header": HEADER, "labels": LABELS, "circled": CIRCLED}
+    return compact_payload("inserting", GENERATOR_VERSION, sentences, template, problems)
+
+def precomputed_key_for(passage: Passage) -> str:
+    return passage_key("inserting", GENERATOR_VERSION, passage.numbered())
 
 @router.post("/inserting")
-def handle_inserting(payload: TextPayload):
-    return generate_all_insertion_problems(payload.text)
+def handle_inserting(payload: TextPayload, request: Request):
+    passage = Passage(payload.text)
+    if payload.format == "compact":
+        return negotiated_response(request, compact_insertion_problems(passage, payload.all_positions))
+    if not payload.all_positions:
+        hit = lookup(precomputed_key_for(passage))
+        if hit is not None:
+            return negotiated_response(request, hit)
+    return negotiated_response(request, problems_from_passage(passage, payload.all_positions))
@@ -0,0 +1,242 @@
+import functools
+import inspect
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from fastapi import APIRouter, Response
+
+router = APIRouter()
+
+# Prometheus 텍스트 형식(0.0.4)으로 내보내는 최소한의 지표 모음.
+# 프로세스마다 따로 집계되므로 여러 워커를 띄우면 워커별로 수집해야 한다.
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576)
+
+_registry: List["Metric"] = []
+_recording = threading.local()
+
+def _record(metric: "Metric", op: str, value: float, labels: Dict[str, str]) -> None:
+    events = getattr(_recording, "events", None)
+    if events is not None:
+        events.append((metric.name, op, value, labels))
+
+@contextmanager
+def recording():
+    # 이 스레드에서 일어난 Counter.inc / Histogram.observe 를 (이름, 연산, 값, 레이블) 목록으로 모은다.
+    # 프로세스 풀 워커에서 잰 지표를 결과와 함께 부모로 보내 replay() 하는 데 쓴다.
+    events: List[Tuple[str, str, float, Dict[str, str]]] = []
+    previous = getattr(_recording, "events", None)
+    _recording.events = events
+    try:
+        yield events
+    finally:
+        _recording.events = previous
+
+def replay(events: Iterable[Tuple[str, str, float, Dict[str, str]]]) -> None:
+    by_name = {metric.name: metric for metric in _registry}
+    for name, op, value, labels in events:
+        metric = by_name.get(name)
+        if metric is not None:
+            getattr(metric, op)(value, **labels)
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+    def render(self) -> List[str]:
+        raise NotImplementedError
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        _record(self, "inc", amount, labels)
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels: str) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return self.header() + [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}" for key, value in items
+        ]
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value: float, **labels: str) -> None:
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def dec(self, amount: float = 1, **labels: str) -> None:
+        self.inc(-amount, **labels)
+
+class CallbackMetric(Metric):
+    # 다른 모듈이 이미 세고 있는 값(캐시 적중 수 등)을 수집 시점에 읽어 온다.
+    # fn 은 (레이블 dict, 값) 목록을 돌려준다.
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        kind: str,
+        labelnames: Sequence[str],
+        fn: Callable[[], Iterable[Tuple[Dict[str, str], float]]],
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.kind = kind
+        self.fn = fn
+
+    def render(self) -> List[str]:
+        lines = self.header()
+        for labels, value in self.fn():
+            if value is None:
+                continue
+            lines.append(f"{self.name}{_format_labels(self.labelnames, self._key(labels))} {_format_value(value)}")
+        return lines
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+        self._series: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        _record(self, "observe", value, labels)
+        key = self._key(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][i] += 1
+                    break
+            series[1] += value
+            series[2] += 1
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = [(key, list(counts), total, count) for key, (counts, total, count) in self._series.items()]
+        lines = self.header()
+        for key, counts, total, count in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {count}")
+        return lines
+
+REQUEST_SECONDS = Histogram(
+    "workbook_http_request_duration_seconds", "HTTP request latency by route.", ["method", "route", "status"]
+)
+STAGE_SECONDS = Histogram(
+    "workbook_stage_duration_seconds", "Time spent in internal stages (spaCy parsing, generators).", ["stage"]
+)
+GEMINI_SECONDS = Histogram(
+    "workbook_gemini_request_duration_seconds", "Gemini call latency including retries.", ["prompt_key", "status"]
+)
+GEMINI_BYTES = Histogram(
+    "workbook_gemini_payload_bytes", "Gemini request/response body sizes.", ["prompt_key", "direction"],
+    buckets=SIZE_BUCKETS,
+)
+GEMINI_TOKENS = Counter(
+    "workbook_gemini_tokens_total", "Gemini tokens reported in usageMetadata.", ["prompt_key", "direction"]
+)
+GEMINI_RETRIES = Counter("workbook_gemini_retries_total", "Gemini call retries.", ["reason"])
+GEMINI_TOKENS_SAVED = Counter(
+    "workbook_gemini_input_tokens_saved_total", "Input tokens served from cached passage context instead of resent."
+)
+GEMINI_CALLS_SAVED = Counter(
+    "workbook_gemini_calls_saved_total", "Gemini calls avoided by sharing an identical in-flight /generate request."
+)
+
+@contextmanager
+def span(stage: str):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_SECONDS.observe(time.perf_counter() - started, stage=stage)
+
+def timed(stage: str):
+    def decorator(fn):
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                with span(stage):
+                    return await fn(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(stage):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def record_gemini_usage(prompt_key: str, usage: Optional[Dict[str, int]]) -> None:
+    if not usage:
+        return
+    GEMINI_TOKENS.inc(usage.get("promptTokenCount", 0), prompt_key=prompt_key, direction="input")
+    GEMINI_TOKENS.inc(usage.get("candidatesTokenCount", 0), prompt_key=prompt_key, direction="output")
+    if usage.get("cachedContentTokenCount"):
+        GEMINI_TOKENS.inc(usage["cachedContentTokenCount"], prompt_key=prompt_key, direction="cached")
+
+def render_metrics() -> str:
+    lines: List[str] = []
+    for metric in list(_registry):
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+@router.get("/metrics")
+def metrics_api():
+    return Response(render_metrics(), media_type="text/plain; version=0.0.4; charset=utf-8")
@@ -0,0 +1,156 @@
+import os
+import threading
+import time
+from multiprocessing import util as mp_util
+from typing import Dict, Iterable, List, Optional
+
+import spacy
+from fastapi import APIRouter
+
+from api.metrics import CallbackMetric, Gauge, span
+from api.parse_cache import ParseCache
+
+router = APIRouter()
+
+MODEL_NAME = os.getenv("SPACY_MODEL", "en_core_web_sm")
+
+# 어떤 엔드포인트도 개체명(NER)을 쓰지 않으므로 로드 단계에서 아예 제외한다.
+EXCLUDE = ["ner"]
+
+# 엔드포인트별로 추가로 꺼 두는 컴포넌트
+# - verbrewrite: 품사/세부 태그/원형만 필요하므로 의존 구문 분석(parser)이 필요 없다.
+# - vocablanks: noun_chunks 때문에 parser가 필요하다.
+PROFILES: Dict[str, List[str]] = {
+    "verbrewrite": ["parser"],
+    "vocablanks": [],
+}
+
+# nlp.pipe 배치 크기와 프로세스 수 (요청 단위로 덮어쓸 수 있다)
+BATCH_SIZE = int(os.getenv("NLP_BATCH_SIZE", "64"))
+N_PROCESS = int(os.getenv("NLP_N_PROCESS", "1"))
+
+# 같은 지문이 반복해서 들어오므로 문장 단위 파싱 결과를 캐시한다 (0이면 끔).
+# PARSE_CACHE_PATH 를 지정하면 시작 시 읽고 종료 시 DocBin 형태로 저장한다 (프로세스 풀 워커도 각자 합쳐 저장한다).
+parse_cache = ParseCache(
+    max_size=int(os.getenv("PARSE_CACHE_SIZE", "4096")),
+    path=os.getenv("PARSE_CACHE_PATH") or None,
+)
+
+MODEL_LOAD_SECONDS = Gauge("workbook_spacy_load_seconds", "Time taken to load the spaCy model.", ["model"])
+
+def _parse_cache_stats():
+    # 이 프로세스의 캐시와 프로세스 풀 워커들의 캐시를 합쳐 센다
+    from api.nlp_pool import nlp_pool
+    stats = parse_cache.stats()
+    workers = nlp_pool.worker_parse_cache()
+    return [({"event": event}, stats[event] + workers[event]) for event in ("hits", "misses", "evictions")]
+
+CallbackMetric(
+    "workbook_parse_cache_events_total", "spaCy parse cache hits, misses and evictions.",
+    "counter", ["event"], _parse_cache_stats,
+)
+CallbackMetric("workbook_process_resident_memory_mb", "Resident memory of this worker.", "gauge", [],
+               lambda: [({}, _rss_mb())])
+
+_nlp = None
+_lock = threading.Lock()
+_load_stats: Dict[str, Optional[float]] = {
+    "load_seconds": None,
+    "rss_before_mb": None,
+    "rss_after_mb": None,
+}
+
+def _rss_mb() -> Optional[float]:
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return round(pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024), 1)
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        import resource
+        # 리눅스 외 환경에서는 최대 RSS로 대신한다 (단위: KB)
+        return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+    except ImportError:
+        return None
+
+def get_nlp():
+    global _nlp
+    if _nlp is None:
+        with _lock:
+            if _nlp is None:
+                rss_before = _rss_mb()
+                started = time.perf_counter()
+                nlp = spacy.load(MODEL_NAME, exclude=EXCLUDE)
+                _load_stats["load_seconds"] = round(time.perf_counter() - started, 3)
+                _load_stats["rss_before_mb"] = rss_before
+                _load_stats["rss_after_mb"] = _rss_mb()
+                MODEL_LOAD_SECONDS.set(_load_stats["load_seconds"], model=MODEL_NAME)
+                if parse_cache.path:
+                    parse_cache.load(nlp.vocab)
+                    # atexit 는 multiprocessing 워커 종료 때 돌지 않으므로 multiprocessing 의 종료 처리기에 건다
+                    # (메인 프로세스에서는 atexit 로 돈다)
+                    mp_util.Finalize(None, parse_cache.save, exitpriority=10)
+                _nlp = nlp
+    return _nlp
+
+_model_version: Optional[str] = None
+
+def model_version() -> str:
+    # 결과를 저장해 두는 키(미리 만든 문제 등)에 넣을 spaCy/모델 버전. 모델을 다시 설치하면 키가 바뀐다.
+    # 프로세스 풀을 쓰는 부모 프로세스는 모델을 불러오지 않으므로 가능하면 meta.json 만 읽는다.
+    global _model_version
+    if _model_version is None:
+        if _nlp is not None:
+            meta = _nlp.meta
+        else:
+            try:
+                path = MODEL_NAME if os.path.isdir(MODEL_NAME) else spacy.util.get_package_path(MODEL_NAME)
+                meta = spacy.util.load_meta(os.path.join(path, "meta.json"))
+            except (OSError, ValueError, ImportError):
+                meta = get_nlp().meta
+        _model_version = f"{meta.get('lang')}_{meta.get('name')}-{meta.get('version')}/spacy-{spacy.__version__}"
+    return _model_version
+
+def parse_many(
+    texts: Iterable[str],
+    profile: str,
+    batch_size: Optional[int] = None,
+    n_process: Optional[int] = None,
+) -> List:
+    texts = list(texts)
+    docs = [parse_cache.get(text, profile) for text in texts]
+    missing = [i for i, doc in enumerate(docs) if doc is None]
+    if missing:
+        nlp = get_nlp()
+        with span(f"nlp.parse.{profile}"):
+            parsed = nlp.pipe(
+                (texts[i] for i in missing),
+                disable=PROFILES[profile],
+                batch_size=batch_size or BATCH_SIZE,
+                n_process=n_process or N_PROCESS,
+            )
+            for i, doc in zip(missing, parsed):
+                parse_cache.put(texts[i], profile, doc)
+                docs[i] = doc
+    return docs
+
+def nlp_status() -> Dict[str, object]:
+    from api.nlp_pool import nlp_pool
+    return {
+        "model": MODEL_NAME,
+        "model_version": model_version(),
+        "loaded": _nlp is not None,
+        "pipeline": list(_nlp.pipe_names) if _nlp is not None else [],
+        "profiles": PROFILES,
+        "batch_size": BATCH_SIZE,
+        "n_process": N_PROCESS,
+        **_load_stats,
+        "rss_mb": _rss_mb(),
+        "parse_cache": parse_cache.stats(),
+        "pool": nlp_pool.stats(),
+    }
+
+@router.get("/nlp/status")
+def nlp_status_api():
+    return nlp_status()
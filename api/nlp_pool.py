@@ -0,0 +1,206 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, Dict, Optional
+
+from fastapi import HTTPException
+
+from api.metrics import Counter, Gauge, recording, replay
+
+logger = logging.getLogger(__name__)
+
+# CPU 를 오래 쓰는 spaCy 작업(/verbrewrite, /vocablanks)을 이벤트 루프 밖의 프로세스 풀에서 돌린다.
+# 각 워커 프로세스는 시작할 때 모델을 미리 불러 두고(initializer), 라우트마다 대기 중인 요청 수가
+# NLP_POOL_MAX_PENDING 을 넘으면 바로 거절해(503 + Retry-After) 큐가 끝없이 쌓이지 않게 한다.
+# NLP_POOL_WORKERS=0 이면 프로세스 없이 스레드에서 돌린다 (대기 수 제한은 그대로).
+# 워커가 죽어 풀이 깨지면(BrokenProcessPool) 풀을 새로 만들어 한 번 다시 시도하고, 그래도 실패하면 503 을 준다.
+# 워커에서 잰 지표(span 등)와 파싱 캐시 통계는 결과와 함께 부모로 보내 부모의 /metrics, /nlp/status 에 합친다.
+
+NLP_POOL_WORKERS = int(os.getenv("NLP_POOL_WORKERS", "2"))
+NLP_POOL_MAX_PENDING = int(os.getenv("NLP_POOL_MAX_PENDING", "32"))
+NLP_POOL_START_METHOD = os.getenv("NLP_POOL_START_METHOD", "spawn")
+NLP_POOL_REJECT_STATUS = int(os.getenv("NLP_POOL_REJECT_STATUS", "503"))
+
+POOL_PENDING = Gauge(
+    "workbook_nlp_pool_pending", "Requests queued for or running in the NLP process pool.", ["route"]
+)
+POOL_REJECTED = Counter(
+    "workbook_nlp_pool_rejected_total", "Requests rejected because the NLP pool queue was full.", ["route"]
+)
+POOL_RESTARTS = Counter(
+    "workbook_nlp_pool_restarts_total", "Times the NLP process pool was rebuilt after a worker died."
+)
+CACHE_EVENTS = ("hits", "misses", "evictions")
+
+def init_worker() -> None:
+    # 프로세스 풀 워커의 initializer (precompute.py 의 풀도 쓴다)
+    from api.nlp import get_nlp
+    from api.warmup import WARMUP, warm_local_generators
+    # 모델 로드에 더해 생성기를 한 번씩 돌려 두어 워커의 첫 요청도 느리지 않게 한다
+    if WARMUP:
+        warm_local_generators()
+    else:
+        get_nlp()
+
+def _worker_ready() -> int:
+    return os.getpid()
+
+def _call_in_worker(fn: Callable, args: tuple):
+    # 워커에서 fn 을 돌리고, 그동안 기록된 지표와 이 워커의 파싱 캐시 통계를 결과에 붙여 돌려준다
+    from api.nlp import parse_cache
+    with recording() as events:
+        result = fn(*args)
+    return result, events, os.getpid(), parse_cache.stats()
+
+class NLPPool:
+    def __init__(self, workers: int, max_pending: int, start_method: str = "spawn"):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.start_method = start_method
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._pending: Dict[str, int] = {}
+        self.healthy = True
+        self.restarts = 0
+        self._restarting: Optional[asyncio.Future] = None
+        # 워커 pid -> 마지막으로 받은 파싱 캐시 통계, 없어진 워커의 누적 적중/실패/퇴출 수
+        self._worker_caches: Dict[int, Dict[str, object]] = {}
+        self._retired_cache = {event: 0 for event in CACHE_EVENTS}
+
+    def _ensure_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=self.workers,
+                        mp_context=multiprocessing.get_context(self.start_method),
+                        initializer=init_worker,
+                    )
+        return self._executor
+
+    def _discard(self, executor: ProcessPoolExecutor) -> None:
+        # 깨진 풀을 버린다. 다음 _ensure_executor 가 새 풀을 만든다 (여러 요청이 함께 깨져도 한 번만 버린다)
+        with self._lock:
+            if self._executor is not executor:
+                return
+            self._executor = None
+            self.healthy = False
+            self.restarts += 1
+            for stats in self._worker_caches.values():
+                for event in CACHE_EVENTS:
+                    self._retired_cache[event] += stats.get(event, 0)
+            self._worker_caches.clear()
+        POOL_RESTARTS.inc()
+        logger.error("NLP process pool broke; rebuilding it")
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    async def start(self) -> None:
+        # 워커를 모두 띄워 모델 로드를 첫 요청 전에 끝내 둔다
+        if self.workers <= 0:
+            return
+        loop = asyncio.get_running_loop()
+        executor = self._ensure_executor()
+        try:
+            await asyncio.gather(*(loop.run_in_executor(executor, _worker_ready) for _ in range(self.workers)))
+        except BrokenProcessPool:
+            self._discard(executor)
+            raise
+        self.healthy = True
+
+    async def _rebuild(self) -> None:
+        # 새 풀의 워커가 모두 뜰 때까지 간격을 늘려 가며 다시 띄운다. 다 뜨면 healthy 로 돌아온다 (/ready 가 이 값을 본다)
+        delay = 1.0
+        while not self.healthy:
+            try:
+                await self.start()
+            except BrokenProcessPool:
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 30.0)
+
+    def _restart(self) -> None:
+        if self._restarting is None or self._restarting.done():
+            self._restarting = asyncio.ensure_future(self._rebuild())
+
+    async def _submit(self, fn: Callable, args: tuple):
+        executor = self._ensure_executor()
+        try:
+            result, events, pid, cache = await asyncio.get_running_loop().run_in_executor(
+                executor, _call_in_worker, fn, args
+            )
+        except BrokenProcessPool:
+            self._discard(executor)
+            raise
+        replay(events)
+        self._worker_caches[pid] = cache
+        return result
+
+    async def run(self, route: str, fn: Callable, *args):
+        if self._pending.get(route, 0) >= self.max_pending:
+            POOL_REJECTED.inc(route=route)
+            raise HTTPException(
+                status_code=NLP_POOL_REJECT_STATUS,
+                detail="요청이 많아 처리할 수 없습니다. 잠시 후 다시 시도해 주세요.",
+                headers={"Retry-After": "1"},
+            )
+        self._pending[route] = self._pending.get(route, 0) + 1
+        POOL_PENDING.inc(route=route)
+        try:
+            if self.workers <= 0:
+                return await asyncio.to_thread(fn, *args)
+            try:
+                return await self._submit(fn, args)
+            except BrokenProcessPool:
+                pass
+            # 다른 요청 때문에 깨졌을 수 있으므로 새 풀에서 한 번만 다시 시도한다
+            self._restart()
+            try:
+                return await self._submit(fn, args)
+            except BrokenProcessPool:
+                self._restart()
+                raise HTTPException(
+                    status_code=503,
+                    detail="문장 분석 워커를 다시 시작하는 중입니다. 잠시 후 다시 시도해 주세요.",
+                    headers={"Retry-After": "5"},
+                )
+        finally:
+            self._pending[route] -= 1
+            POOL_PENDING.dec(route=route)
+
+    def worker_parse_cache(self) -> Dict[str, object]:
+        # 워커들의 파싱 캐시 통계를 합친다 (size 는 살아 있는 워커만, 적중/실패/퇴출 수는 없어진 워커까지 누적)
+        totals: Dict[str, object] = dict(self._retired_cache)
+        totals["size"] = 0
+        for stats in list(self._worker_caches.values()):
+            for event in CACHE_EVENTS:
+                totals[event] += stats.get(event, 0)
+            totals["size"] += stats.get("size", 0)
+        lookups = totals["hits"] + totals["misses"]
+        totals["hit_rate"] = round(totals["hits"] / lookups, 4) if lookups else None
+        totals["workers_reporting"] = len(self._worker_caches)
+        return totals
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "workers": self.workers,
+            "max_pending": self.max_pending,
+            "start_method": self.start_method,
+            "started": self._executor is not None,
+            "healthy": self.healthy,
+            "restarts": self.restarts,
+            "pending": dict(self._pending),
+            "parse_cache": self.worker_parse_cache() if self.workers > 0 else None,
+        }
+
+    def shutdown(self) -> None:
+        if self._restarting is not None:
+            self._restarting.cancel()
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+nlp_pool = NLPPool(NLP_POOL_WORKERS, NLP_POOL_MAX_PENDING, NLP_POOL_START_METHOD)
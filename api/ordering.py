@@ -1,88 +1,207 @@
-from fastapi import APIRouter
-from pydantic import BaseModel
-from typing import List, Dict
-import re
+from fastapi import APIRouter, Query, Request
+from pydantic import BaseModel, Field
+from typing import List, Dict, Literal, Optional, Sequence, Tuple
+from itertools import product
+import hashlib
+import os
 import random
 
+from api.compact import VARY, compact_payload, etag_variants, negotiated_response
+from api.http_cache import check_if_none_match, make_etag
+from api.metrics import timed
+from api.precomputed import lookup, passage_key
+from api.segmenter import JoinedSentences, Passage
+
 router = APIRouter()
 
 class TextPayload(BaseModel):
     text: str
+    # 만들 문제 수 상한(1 이상)과, 상한을 넘을 때 앞에서부터 자를지(False) 고르게 뽑을지(True)
+    max_problems: Optional[int] = Field(None, ge=1)
+    sample: bool = False
+    # 같은 seed(기본값은 지문 해시)면 항상 같은 문제를 만든다
+    seed: Optional[int] = None
+    # compact: 문장 목록과 문제별 번호 배열만 보낸다 (api/compact.py 의 expand 로 펼친다)
+    format: Literal["full", "compact"] = "full"
+
+# 문제를 만드는 방식이 바뀌면 올린다 (ETag 와 미리 만들어 둔 결과의 키가 함께 바뀌도록)
+GENERATOR_VERSION = "1"
+CACHE_CONTROL = "public, max-age=86400"
 
 CIRCLED = ["①", "②", "③", "④", "⑤"]
 
-def split_paragraph_into_sentences(text: str) -> List[str]:
-    text = text.replace("\r\n", " ").replace("\n", " ")
-    matches = re.findall(r"[^.!?]+[.!?]+", text)
-    return [m.strip() for m in matches] if matches else []
+# 지문 길이(n)별 4덩어리 분할 표. 결과가 n에만 달려 있으므로 ORDERING_TABLE_MAX_N 까지는
+# 처음 필요할 때(또는 build_composition_table 로 시작할 때) 한 번 계산해 재사용한다.
+ORDERING_TABLE_MAX_N = int(os.getenv("ORDERING_TABLE_MAX_N", "40"))
+_composition_table: Dict[int, Tuple[Tuple[int, int, int, int], ...]] = {}
+
+def compute_compositions(n: int) -> Tuple[Tuple[int, int, int, int], ...]:
+    # 각 덩어리 1~max_chunk 문장, 합이 n 인 4-조합을 사전순으로 (기존 DFS와 같은 순서)
+    max_chunk = 3 if n >= 9 else 2
+    return tuple(sizes for sizes in product(range(1, max_chunk + 1), repeat=4) if sum(sizes) == n)
+
+def chunk_compositions(n: int) -> Tuple[Tuple[int, int, int, int], ...]:
+    if n > ORDERING_TABLE_MAX_N:
+        return compute_compositions(n)
+    table = _composition_table.get(n)
+    if table is None:
+        table = _composition_table[n] = compute_compositions(n)
+    return table
+
+def build_composition_table(max_n: int = ORDERING_TABLE_MAX_N) -> None:
+    for n in range(max_n + 1):
+        chunk_compositions(n)
 
 def get_valid_4_chunk_combinations(n: int) -> List[List[int]]:
-    result = []
-
-    def dfs(current, total):
-        if len(current) == 4 and total == n:
-            result.append(current[:])
-            return
-        if len(current) >= 4 or total >= n:
-            return
-        max_chunk = 3 if n >= 9 else 2
-        for i in range(1, max_chunk + 1):
-            dfs(current + [i], total + i)
-
-    dfs([], 0)
-    return result
+    return [list(sizes) for sizes in chunk_compositions(n)]
 
-def chunk_sentences(sentences: List[str], sizes: List[int]) -> List[str]:
+def chunk_sentences(sentences: List[str], sizes: Sequence[int], joined: Optional[JoinedSentences] = None) -> List[str]:
+    joined = joined or JoinedSentences(sentences)
     result, idx = [], 0
     for size in sizes:
-        result.append(" ".join(sentences[idx:idx + size]))
+        result.append(joined.join(idx, idx + size))
         idx += size
     return result
 
-def generate_single_order_question(o, p, q, r) -> Dict[str, str]:
-    perms = [
-        ["a", "c", "b"], ["b", "a", "c"], ["b", "c", "a"],
-        ["c", "a", "b"], ["c", "b", "a"]
-    ]
-    [la, lb, lc] = random.choice(perms)
-    labels = {la: p, lb: q, lc: r}
-    reverse = {p: la, q: lb, r: lc}
+# (A)(B)(C) 배치. 순서가 곧 정답 번호(①~⑤)이므로 정답 번호만 알면 배치를 알 수 있다.
+ORDER_PERMS = ["acb", "bac", "bca", "cab", "cba"]
+ORDER_HEADER = "주어진 글 다음에 이어질 글의 흐름으로 가장 적절한 것은?\n"
+ORDER_CHOICES = [
+    "① (A) - (C) - (B)",
+    "② (B) - (A) - (C)",
+    "③ (B) - (C) - (A)",
+    "④ (C) - (A) - (B)",
+    "⑤ (C) - (B) - (A)"
+]
 
+def render_order_question(o: str, p: str, q: str, r: str, answer: int) -> str:
+    # answer(1~5) 번 배치로 p, q, r 에 (A)(B)(C) 를 붙인다
+    la, lb, lc = ORDER_PERMS[answer - 1]
+    labels = {la: p, lb: q, lc: r}
     lines = [
-        "주어진 글 다음에 이어질 글의 흐름으로 가장 적절한 것은?\n",
+        ORDER_HEADER,
         o + "\n",
         f"(A) {labels['a']}",
         f"(B) {labels['b']}",
         f"(C) {labels['c']}\n",
-        "① (A) - (C) - (B)",
-        "② (B) - (A) - (C)",
-        "③ (B) - (C) - (A)",
-        "④ (C) - (A) - (B)",
-        "⑤ (C) - (B) - (A)"
+        *ORDER_CHOICES,
     ]
+    return "\n".join(lines)
+
+def passage_seed(sentences: List[str]) -> int:
+    # seed 를 주지 않으면 지문 내용으로 정해 같은 지문은 늘 같은 문제가 나오게 한다
+    digest = hashlib.sha256("\n".join(sentences).encode("utf-8")).hexdigest()
+    return int(digest[:16], 16)
 
-    correct = reverse[p] + reverse[q] + reverse[r]
-    answer_map = {"acb": 1, "bac": 2, "bca": 3, "cab": 4, "cba": 5}
-    answer = CIRCLED[answer_map[correct] - 1]
-    return {"question": "\n".join(lines), "answer": answer}
+def order_problem_specs(
+    sentences: List[str],
+    max_problems: Optional[int] = None,
+    sample: bool = False,
+    seed: Optional[int] = None,
+) -> List[Tuple[Tuple[int, int, int, int], int]]:
+    # 문제마다 (네 덩어리의 문장 수, 정답 번호). 문제 문자열은 이것과 문장 목록만으로 정해진다.
+    rng = random.Random(passage_seed(sentences) if seed is None else seed)
+    combinations = chunk_compositions(len(sentences))
+    # 긴 지문은 조합 수가 많으므로 앞에서부터 자르거나(max_problems) 골고루 뽑는다(sample)
+    if max_problems is not None and len(combinations) > max_problems:
+        if sample:
+            picked = sorted(rng.sample(range(len(combinations)), max_problems))
+            combinations = tuple(combinations[i] for i in picked)
+        else:
+            combinations = combinations[:max_problems]
+    # 정답 번호는 조합 순서대로 하나씩 뽑는다 (조합을 고른 뒤 같은 rng 로 이어서 뽑으므로 결과가 예전과 같다)
+    return [(sizes, rng.choice(range(1, len(ORDER_PERMS) + 1))) for sizes in combinations]
 
-def generate_all_order_questions(sentences: List[str]) -> List[Dict[str, str]]:
+@timed("generator.ordering")
+def generate_all_order_questions(
+    sentences: List[str],
+    max_problems: Optional[int] = None,
+    sample: bool = False,
+    seed: Optional[int] = None,
+) -> List[Dict[str, str]]:
     if len(sentences) < 4:
         return [{"error": "문장 수 부족"}]
 
+    joined = JoinedSentences(sentences)
     results = []
-    combinations = get_valid_4_chunk_combinations(len(sentences))
-    for i, sizes in enumerate(combinations):
-        o, p, q, r = chunk_sentences(sentences, sizes)
-        qna = generate_single_order_question(o, p, q, r)
+    for i, (sizes, answer) in enumerate(order_problem_specs(sentences, max_problems, sample, seed)):
+        o, p, q, r = chunk_sentences(sentences, sizes, joined)
         results.append({
             "number": i + 1,
-            "problem": qna["question"],
-            "answer": qna["answer"]
+            "problem": render_order_question(o, p, q, r, answer),
+            "answer": CIRCLED[answer - 1]
         })
     return results
 
+@timed("generator.ordering.compact")
+def compact_order_questions(
+    sentences: List[str],
+    max_problems: Optional[int] = None,
+    sample: bool = False,
+    seed: Optional[int] = None,
+) -> Dict[str, object]:
+    # 문장 목록은 한 번만 보내고 문제마다 [덩어리 문장 수 네 개, 정답 번호] 만 보낸다 (api/compact.py 로 펼친다)
+    if len(sentences) < 4:
+        return compact_payload("ordering", GENERATOR_VERSION, sentences, error="문장 수 부족")
+    problems = [[*sizes, answer] for sizes, answer in order_problem_specs(sentences, max_problems, sample, seed)]
+    template = {"header": ORDER_HEADER, "choices": ORDER_CHOICES, "perms": ORDER_PERMS, "circled": CIRCLED}
+    return compact_payload("ordering", GENERATOR_VERSION, sentences, template, problems)
+
+def problems_from_passage(
+    passage: Passage,
+    max_problems: Optional[int] = None,
+    sample: bool = False,
+    seed: Optional[int] = None,
+) -> List[Dict[str, str]]:
+    return generate_all_order_questions(passage.sentences, max_problems, sample, seed)
+
+def precomputed_key_for(passage: Passage) -> str:
+    # 기본 옵션(max_problems/sample 없음, 지문 해시 seed)으로 만든 결과만 미리 만들어 둔다
+    return passage_key("ordering", GENERATOR_VERSION, passage.numbered())
+
+def ordering_response(
+    request: Request,
+    text: str,
+    max_problems: Optional[int],
+    sample: bool,
+    seed: Optional[int],
+    format: str = "full",
+):
+    passage = Passage(text)
+    if seed is None:
+        seed = passage_seed(passage.sentences)
+    # 같은 입력이면 결과가 같으므로 ETag 는 입력으로 만들고, 일치하면 생성 자체를 건너뛴다
+    etag_parts = ("ordering", GENERATOR_VERSION, passage.sentences, max_problems, sample, seed)
+    etag = make_etag(*etag_parts) if format == "full" else make_etag(*etag_parts, format)
+    conditional = check_if_none_match(request, etag, CACHE_CONTROL, VARY, etag_variants(request, etag))
+    if conditional is not None:
+        return conditional
+    headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL}
+    if format == "compact":
+        # 번호 배열만 만들면 되므로 미리 만든 결과를 찾는 것보다 빠르다
+        return negotiated_response(
+            request, compact_order_questions(passage.sentences, max_problems, sample, seed), headers
+        )
+    problems = None
+    if max_problems is None and not sample and seed == passage_seed(passage.sentences):
+        problems = lookup(precomputed_key_for(passage))
+    if problems is None:
+        problems = problems_from_passage(passage, max_problems, sample, seed)
+    return negotiated_response(request, problems, headers)
+
 @router.post("/ordering")
-def handle_ordering(payload: TextPayload):
-    sentences = split_paragraph_into_sentences(payload.text)
-    return generate_all_order_questions(sentences)
+def handle_ordering(payload: TextPayload, request: Request):
+    return ordering_response(
+        request, payload.text, payload.max_problems, payload.sample, payload.seed, payload.format
+    )
+
+@router.get("/ordering")
+def handle_ordering_get(
+    request: Request,
+    text: str,
+    max_problems: Optional[int] = Query(None, ge=1),
+    sample: bool = False,
+    seed: Optional[int] = None,
+    format: Literal["full", "compact"] = "full",
+):
+    return ordering_response(request, text, max_problems, sample, seed, format)
@@ -0,0 +1,127 @@
+import hashlib
+import os
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import Dict, Optional
+
+import srsly
+from spacy.tokens import Doc, DocBin
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+def normalize_sentence(text: str) -> str:
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+def sentence_key(text: str, profile: str) -> str:
+    return hashlib.sha1(f"{profile}\0{normalize_sentence(text)}".encode("utf-8")).hexdigest()
+
+class ParseCache:
+    # 문장 해시 -> 파싱된 Doc 의 LRU 캐시.
+    # 키는 정규화된 문장이지만, vocablanks는 Doc의 문자 오프셋으로 원문을 자르므로
+    # 원문이 공백 등으로 달라진 경우에는 적중으로 치지 않고 새로 파싱해 덮어쓴다.
+
+    def __init__(self, max_size: int = 4096, path: Optional[str] = None):
+        self.max_size = max_size
+        self.path = path
+        self._docs: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, text: str, profile: str) -> Optional[Doc]:
+        if self.max_size <= 0:
+            return None
+        key = sentence_key(text, profile)
+        with self._lock:
+            entry = self._docs.get(key)
+            if entry is None or entry[1].text != text:
+                self.misses += 1
+                return None
+            self._docs.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, text: str, profile: str, doc: Doc) -> None:
+        if self.max_size <= 0:
+            return
+        key = sentence_key(text, profile)
+        with self._lock:
+            self._docs[key] = (profile, doc)
+            self._docs.move_to_end(key)
+            while len(self._docs) > self.max_size:
+                self._docs.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._docs.clear()
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._docs),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+                "path": self.path,
+            }
+
+    # 디스크 저장 형식: {profile: DocBin bytes} 를 msgpack으로 묶은 것.
+    # 오래된 항목부터 기록하므로 다시 읽으면 LRU 순서가 그대로 복원된다.
+    # 여러 프로세스(프로세스 풀 워커, serve.py 워커)가 같은 경로에 저장하므로, 잠금 파일을 잡고
+    # 디스크에 있던 항목 뒤에 이 프로세스의 항목을 이어 붙여(max_size 까지) 프로세스별 임시 파일에 쓴 뒤 바꿔 넣는다.
+    def save(self, path: Optional[str] = None) -> None:
+        path = path or self.path
+        if not path:
+            return
+        with self._lock:
+            entries = list(self._docs.items())
+        if not entries:
+            return
+        vocab = entries[0][1][1].vocab
+        with open(f"{path}.lock", "w") as lock:
+            if fcntl is not None:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            merged: "OrderedDict[str, tuple]" = OrderedDict()
+            for profile, doc in self._read(vocab, path):
+                merged[sentence_key(doc.text, profile)] = (profile, doc)
+            for key, entry in entries:
+                merged.pop(key, None)
+                merged[key] = entry
+            keep = list(merged.values())[-self.max_size:] if self.max_size > 0 else []
+            bins: Dict[str, DocBin] = {}
+            for profile, doc in keep:
+                bins.setdefault(profile, DocBin()).add(doc)
+            data = {profile: doc_bin.to_bytes() for profile, doc_bin in bins.items()}
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(srsly.msgpack_dumps(data))
+            os.replace(tmp_path, path)
+
+    @staticmethod
+    def _read(vocab, path: str):
+        if not os.path.exists(path):
+            return
+        with open(path, "rb") as f:
+            data = srsly.msgpack_loads(f.read())
+        for profile, payload in data.items():
+            for doc in DocBin().from_bytes(payload).get_docs(vocab):
+                yield profile, doc
+
+    def load(self, vocab, path: Optional[str] = None) -> int:
+        path = path or self.path
+        if not path:
+            return 0
+        loaded = 0
+        for profile, doc in self._read(vocab, path):
+            self.put(doc.text, profile, doc)
+            loaded += 1
+        return loaded
@@ -0,0 +1,110 @@
+import json
+import os
+import sqlite3
+import time
+import zlib
+from typing import Any, Dict, Iterable, Optional
+
+from api.metrics import CallbackMetric
+from api.result_cache import SQLiteConnection, result_key
+
+# precompute.py 가 미리 만들어 둔 문제를 담는 SQLite 저장소.
+# 값은 zlib 으로 압축한 JSON 이고, 키는 유형 + 생성기/템플릿 버전(spaCy 를 쓰는 유형은 spaCy/모델 버전까지) + 입력 내용의 해시라서
+# 생성 방식이 바뀌면 키가 달라져 예전 결과는 자연히 쓰이지 않는다 (precompute.py 를 다시 돌리면 채워진다).
+# API 는 PRECOMPUTED_PATH 가 가리키는 파일을 읽기 전용으로 열어 해시가 맞으면 그대로 돌려준다.
+
+PRECOMPUTED_PATH = os.getenv("PRECOMPUTED_PATH")
+
+def passage_key(kind: str, version: str, numbered) -> str:
+    # 지문 유형(inserting 등)은 문장 분리 결과(번호, 문장)만으로 출력이 정해지므로 그것을 키로 쓴다
+    return result_key("precomputed", kind, version, json.dumps(numbered, ensure_ascii=False, separators=(",", ":")))
+
+class PrecomputedStore:
+    def __init__(self, path: str, readonly: bool = False):
+        self.path = path
+        self.readonly = readonly
+        # fork 한 워커(serve.py)는 처음 찾을 때 자기 연결을 새로 연다 (api/result_cache.py 의 SQLiteConnection)
+        self._db = SQLiteConnection(self._connect)
+        self._db.get()
+        self.hits = 0
+        self.misses = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        if self.readonly:
+            return sqlite3.connect(f"file:{self.path}?mode=ro", uri=True, check_same_thread=False)
+        conn = sqlite3.connect(self.path, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS problems ("
+            " key TEXT PRIMARY KEY, kind TEXT NOT NULL, value BLOB NOT NULL, created REAL NOT NULL)"
+        )
+        conn.commit()
+        return conn
+
+    def get(self, key: str) -> Optional[Any]:
+        conn = self._db.get()
+        with self._db.lock:
+            row = conn.execute("SELECT value FROM problems WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return json.loads(zlib.decompress(row[0]))
+
+    def missing(self, keys: Iterable[str]) -> set:
+        keys = list(keys)
+        conn = self._db.get()
+        with self._db.lock:
+            found = {
+                row[0] for row in conn.execute(
+                    f"SELECT key FROM problems WHERE key IN ({','.join('?' * len(keys))})", keys
+                )
+            } if keys else set()
+        return set(keys) - found
+
+    def put(self, key: str, kind: str, value: Any) -> None:
+        blob = zlib.compress(json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode("utf-8"), 9)
+        conn = self._db.get()
+        with self._db.lock:
+            conn.execute(
+                "INSERT OR REPLACE INTO problems (key, kind, value, created) VALUES (?, ?, ?, ?)",
+                (key, kind, blob, time.time()),
+            )
+
+    def commit(self) -> None:
+        conn = self._db.get()
+        with self._db.lock:
+            conn.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        conn = self._db.get()
+        with self._db.lock:
+            size, stored = conn.execute("SELECT COUNT(*), COALESCE(SUM(LENGTH(value)), 0) FROM problems").fetchone()
+        return {"path": self.path, "size": size, "bytes": stored, "hits": self.hits, "misses": self.misses}
+
+    def close(self) -> None:
+        conn = self._db.get()
+        with self._db.lock:
+            if not self.readonly:
+                conn.commit()
+        self._db.close()
+
+def open_precomputed(path: Optional[str] = PRECOMPUTED_PATH) -> Optional[PrecomputedStore]:
+    if not path or not os.path.exists(path):
+        return None
+    return PrecomputedStore(path, readonly=True)
+
+precomputed = open_precomputed()
+
+def lookup(key: str) -> Optional[Any]:
+    return precomputed.get(key) if precomputed is not None else None
+
+def _precomputed_stats():
+    if precomputed is None:
+        return []
+    return [({"event": "hits"}, precomputed.hits), ({"event": "misses"}, precomputed.misses)]
+
+CallbackMetric(
+    "workbook_precomputed_events_total", "Lookups in the precomputed problem store.", "counter", ["event"],
+    _precomputed_stats,
+)
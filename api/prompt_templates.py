@@ -0,0 +1,64 @@
+import hashlib
+import json
+import re
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# 프롬프트 템플릿을 파일에서 한 번 읽어 {{이름}} 자리 기준으로 조각 목록으로 나눠 둔다.
+# 렌더링은 조각과 값을 번갈아 한 번 join 하므로, 자리마다 프롬프트 전체를 replace 로 다시 훑지 않는다.
+# 넣은 값 안에 {{...}} 가 있어도 다시 치환하지 않는다 (예전의 키별 str.replace 는 뒤에 오는 키로 이어서 치환했다).
+
+PLACEHOLDER_RE = re.compile(r"\{\{(\w+)\}\}")
+
+class PromptTemplate:
+    __slots__ = ("key", "source", "literals", "names", "hash")
+
+    def __init__(self, key: str, source: str):
+        self.key = key
+        self.source = source
+        # split 결과는 [문자열, 이름, 문자열, 이름, ..., 문자열] 이므로 literals 가 names 보다 하나 많다
+        parts = PLACEHOLDER_RE.split(source)
+        self.literals: Tuple[str, ...] = tuple(parts[0::2])
+        self.names: Tuple[str, ...] = tuple(parts[1::2])
+        self.hash = hashlib.sha256(source.encode("utf-8")).hexdigest()[:16]
+
+    def render(self, values: Dict[str, str]) -> str:
+        pieces: List[str] = [self.literals[0]]
+        for name, literal in zip(self.names, self.literals[1:]):
+            # 값이 없는 자리는 {{이름}} 그대로 남긴다
+            value = values.get(name)
+            pieces.append(value if value is not None else "{{" + name + "}}")
+            pieces.append(literal)
+        return "".join(pieces)
+
+class PromptSet:
+    def __init__(self, version: str, sources: Dict[str, str], path: Optional[str] = None):
+        self.version = version
+        self.path = path
+        self.templates: Dict[str, PromptTemplate] = {key: PromptTemplate(key, text) for key, text in sources.items()}
+
+    def __getitem__(self, key: str) -> PromptTemplate:
+        return self.templates[key]
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.templates
+
+    def render(self, key: str, values: Dict[str, str]) -> str:
+        return self.templates[key].render(values)
+
+    def sources(self) -> Dict[str, str]:
+        return {key: template.source for key, template in self.templates.items()}
+
+    def hashes(self) -> Dict[str, str]:
+        return {key: template.hash for key, template in self.templates.items()}
+
+    def version_hash(self, keys: Iterable[str]) -> str:
+        # 지정한 템플릿들의 내용으로 정해지는 버전 (캐시 키에 넣는다)
+        digest = hashlib.sha256()
+        for key in keys:
+            digest.update(key.encode("utf-8") + b"\0" + self.templates[key].source.encode("utf-8") + b"\0")
+        return digest.hexdigest()[:16]
+
+def load_prompt_set(path: str) -> PromptSet:
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    return PromptSet(str(data["version"]), data["prompts"], path)
@@ -0,0 +1,178 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import unicodedata
+import weakref
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional
+
+def normalize_passage(text: str) -> str:
+    text = unicodedata.normalize("NFC", text).replace("\r\n", "\n").replace("\r", "\n")
+    lines = (" ".join(line.split()) for line in text.split("\n"))
+    return "\n".join(line for line in lines if line)
+
+def result_key(*parts: str) -> str:
+    return hashlib.sha256("\0".join(parts).encode("utf-8")).hexdigest()
+
+class SQLiteConnection:
+    # 프로세스마다 따로 여는 SQLite 연결. SQLite 연결은 fork 를 건너 함께 쓰면 안 되므로
+    # (serve.py 는 main 을 불러온 뒤 워커를 fork 한다) fork 된 자식에서는 처음 쓸 때 새로 연다.
+    # 부모에게서 물려받은 연결은 자식에서 닫지 않고 참조만 남겨 둔다 (닫으면 부모의 파일 잠금 상태를 건드릴 수 있다).
+    # lock 도 fork 때 다른 스레드가 잡고 있었을 수 있으므로 자식에서 새로 만든다.
+
+    def __init__(self, connect: Callable[[], sqlite3.Connection]):
+        self._connect = connect
+        self._conn: Optional[sqlite3.Connection] = None
+        self._inherited: List[sqlite3.Connection] = []
+        self.lock = threading.Lock()
+        self._open_lock = threading.Lock()
+        _connections.add(self)
+
+    def get(self) -> sqlite3.Connection:
+        if self._conn is None:
+            with self._open_lock:
+                if self._conn is None:
+                    self._conn = self._connect()
+        return self._conn
+
+    def close(self) -> None:
+        with self._open_lock:
+            conn, self._conn = self._conn, None
+        if conn is not None:
+            conn.close()
+
+    def _after_fork(self) -> None:
+        if self._conn is not None:
+            self._inherited.append(self._conn)
+            self._conn = None
+        self.lock = threading.Lock()
+        self._open_lock = threading.Lock()
+
+_connections: "weakref.WeakSet[SQLiteConnection]" = weakref.WeakSet()
+
+def _reset_connections_after_fork() -> None:
+    for connection in list(_connections):
+        connection._after_fork()
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_connections_after_fork)
+
+class MemoryResultCache:
+    def __init__(self, ttl: float, max_entries: int):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._items: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            item = self._items.get(key)
+            if item is None or item[0] < time.time():
+                if item is not None:
+                    del self._items[key]
+                self.misses += 1
+                return None
+            self._items.move_to_end(key)
+            self.hits += 1
+            return item[1]
+
+    def set(self, key: str, value: Dict[str, Any]) -> None:
+        with self._lock:
+            self._items[key] = (time.time() + self.ttl, value)
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_entries:
+                self._items.popitem(last=False)
+                self.evictions += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            size = len(self._items)
+        return {"backend": "memory", "size": size, "max_entries": self.max_entries, "ttl": self.ttl,
+                "hits": self.hits, "misses": self.misses, "evictions": self.evictions}
+
+class SQLiteResultCache:
+    def __init__(self, path: str, ttl: float, max_entries: int, touch_interval: float = 60.0):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        # 적중할 때마다 accessed 를 쓰면 캐시 적중마다 쓰기 트랜잭션이 생기므로,
+        # 저장된 값이 touch_interval 초보다 오래됐을 때만 고친다 (교체 순서는 그만큼 거칠어진다)
+        self.touch_interval = touch_interval
+        self._db = SQLiteConnection(self._connect)
+        # 경로가 잘못되었으면 시작할 때 바로 알 수 있도록 이 프로세스의 연결은 지금 연다
+        self._db.get()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            " key TEXT PRIMARY KEY, value TEXT NOT NULL, expires REAL NOT NULL, accessed REAL NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS results_accessed ON results (accessed)")
+        conn.commit()
+        return conn
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        now = time.time()
+        conn = self._db.get()
+        with self._db.lock:
+            row = conn.execute("SELECT value, expires, accessed FROM results WHERE key = ?", (key,)).fetchone()
+            if row is None or row[1] < now:
+                if row is not None:
+                    conn.execute("DELETE FROM results WHERE key = ?", (key,))
+                    conn.commit()
+                self.misses += 1
+                return None
+            if now - row[2] >= self.touch_interval:
+                conn.execute("UPDATE results SET accessed = ? WHERE key = ?", (now, key))
+                conn.commit()
+            self.hits += 1
+        return json.loads(row[0])
+
+    def set(self, key: str, value: Dict[str, Any]) -> None:
+        now = time.time()
+        conn = self._db.get()
+        with self._db.lock:
+            conn.execute(
+                "INSERT OR REPLACE INTO results (key, value, expires, accessed) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value, ensure_ascii=False), now + self.ttl, now),
+            )
+            conn.execute("DELETE FROM results WHERE expires < ?", (now,))
+            overflow = conn.execute("SELECT COUNT(*) FROM results").fetchone()[0] - self.max_entries
+            if overflow > 0:
+                conn.execute(
+                    "DELETE FROM results WHERE key IN (SELECT key FROM results ORDER BY accessed LIMIT ?)",
+                    (overflow,),
+                )
+                self.evictions += overflow
+            conn.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        conn = self._db.get()
+        with self._db.lock:
+            size = conn.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+        return {"backend": "sqlite", "path": self.path, "size": size, "max_entries": self.max_entries,
+                "ttl": self.ttl, "hits": self.hits, "misses": self.misses, "evictions": self.evictions}
+
+def make_result_cache():
+    backend = os.getenv("GENERATE_CACHE_BACKEND", "memory")
+    ttl = float(os.getenv("GENERATE_CACHE_TTL", str(7 * 24 * 3600)))
+    max_entries = int(os.getenv("GENERATE_CACHE_SIZE", "10000"))
+    if backend == "sqlite":
+        touch_interval = float(os.getenv("GENERATE_CACHE_TOUCH_INTERVAL", "60"))
+        return SQLiteResultCache(
+            os.getenv("GENERATE_CACHE_PATH", "generate_cache.sqlite3"), ttl, max_entries, touch_interval,
+        )
+    if backend == "memory":
+        return MemoryResultCache(ttl, max_entries)
+    return None
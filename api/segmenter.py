@@ -0,0 +1,82 @@
+import re
+from typing import Dict, List, Optional, Sequence, Tuple
+
+SENTENCE_RE = re.compile(r"[^.!?]+[.!?]+")
+
+def normalize_newlines(text: str) -> str:
+    return text.replace("\r\n", " ").replace("\r", " ").replace("\n", " ")
+
+def segment(text: str) -> Tuple[str, List[str], List[Tuple[int, int]]]:
+    text = normalize_newlines(text)
+    sentences, spans = [], []
+    for m in SENTENCE_RE.finditer(text):
+        raw = m.group()
+        stripped = raw.strip()
+        start = m.start() + (len(raw) - len(raw.lstrip()))
+        sentences.append(stripped)
+        spans.append((start, start + len(stripped)))
+    return text, sentences, spans
+
+def split_paragraph_into_sentences(text: str) -> List[str]:
+    return segment(text)[1]
+
+class JoinedSentences:
+    # 문장들을 공백 하나로 한 번만 이어 붙이고 각 문장의 시작 위치를 기록해 둔다.
+    # join(a, b) 는 " ".join(sentences[a:b]) 와 같은 문자열을 슬라이스 한 번으로 돌려준다.
+
+    def __init__(self, sentences: Sequence[str]):
+        self.text = " ".join(sentences)
+        self.starts = []
+        pos = 0
+        for sentence in sentences:
+            self.starts.append(pos)
+            pos += len(sentence) + 1
+        self.starts.append(pos)
+
+    def join(self, start: int, end: int) -> str:
+        if start >= end:
+            return ""
+        return self.text[self.starts[start]:self.starts[end] - 1]
+
+class Passage:
+    # 한 지문을 한 번만 나누고(필요하면 한 번만 파싱해서) 모든 문제 유형이 같이 쓰는 객체.
+    # spans 는 줄바꿈을 공백으로 바꾼 self.text 기준의 (시작, 끝) 문자 위치다.
+
+    def __init__(self, text: str):
+        self.text, self.sentences, self.spans = segment(text)
+        self.numbers = list(range(1, len(self.sentences) + 1))
+        self._docs: Dict[str, List] = {}
+
+    @classmethod
+    def from_sentences(cls, sentences: Sequence[str], numbers: Optional[Sequence[int]] = None) -> "Passage":
+        # vocablanks 처럼 이미 문장 단위로 나뉘어 들어오는 입력용 (문장 원문을 그대로 유지)
+        passage = cls.__new__(cls)
+        passage.sentences = list(sentences)
+        passage.numbers = list(numbers) if numbers is not None else list(range(1, len(passage.sentences) + 1))
+        passage.spans = []
+        offset = 0
+        for sentence in passage.sentences:
+            passage.spans.append((offset, offset + len(sentence)))
+            offset += len(sentence) + 1
+        passage.text = " ".join(passage.sentences)
+        passage._docs = {}
+        return passage
+
+    def __len__(self) -> int:
+        return len(self.sentences)
+
+    def numbered(self) -> List[Dict[str, object]]:
+        return [{"num": num, "text": text} for num, text in zip(self.numbers, self.sentences)]
+
+    def docs(self, profile: str, batch_size: Optional[int] = None, n_process: Optional[int] = None) -> List:
+        # spaCy 를 쓰지 않는 유형(inserting, ordering)은 모델 모듈을 불러오지 않도록 여기서 import
+        from api.nlp import PROFILES, parse_many
+
+        # 더 적은 컴포넌트를 끈 프로필로 이미 파싱했다면 그 Doc을 그대로 재사용한다
+        needed = set(PROFILES[profile])
+        for parsed_profile, docs in self._docs.items():
+            if set(PROFILES[parsed_profile]) <= needed:
+                return docs
+        docs = parse_many(self.sentences, profile, batch_size, n_process)
+        self._docs[profile] = docs
+        return docs
@@ -0,0 +1,68 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Generic, Tuple, TypeVar
+
+from api.metrics import CallbackMetric, Counter
+
+# 같은 키의 작업이 이미 돌고 있으면 새로 시작하지 않고 그 결과를 같이 기다린다 (single-flight).
+# 작업은 처음 요청한 쪽(leader)과 분리된 태스크로 돌기 때문에 leader 가 끊겨도 기다리는 요청이 남아 있으면
+# 계속 돌고, 기다리는 요청이 모두 떠나면 취소한다. 실패도 기다리던 요청 모두에게 그대로 전해진다.
+# 한 이벤트 루프(워커 프로세스) 안에서만 합쳐진다.
+
+T = TypeVar("T")
+
+SINGLEFLIGHT_SHARED = Counter(
+    "workbook_singleflight_shared_total", "Requests that joined an identical in-flight call instead of starting one.",
+    ["name"],
+)
+
+class _Call:
+    __slots__ = ("task", "context", "waiters")
+
+    def __init__(self, task: asyncio.Future, context: Any):
+        self.task = task
+        self.context = context
+        self.waiters = 0
+
+class SingleFlight(Generic[T]):
+    def __init__(self, name: str):
+        self.name = name
+        self._calls: Dict[str, _Call] = {}
+        CallbackMetric(
+            "workbook_singleflight_in_flight", "Distinct calls currently in flight.", "gauge", ["name"],
+            lambda: [({"name": self.name}, len(self._calls))],
+        )
+
+    def context(self, key: str) -> Any:
+        # 진행 중인 작업을 시작할 때 넘긴 context (없으면 None). 같은 틱 안에서 do 를 부르면 그 작업에 합류한다.
+        call = self._calls.get(key)
+        return call.context if call is not None else None
+
+    def _forget(self, key: str, call: _Call) -> None:
+        # 취소한 작업이 끝나기 전에 같은 키로 새 작업이 시작됐을 수 있으므로 자기 항목만 지운다
+        if self._calls.get(key) is call:
+            del self._calls[key]
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[T]], context: Any = None) -> Tuple[T, bool]:
+        # (결과, 다른 요청이 시작한 작업에 합류했는지)
+        call = self._calls.get(key)
+        shared = call is not None
+        if call is None:
+            call = _Call(asyncio.ensure_future(fn()), context)
+            self._calls[key] = call
+            call.task.add_done_callback(lambda _: self._forget(key, call))
+        else:
+            SINGLEFLIGHT_SHARED.inc(name=self.name)
+        call.waiters += 1
+        try:
+            # shield: 기다리던 요청 하나가 취소되어도 공유 작업은 취소되지 않는다
+            return await asyncio.shield(call.task), shared
+        finally:
+            call.waiters -= 1
+            if call.waiters == 0 and not call.task.done():
+                # 취소가 끝나기를 기다리는 동안(cachedContents 정리 등) 들어온 같은 요청이
+                # 취소된 작업에 합류하지 않도록 먼저 목록에서 뺀다
+                self._forget(key, call)
+                call.task.cancel()
+
+    def in_flight(self) -> int:
+        return len(self._calls)
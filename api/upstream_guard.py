@@ -0,0 +1,211 @@
+import asyncio
+import math
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Optional, Tuple
+
+from fastapi import HTTPException
+
+from api.metrics import CallbackMetric, Counter, Gauge
+
+# Gemini 앞단 보호 장치 (프로세스 전체에서 하나를 공유한다).
+# - 분당 요청 수(rpm)/토큰 수(tpm) 토큰 버킷: 자리가 없으면 기다릴 시간을 미리 예약해 두고 그만큼 잔다.
+#   예약한 순서대로 깨어나므로 먼저 온 요청이 먼저 나간다. 기다릴 시간이 max_wait 를 넘거나
+#   이미 기다리는 요청이 max_waiters 개면 바로 429 로 돌려보낸다.
+# - 서킷 브레이커: 최근 window 초 동안 min_calls 번 이상 호출했고 실패율이 error_rate 이상이면
+#   cooldown 초 동안 열어 503 으로 즉시 실패시키고, 그 뒤 한 번만 시험 호출(half-open)해 닫을지 정한다.
+
+GEMINI_RPM = float(os.getenv("GEMINI_RPM", "0"))  # 0 이면 제한 없음 (요금제 한도에 맞춰 설정)
+GEMINI_TPM = float(os.getenv("GEMINI_TPM", "0"))
+GEMINI_QUEUE_SIZE = int(os.getenv("GEMINI_QUEUE_SIZE", "64"))
+GEMINI_QUEUE_TIMEOUT = float(os.getenv("GEMINI_QUEUE_TIMEOUT", "30"))
+GEMINI_BREAKER_ERROR_RATE = float(os.getenv("GEMINI_BREAKER_ERROR_RATE", "0.5"))
+GEMINI_BREAKER_MIN_CALLS = int(os.getenv("GEMINI_BREAKER_MIN_CALLS", "10"))
+GEMINI_BREAKER_WINDOW = float(os.getenv("GEMINI_BREAKER_WINDOW", "30"))
+GEMINI_BREAKER_COOLDOWN = float(os.getenv("GEMINI_BREAKER_COOLDOWN", "15"))
+# 응답 길이를 모르는 채로 tpm 을 예약하므로 출력 토큰은 이만큼으로 잡고, 응답의 usageMetadata 로 정산한다
+GEMINI_EXPECTED_OUTPUT_TOKENS = int(os.getenv("GEMINI_EXPECTED_OUTPUT_TOKENS", "256"))
+
+GUARD_WAITING = Gauge("workbook_gemini_queue_waiting", "Gemini calls waiting for rate limiter capacity.")
+GUARD_REJECTED = Counter(
+    "workbook_gemini_rejected_total", "Gemini calls rejected before reaching upstream.", ["reason"]
+)
+
+CLOSED, HALF_OPEN, OPEN = "closed", "half_open", "open"
+
+class TokenBucket:
+    # per_minute 만큼 채워지고 최대 per_minute 까지 쌓인다. 예약은 잔량을 음수로 만들 수 있다 (그만큼 뒤 요청이 기다린다).
+
+    def __init__(self, per_minute: float):
+        self.capacity = per_minute
+        self.rate = per_minute / 60.0
+        self.tokens = per_minute
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_for(self, amount: float, now: float) -> float:
+        self._refill(now)
+        # 한 번에 용량보다 큰 양은 가득 찬 버킷만큼만 요구한다 (영원히 기다리지 않도록)
+        amount = min(amount, self.capacity)
+        return max(0.0, (amount - self.tokens) / self.rate)
+
+    def take(self, amount: float) -> None:
+        self.tokens -= min(amount, self.capacity)
+
+    def give_back(self, amount: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + amount)
+
+class CircuitBreaker:
+    def __init__(self, error_rate: float, min_calls: int, window: float, cooldown: float):
+        self.error_rate = error_rate
+        self.min_calls = min_calls
+        self.window = window
+        self.cooldown = cooldown
+        self.state = CLOSED
+        self.opened_at = 0.0
+        self._outcomes: Deque[Tuple[float, bool]] = deque()
+        self._probing = False
+
+    def retry_after(self, now: float) -> float:
+        return max(0.0, self.opened_at + self.cooldown - now)
+
+    def allow(self, now: float) -> bool:
+        if self.state == OPEN:
+            if self.retry_after(now) > 0:
+                return False
+            self.state = HALF_OPEN
+            self._probing = False
+        if self.state == HALF_OPEN:
+            if self._probing:
+                return False
+            self._probing = True
+        return True
+
+    def release_probe(self) -> None:
+        # half-open 시험 호출로 뽑혔지만 결과 없이 끝났으면 (거절/취소) 다음 요청이 시험할 수 있게 한다
+        if self.state == HALF_OPEN:
+            self._probing = False
+
+    def record(self, ok: bool, now: float) -> None:
+        if self.state == HALF_OPEN:
+            self._outcomes.clear()
+            self._probing = False
+            if ok:
+                self.state = CLOSED
+            else:
+                self.state, self.opened_at = OPEN, now
+            return
+        self._outcomes.append((now, ok))
+        while self._outcomes and self._outcomes[0][0] < now - self.window:
+            self._outcomes.popleft()
+        failures = sum(1 for _, success in self._outcomes if not success)
+        if len(self._outcomes) >= self.min_calls and failures / len(self._outcomes) >= self.error_rate:
+            self.state, self.opened_at = OPEN, now
+            self._outcomes.clear()
+
+class UpstreamGuard:
+    def __init__(
+        self,
+        rpm: float = GEMINI_RPM,
+        tpm: float = GEMINI_TPM,
+        max_waiters: int = GEMINI_QUEUE_SIZE,
+        max_wait: float = GEMINI_QUEUE_TIMEOUT,
+        breaker: Optional[CircuitBreaker] = None,
+    ):
+        self.requests = TokenBucket(rpm) if rpm > 0 else None
+        self.tokens = TokenBucket(tpm) if tpm > 0 else None
+        self.max_waiters = max_waiters
+        self.max_wait = max_wait
+        self.breaker = breaker or CircuitBreaker(
+            GEMINI_BREAKER_ERROR_RATE, GEMINI_BREAKER_MIN_CALLS, GEMINI_BREAKER_WINDOW, GEMINI_BREAKER_COOLDOWN
+        )
+        self.waiting = 0
+        self._lock = threading.Lock()
+
+    def _reject(self, status_code: int, reason: str, retry_after: float, detail: str) -> HTTPException:
+        GUARD_REJECTED.inc(reason=reason)
+        return HTTPException(
+            status_code=status_code, detail=detail, headers={"Retry-After": str(max(1, math.ceil(retry_after)))}
+        )
+
+    async def admit(self, estimated_tokens: int) -> None:
+        # 호출 한 번(재시도 한 번 포함)을 내보내기 전에 부른다. 거절하면 HTTPException 을 던진다.
+        with self._lock:
+            now = time.monotonic()
+            if not self.breaker.allow(now):
+                raise self._reject(
+                    503, "circuit_open", self.breaker.retry_after(now),
+                    "문제 생성 서버가 불안정해 잠시 요청을 받지 않습니다. 잠시 후 다시 시도해 주세요.",
+                )
+            wait = 0.0
+            if self.requests is not None:
+                wait = max(wait, self.requests.wait_for(1, now))
+            if self.tokens is not None:
+                wait = max(wait, self.tokens.wait_for(estimated_tokens, now))
+            if wait > 0 and (self.waiting >= self.max_waiters or wait > self.max_wait):
+                self.breaker.release_probe()
+                raise self._reject(429, "queue_full", wait, "요청이 많아 잠시 후 다시 시도해 주세요.")
+            if self.requests is not None:
+                self.requests.take(1)
+            if self.tokens is not None:
+                self.tokens.take(estimated_tokens)
+            if wait > 0:
+                self.waiting += 1
+        if wait <= 0:
+            return
+        GUARD_WAITING.inc()
+        try:
+            await asyncio.sleep(wait)
+        finally:
+            GUARD_WAITING.dec()
+            with self._lock:
+                self.waiting -= 1
+
+    def record(self, ok: bool) -> None:
+        with self._lock:
+            self.breaker.record(ok, time.monotonic())
+
+    def release(self) -> None:
+        # admit 를 통과했지만 결과를 기록하지 못하고 끝난 호출 (취소 등)
+        with self._lock:
+            self.breaker.release_probe()
+
+    def settle(self, estimated_tokens: int, usage: Optional[Dict[str, int]]) -> None:
+        # 예약한 토큰 수와 실제 사용량(usageMetadata)의 차이를 tpm 버킷에 돌려주거나 더 뺀다
+        if self.tokens is None or not usage:
+            return
+        actual = usage.get("totalTokenCount") or usage.get("promptTokenCount", 0) + usage.get("candidatesTokenCount", 0)
+        with self._lock:
+            if actual < estimated_tokens:
+                self.tokens.give_back(estimated_tokens - actual)
+            else:
+                self.tokens.take(actual - estimated_tokens)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "circuit": self.breaker.state,
+                "waiting": self.waiting,
+                "rpm_available": round(self.requests.tokens, 1) if self.requests is not None else None,
+                "tpm_available": round(self.tokens.tokens, 1) if self.tokens is not None else None,
+            }
+
+def estimate_text_tokens(text: str) -> int:
+    # 실제 토크나이저 없이 네 글자당 한 토큰으로 잡는다
+    return len(text) // 4
+
+def estimate_tokens(body: Dict[str, Any]) -> int:
+    text = "".join(part.get("text", "") for content in body.get("contents", []) for part in content.get("parts", []))
+    return estimate_text_tokens(text) + GEMINI_EXPECTED_OUTPUT_TOKENS
+
+upstream_guard = UpstreamGuard()
+
+CallbackMetric(
+    "workbook_gemini_circuit_state", "Gemini circuit breaker state (0 closed, 1 half-open, 2 open).", "gauge", [],
+    lambda: [({}, {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}[upstream_guard.breaker.state])],
+)
@@ -0,0 +1,179 @@
+import argparse
+import json
+import os
+import threading
+from collections import Counter, defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from api.metrics import Counter as MetricCounter
+from api.nlp import get_nlp, model_version, parse_many
+from api.segmenter import Passage
+
+# /verbrewrite 의 빠른 경로: spaCy 파이프라인(tok2vec/tagger/lemmatizer)을 돌리지 않고
+# 토크나이저로 자른 단어를 미리 만들어 둔 어휘집에서 찾아 품사/태그/원형을 채운다.
+# 어휘집은 말뭉치를 실제 모델로 분석해 만들며, 단어 형태만 보고 고르므로 문맥에 따라 분석이 달라질 수 있는
+# 단어는 넣지 않는다: 충분히 여러 문맥(앞뒤 단어)에서 나왔고, 그때마다 문제에 필요한 정보(동사인지,
+# be 조동사인지, VBN/VBG 인지, 원형)뿐 아니라 원래 품사/세부 태그까지 늘 같았던 단어만 담는다.
+# 한 문장에 어휘집에 없는 단어가 하나라도 있으면 그 문장은 전체 파이프라인으로 분석한다.
+#
+#   python -m api.verb_lexicon passages.jsonl          # api/data/verb_lexicon.json 에 쓴다
+
+VERB_LEXICON_PATH = os.getenv(
+    "VERB_LEXICON_PATH", os.path.join(os.path.dirname(__file__), "data", "verb_lexicon.json")
+)
+# 이보다 적은 문맥(서로 다른 앞뒤 단어 쌍)에서 나온 단어는 모호한지 판단할 근거가 부족하므로 넣지 않는다
+VERB_LEXICON_MIN_COUNT = int(os.getenv("VERB_LEXICON_MIN_COUNT", "5"))
+
+FAST_SENTENCES = MetricCounter(
+    "workbook_verbrewrite_fast_sentences_total",
+    "Sentences handled by the verbrewrite lexicon fast path or sent back to spaCy.", ["result"],
+)
+
+# (텍스트, 품사, 세부 태그, 원형) — rewrite_tokens 가 읽는 형태
+Analysis = Tuple[str, str, str, str]
+# 어휘집 값: (AUX/VERB/"", VBN/VBG/"", 원형 또는 "")
+Signature = Tuple[str, str, str]
+
+def signature(pos: str, tag: str, lemma: str) -> Signature:
+    # 문제 생성 결과에 영향을 주는 부분만 남긴다 (명사/형용사 등은 모두 같은 값이 된다)
+    pos_class = pos if pos in ("AUX", "VERB") else ""
+    tag_class = tag if tag in ("VBN", "VBG") else ""
+    return pos_class, tag_class, lemma if pos_class or tag_class else ""
+
+def doc_analyses(doc) -> List[Analysis]:
+    return [(tok.text, tok.pos_, tok.tag_, tok.lemma_) for tok in doc]
+
+class VerbLexicon:
+    def __init__(self, forms: Dict[str, Signature], model: Optional[str] = None, path: Optional[str] = None):
+        self.forms = forms
+        self.model = model or model_version()
+        self.path = path
+
+    def analyze(self, tokens) -> Optional[List[Analysis]]:
+        # 토크나이저 결과를 분석으로 바꾼다. 모르는 단어가 있으면 None (전체 파이프라인으로 넘긴다)
+        analyses = []
+        forms = self.forms
+        for tok in tokens:
+            if tok.is_punct or tok.is_space or tok.like_num:
+                analyses.append((tok.text, "", "", ""))
+                continue
+            found = forms.get(tok.lower_)
+            if found is None:
+                return None
+            analyses.append((tok.text,) + found)
+        return analyses
+
+    def to_json(self) -> Dict[str, object]:
+        return {"model": self.model, "forms": {form: list(sig) for form, sig in sorted(self.forms.items())}}
+
+def build_lexicon(texts: Iterable[str], min_count: int = VERB_LEXICON_MIN_COUNT) -> Tuple[VerbLexicon, Dict[str, int]]:
+    signatures: Dict[str, Counter] = defaultdict(Counter)
+    # 원래 (품사, 세부 태그): signature 는 NOUN/ADJ, VB/VBD/VBZ 등을 하나로 합치므로 그 차이는 여기서 본다
+    raw: Dict[str, set] = defaultdict(set)
+    contexts: Dict[str, set] = defaultdict(set)
+    for doc in parse_many(texts, "verbrewrite"):
+        for tok in doc:
+            form = tok.lower_
+            signatures[form][signature(tok.pos_, tok.tag_, tok.lemma_)] += 1
+            raw[form].add((tok.pos_, tok.tag_))
+            before = doc[tok.i - 1].lower_ if tok.i > 0 else ""
+            after = doc[tok.i + 1].lower_ if tok.i + 1 < len(doc) else ""
+            contexts[form].add((before, after))
+    forms: Dict[str, Signature] = {}
+    stats = {"forms_seen": len(signatures), "ambiguous": 0, "context_dependent": 0, "rare": 0}
+    for form, counts in signatures.items():
+        if len(counts) > 1:
+            stats["ambiguous"] += 1
+        elif len(raw[form]) > 1:
+            # 결과는 같았더라도 문맥에 따라 품사/태그가 갈린 단어는 다른 문맥에서 결과도 갈릴 수 있다
+            stats["context_dependent"] += 1
+        elif len(contexts[form]) < min_count:
+            stats["rare"] += 1
+        else:
+            forms[form] = next(iter(counts))
+    stats["forms_kept"] = len(forms)
+    return VerbLexicon(forms), stats
+
+def load_lexicon(path: str = VERB_LEXICON_PATH) -> Optional[VerbLexicon]:
+    if not path or not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    # 다른 모델(또는 다른 버전의 모델/spaCy)로 만든 어휘집은 결과가 달라지므로 쓰지 않는다
+    if data.get("model") != model_version():
+        return None
+    return VerbLexicon({form: tuple(sig) for form, sig in data["forms"].items()}, data["model"], path)
+
+_lexicon: Optional[VerbLexicon] = None
+_lexicon_loaded = False
+_lock = threading.Lock()
+
+def get_lexicon() -> Optional[VerbLexicon]:
+    global _lexicon, _lexicon_loaded
+    if not _lexicon_loaded:
+        with _lock:
+            if not _lexicon_loaded:
+                _lexicon = load_lexicon()
+                _lexicon_loaded = True
+    return _lexicon
+
+def set_lexicon(lexicon: Optional[VerbLexicon]) -> None:
+    global _lexicon, _lexicon_loaded
+    with _lock:
+        _lexicon, _lexicon_loaded = lexicon, True
+
+def analyze_fast(
+    texts: List[str],
+    batch_size: Optional[int] = None,
+    n_process: Optional[int] = None,
+) -> List[List[Analysis]]:
+    lexicon = get_lexicon()
+    if lexicon is None:
+        analyses: List[Optional[List[Analysis]]] = [None] * len(texts)
+    else:
+        tokenizer = get_nlp().tokenizer
+        analyses = [lexicon.analyze(tokenizer(text)) for text in texts]
+    fallback = [i for i, found in enumerate(analyses) if found is None]
+    if fallback:
+        docs = parse_many((texts[i] for i in fallback), "verbrewrite", batch_size, n_process)
+        for i, doc in zip(fallback, docs):
+            analyses[i] = doc_analyses(doc)
+    FAST_SENTENCES.inc(len(texts) - len(fallback), result="lexicon")
+    FAST_SENTENCES.inc(len(fallback), result="fallback")
+    return analyses
+
+def iter_texts(source: str) -> Iterable[str]:
+    # precompute.py 와 같은 입력: *.txt 가 든 디렉터리 또는 한 줄에 {"text": ...} 인 JSONL
+    if os.path.isdir(source):
+        for name in sorted(os.listdir(source)):
+            if name.endswith(".txt"):
+                with open(os.path.join(source, name), encoding="utf-8") as f:
+                    yield f.read()
+        return
+    with open(source, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)["text"]
+
+def passage_sentences(texts: Iterable[str]) -> List[str]:
+    # API 와 같은 문장 분리를 거친 문장 단위로 분석해야 같은 결과를 얻는다
+    return [sentence for text in texts for sentence in Passage(text).sentences]
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the verbrewrite fast-path lexicon from a passage corpus.")
+    parser.add_argument("input", help="directory of *.txt passages or a JSONL file with {text} per line")
+    parser.add_argument("--out", default=VERB_LEXICON_PATH)
+    parser.add_argument("--min-count", type=int, default=VERB_LEXICON_MIN_COUNT)
+    args = parser.parse_args()
+
+    lexicon, stats = build_lexicon(passage_sentences(iter_texts(args.input)), args.min_count)
+    os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(lexicon.to_json(), f, ensure_ascii=False, separators=(",", ":"))
+    print(
+        f"{stats['forms_kept']} forms kept of {stats['forms_seen']} ({stats['ambiguous']} ambiguous, "
+        f"{stats['context_dependent']} context-dependent, {stats['rare']} below --min-count contexts) -> {args.out}"
+    )
+
+if __name__ == "__main__":
+    main()
@@ -1,54 +1,82 @@
-import re
-import spacy
+import os
+
 from fastapi import APIRouter
 from pydantic import BaseModel
-from typing import List, Dict
+from typing import List, Dict, Literal, Optional, Sequence, Tuple
 
-nlp = spacy.load("en_core_web_sm")
+from api.metrics import timed
+from api.nlp import model_version, parse_many
+from api.nlp_pool import nlp_pool
+from api.precomputed import lookup, passage_key
+from api.segmenter import Passage
+from api.verb_lexicon import Analysis, analyze_fast, doc_analyses
 
 router = APIRouter()
 
+# full: spaCy 파이프라인으로 모든 문장을 분석한다.
+# fast: 어휘집(api/verb_lexicon.py)으로 찾을 수 있는 문장은 토크나이저만 쓰고, 나머지만 spaCy 로 분석한다.
+VERBREWRITE_ENGINE = os.getenv("VERBREWRITE_ENGINE", "full")
+
 class TextPayload(BaseModel):
     text: str
+    engine: Literal["full", "fast"] = VERBREWRITE_ENGINE
 
-def split_paragraph_into_sentences(text: str) -> List[str]:
-    text = text.replace("\r", " ").replace("\n", " ")
-    return re.findall(r"[^.!?]+[.!?]+", text)
+# 문제를 만드는 방식이 바뀌면 올린다. 결과는 spaCy 모델에 따라서도 달라지므로 키에 모델 이름도 넣는다.
+GENERATOR_VERSION = "1"
 
-def generate_verbrewrite(sentences: List[Dict[str, str]]) -> Dict[str, str]:
-    problems = []
-    answers = []
+def rewrite_tokens(tokens: Sequence[Analysis]) -> Tuple[List[str], List[str]]:
+    # tokens 는 (텍스트, 품사, 세부 태그, 원형) 목록 (spaCy Doc 이든 어휘집이든 같은 규칙을 쓴다)
+    new_tokens = []
+    original_verbs = []
+    i = 0
 
-    for item in sentences:
-        doc = nlp(item["text"])
-        new_tokens = []
-        original_verbs = []
-        i = 0
-
-        while i < len(doc):
-            tok = doc[i]
-
-            if tok.lemma_ == "be" and tok.pos_ == "AUX":
-                next_tok = doc[i + 1] if i + 1 < len(doc) else None
-                if next_tok and next_tok.tag_ in ("VBN", "VBG"):
-                    new_tokens.append(f"({next_tok.lemma_})")
-                    original_verbs.append(f"{tok.text} {next_tok.text}")
-                    i += 2
-                    continue
-                else:
-                    new_tokens.append(f"({tok.lemma_})")
-                    original_verbs.append(tok.text)
-                    i += 1
-                    continue
-
-            elif tok.pos_ == "VERB":
-                new_tokens.append(f"({tok.lemma_})")
-                original_verbs.append(tok.text)
+    while i < len(tokens):
+        text, pos, tag, lemma = tokens[i]
+
+        if lemma == "be" and pos == "AUX":
+            next_tok = tokens[i + 1] if i + 1 < len(tokens) else None
+            if next_tok and next_tok[2] in ("VBN", "VBG"):
+                new_tokens.append(f"({next_tok[3]})")
+                original_verbs.append(f"{text} {next_tok[0]}")
+                i += 2
+                continue
             else:
-                new_tokens.append(tok.text)
+                new_tokens.append(f"({lemma})")
+                original_verbs.append(text)
+                i += 1
+                continue
+
+        elif pos == "VERB":
+            new_tokens.append(f"({lemma})")
+            original_verbs.append(text)
+        else:
+            new_tokens.append(text)
 
-            i += 1
+        i += 1
 
+    return new_tokens, original_verbs
+
+@timed("generator.verbrewrite")
+def generate_verbrewrite(
+    sentences: List[Dict[str, str]],
+    batch_size: Optional[int] = None,
+    n_process: Optional[int] = None,
+    docs: Optional[List] = None,
+    engine: str = "full",
+) -> Dict[str, str]:
+    problems = []
+    answers = []
+
+    # 여러 유형을 한 번에 만들 때는 이미 파싱된 Doc을 넘겨받아 그대로 쓴다
+    if docs is not None:
+        analyses = [doc_analyses(doc) for doc in docs]
+    elif engine == "fast":
+        analyses = analyze_fast([item["text"] for item in sentences], batch_size, n_process)
+    else:
+        docs = parse_many((item["text"] for item in sentences), "verbrewrite", batch_size, n_process)
+        analyses = [doc_analyses(doc) for doc in docs]
+    for item, tokens in zip(sentences, analyses):
+        new_tokens, original_verbs = rewrite_tokens(tokens)
         problems.append(f"{item['num']}. {' '.join(new_tokens)}")
         answers.append(f"{item['num']}. {', '.join(original_verbs)}")
 
@@ -57,10 +85,25 @@ def generate_verbrewrite(sentences: List[Dict[str, str]]) -> Dict[str, str]:
         "answer": "\n".join(answers)
     }
 
+def problems_from_passage(passage: Passage, engine: str = "full") -> Dict[str, str]:
+    if not passage.sentences:
+        return {"error": "문장을 찾을 수 없습니다."}
+    if engine == "fast":
+        return generate_verbrewrite(passage.numbered(), engine="fast")
+    return generate_verbrewrite(passage.numbered(), docs=passage.docs("verbrewrite"))
+
+def problems_from_text(text: str, engine: str = "full") -> Dict[str, str]:
+    # 프로세스 풀 워커에서 실행된다 (인자와 결과만 주고받도록 문자열을 받는다)
+    return problems_from_passage(Passage(text), engine)
+
+def precomputed_key_for(passage: Passage) -> str:
+    return passage_key("verbrewrite", f"{GENERATOR_VERSION}/{model_version()}", passage.numbered())
+
 @router.post("/verbrewrite")
 async def verbrewrite_api(payload: TextPayload):
-    raw_sentences = split_paragraph_into_sentences(payload.text)
-    data = [{"num": i + 1, "text": s.strip()} for i, s in enumerate(raw_sentences)]
-    if not data:
-        return {"error": "문장을 찾을 수 없습니다."}
-    return generate_verbrewrite(data)
+    # 미리 만든 결과는 full 엔진으로 만든 것이다 (fast 는 어휘집이 틀리면 다를 수 있다)
+    if payload.engine == "full":
+        hit = lookup(precomputed_key_for(Passage(payload.text)))
+        if hit is not None:
+            return hit
+    return await nlp_pool.run("/verbrewrite", problems_from_text, payload.text, payload.engine)
@@ -1,9 +1,13 @@
 from fastapi import APIRouter
 from pydantic import BaseModel
-from typing import List
-import spacy
+from typing import List, Optional, Tuple
+from bisect import bisect_left
 
-nlp = spacy.load("en_core_web_sm")
+from api.metrics import timed
+from api.nlp import model_version, parse_many
+from api.nlp_pool import nlp_pool
+from api.precomputed import lookup, passage_key
+from api.segmenter import Passage
 
 router = APIRouter()
 
@@ -14,71 +18,115 @@ class SentenceItem(BaseModel):
 class SentencesPayload(BaseModel):
     sentences: List[SentenceItem]
 
-@router.post("/vocablanks")
-def vocablanks_api(payload: SentencesPayload):
-    return generate_vocablanks(payload.sentences)
+# 문제를 만드는 방식이 바뀌면 올린다. 결과는 spaCy 모델에 따라서도 달라지므로 키에 모델 이름도 넣는다.
+GENERATOR_VERSION = "1"
 
-def generate_vocablanks(sentences):
+@router.post("/vocablanks")
+async def vocablanks_api(payload: SentencesPayload):
+    texts = [item.text for item in payload.sentences]
+    numbers = [item.num for item in payload.sentences]
+    hit = lookup(precomputed_key_for(Passage.from_sentences(texts, numbers)))
+    if hit is not None:
+        return hit
+    return await nlp_pool.run("/vocablanks", problems_from_sentences, texts, numbers)
+
+def precomputed_key_for(passage: Passage) -> str:
+    return passage_key("vocablanks", f"{GENERATOR_VERSION}/{model_version()}", passage.numbered())
+
+def problems_from_sentences(texts: List[str], numbers: List[int]):
+    # 프로세스 풀 워커에서 실행된다
+    return problems_from_passage(Passage.from_sentences(texts, numbers))
+
+def problems_from_passage(passage: Passage):
+    items = [SentenceItem(**item) for item in passage.numbered()]
+    return generate_vocablanks(items, docs=passage.docs("vocablanks"))
+
+Candidate = Tuple[str, int, int, int]  # (답 텍스트, 시작 문자 위치, 끝 문자 위치, 토큰 번호)
+
+def collect_candidates(doc) -> List[Candidate]:
+    candidates = []
+
+    for chunk in doc.noun_chunks:
+        tokens = [t for t in chunk if t.pos_ in {"NOUN", "PROPN", "ADJ"}]
+        if tokens:
+            text = " ".join(t.text for t in tokens)
+            candidates.append((text, chunk.start_char, chunk.end_char, chunk.start))
+
+    for t in doc:
+        if t.pos_ in {"NOUN", "VERB", "ADJ", "ADV", "PROPN"} and not t.is_stop and not t.is_punct:
+            candidates.append((t.text, t.idx, t.idx + len(t.text), t.i))
+
+    return candidates
+
+def remove_overlaps(candidates: List[Candidate]) -> List[Candidate]:
+    # 토큰 번호 순으로 보면 시작 위치가 줄지 않으므로, 받아들인 구간들은 서로 겹치지 않고
+    # 시작 위치 순으로 쌓인다. 따라서 새 후보는 마지막으로 받아들인 구간의 끝과만 비교하면 된다.
+    clean_candidates = []
+    last_end = -1
+    for candidate in sorted(candidates, key=lambda x: x[3]):
+        if candidate[1] < last_end:
+            continue
+        clean_candidates.append(candidate)
+        last_end = candidate[2]
+    return clean_candidates
+
+def select_blanks(clean_candidates: List[Candidate], n_tokens: int, num_blanks: int) -> List[Candidate]:
+    spacing = n_tokens / num_blanks
+    targets = [int(spacing * i + spacing / 2) for i in range(num_blanks)]
+
+    # 남은 후보의 토큰 번호를 정렬해 두고, 목표 위치마다 bisect 로 양옆 후보만 비교한다
+    # (거리가 같으면 앞쪽 후보를 고른다)
+    by_index = {c[3]: c for c in clean_candidates}
+    available = sorted(by_index)
+    selected = []
+    for target_idx in targets:
+        if not available:
+            break
+        pos = bisect_left(available, target_idx)
+        if pos == len(available) or (pos > 0 and target_idx - available[pos - 1] <= available[pos] - target_idx):
+            pos -= 1
+        selected.append(by_index[available.pop(pos)])
+    return selected
+
+def blank_sentence(sent: str, selected: List[Candidate]) -> str:
+    pieces = []
+    cursor = 0
+    for phrase, start, end, _ in sorted(selected, key=lambda x: x[1]):
+        pieces.append(sent[cursor:start])
+        pieces.append(" ".join(["____"] * len(phrase.split())))
+        cursor = end
+    pieces.append(sent[cursor:])
+    return "".join(pieces)
+
+@timed("generator.vocablanks")
+def generate_vocablanks(
+    sentences,
+    batch_size: Optional[int] = None,
+    n_process: Optional[int] = None,
+    docs: Optional[List] = None,
+):
     blanks = []
     answers = []
 
-    for item in sentences:
+    if docs is None:
+        docs = parse_many((item.text for item in sentences), "vocablanks", batch_size, n_process)
+    for item, doc in zip(sentences, docs):
         sent = item.text
-        doc = nlp(sent)
 
         total_words = len([t for t in doc if not t.is_punct and not t.is_space])
         num_blanks = min(5, max(1, total_words // 5))
 
-        candidates = []
-
-        for chunk in doc.noun_chunks:
-            tokens = [t for t in chunk if t.pos_ in {"NOUN", "PROPN", "ADJ"}]
-            if tokens:
-                text = " ".join(t.text for t in tokens)
-                candidates.append((text, chunk.start_char, chunk.end_char, chunk.start))
-
-        for t in doc:
-            if t.pos_ in {"NOUN", "VERB", "ADJ", "ADV", "PROPN"} and not t.is_stop and not t.is_punct:
-                candidates.append((t.text, t.idx, t.idx + len(t.text), t.i))
-
-        seen_ranges = set()
-        clean_candidates = []
-        for text, start, end, idx in sorted(candidates, key=lambda x: x[3]):
-            if any((s <= start < e) or (s < end <= e) for s, e in seen_ranges):
-                continue
-            seen_ranges.add((start, end))
-            clean_candidates.append((text, start, end, idx))
+        clean_candidates = remove_overlaps(collect_candidates(doc))
 
         if not clean_candidates:
             blanks.append(f"{item.num}. {sent}")
             answers.append(f"{item.num}. (no blanks)")
             continue
 
-        spacing = len(doc) / num_blanks
-        targets = [int(spacing * i + spacing / 2) for i in range(num_blanks)]
-
-        selected = []
-        used = set()
-        for target_idx in targets:
-            closest = min(
-                (c for c in clean_candidates if c[3] not in used),
-                key=lambda x: abs(x[3] - target_idx),
-                default=None
-            )
-            if closest:
-                selected.append(closest)
-                used.add(closest[3])
+        selected = select_blanks(clean_candidates, len(doc), num_blanks)
 
         answers.append(f"{item.num}. {', '.join(x[0] for x in selected)}")
-
-        modified = sent
-        offset = 0
-        for phrase, start, end, _ in selected:
-            blank_phrase = " ".join(["____"] * len(phrase.split()))
-            modified = modified[:start - offset] + blank_phrase + modified[end - offset:]
-            offset += (end - start) - len(blank_phrase)
-
-        blanks.append(f"{item.num}. {modified.strip()}")
+        blanks.append(f"{item.num}. {blank_sentence(sent, selected).strip()}")
 
     return {
         "problem": "\n\n\n\n".join(blanks),
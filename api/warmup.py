@@ -0,0 +1,126 @@
+import asyncio
+import logging
+import os
+import time
+from typing import Dict, Optional
+
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+
+from api.metrics import Gauge
+
+router = APIRouter()
+logger = logging.getLogger(__name__)
+
+# 워커를 띄운 직후 첫 요청이 느린 것(spaCy vocab/lemmatizer 표, 정규식, Gemini TLS 연결 등이
+# 처음 쓸 때 만들어짐)을 없애기 위해, 시작할 때 짧은 지문으로 모든 생성기를 한 번씩 돌려 둔다.
+# 서버는 바로 연결을 받지만 /ready 는 준비가 끝날 때까지 503 이므로, 오토스케일러/로드밸런서는
+# /ready 를 헬스 체크로 써서 준비된 워커에만 트래픽을 보낸다.
+# Gemini 를 쓰는 유형은 비용이 들므로 실제 생성은 하지 않고 프롬프트 렌더링과 커넥션 열기까지만 한다.
+
+WARMUP = os.getenv("WARMUP", "1") != "0"
+# 미리 열어 둘 Gemini 커넥션 수 (0이면 열지 않음)
+WARMUP_GEMINI_CONNECTIONS = int(os.getenv("WARMUP_GEMINI_CONNECTIONS", "2"))
+
+WARMUP_PASSAGE = (
+    "Many people were waiting outside the museum when the doors finally opened. "
+    "The exhibition had been planned for years by a small team of curators. "
+    "Some of the paintings were being shown to the public for the first time. "
+    "Visitors moved slowly from room to room, reading every label. "
+    "A few children sat on the floor and sketched what they saw. "
+    "By the afternoon, the line outside had grown even longer."
+)
+
+READY = Gauge("workbook_ready", "1 once startup warm-up has finished and the worker accepts traffic.")
+
+def warm_local_generators(use_spacy: bool = True) -> Dict[str, float]:
+    # 이 프로세스에서 spaCy 를 쓰지 않는 생성기까지 모두 한 번씩 돌린다 (프로세스 풀 워커의 initializer 에서도 부른다).
+    # use_spacy=False 면 spaCy 를 쓰는 단계는 건너뛴다 (그 작업은 풀 워커가 하므로 부모가 모델을 들고 있을 필요가 없다).
+    # 미리 만든 결과 저장소는 거치지 않고 생성기를 직접 부른다.
+    from api import inserting, ordering, verbrewrite, vocablanks
+    from api.nlp import get_nlp
+    from api.segmenter import Passage
+    from api.verb_lexicon import get_lexicon
+
+    timings: Dict[str, float] = {}
+
+    def step(name: str, fn, *args) -> None:
+        started = time.perf_counter()
+        fn(*args)
+        timings[name] = round(time.perf_counter() - started, 3)
+
+    if use_spacy:
+        step("spacy_load", get_nlp)
+    step("ordering_table", ordering.build_composition_table)
+    step("inserting", lambda: inserting.problems_from_passage(Passage(WARMUP_PASSAGE)))
+    step("ordering", lambda: ordering.problems_from_passage(Passage(WARMUP_PASSAGE)))
+    if use_spacy:
+        step("verbrewrite", lambda: verbrewrite.problems_from_passage(Passage(WARMUP_PASSAGE)))
+        if get_lexicon() is not None:
+            step("verbrewrite_fast", lambda: verbrewrite.problems_from_passage(Passage(WARMUP_PASSAGE), "fast"))
+        step("vocablanks", lambda: vocablanks.problems_from_passage(Passage(WARMUP_PASSAGE)))
+    return timings
+
+class Readiness:
+    def __init__(self):
+        self.ready = False
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+        self.steps: Dict[str, object] = {}
+        self.error: Optional[str] = None
+
+    def mark(self, ready: bool) -> None:
+        self.ready = ready
+        READY.set(1 if ready else 0)
+
+    def status(self) -> Dict[str, object]:
+        return {
+            "ready": self.ready,
+            "warmup": WARMUP,
+            "seconds": round((self.finished or time.monotonic()) - self.started, 3) if self.started else None,
+            "steps": self.steps,
+            "error": self.error,
+        }
+
+readiness = Readiness()
+
+async def warm_up() -> None:
+    from api.generate_2224 import GEMINI_API_URL, GENERATE_TYPES, gemini, prompts, series_prompt_keys
+    from api.nlp_pool import nlp_pool
+
+    readiness.started = time.monotonic()
+    try:
+        # 프로세스 풀 워커는 initializer 에서 각자 warm_local_generators 를 돌린다
+        started = time.perf_counter()
+        await nlp_pool.start()
+        readiness.steps["nlp_pool"] = round(time.perf_counter() - started, 3)
+        if WARMUP:
+            # 풀을 쓰면 spaCy 작업(/workbook 포함)은 모두 풀 워커에서 돌므로 부모에서는 모델을 불러오지 않는다
+            readiness.steps.update(await asyncio.to_thread(warm_local_generators, nlp_pool.workers <= 0))
+            started = time.perf_counter()
+            for base_key, explanation_key in GENERATE_TYPES.values():
+                for key in series_prompt_keys(base_key, explanation_key, "batch", "cached"):
+                    prompts.render(key, {"p": WARMUP_PASSAGE})
+            readiness.steps["prompts"] = round(time.perf_counter() - started, 3)
+            if WARMUP_GEMINI_CONNECTIONS > 0:
+                # 업스트림이 잠시 안 되더라도 준비 상태는 막지 않는다 (첫 요청이 다시 연결한다)
+                started = time.perf_counter()
+                opened = await gemini.warm(GEMINI_API_URL.split("/models/")[0] + "/models", WARMUP_GEMINI_CONNECTIONS)
+                readiness.steps["gemini_connections"] = opened
+                readiness.steps["gemini"] = round(time.perf_counter() - started, 3)
+    except Exception as exc:
+        # 준비에 실패한 워커는 /ready 가 계속 503 이므로 트래픽을 받지 않는다
+        readiness.error = repr(exc)
+        logger.exception("warm-up failed")
+        return
+    finally:
+        readiness.finished = time.monotonic()
+    readiness.mark(True)
+
+@router.get("/ready")
+def ready_api():
+    # 시작 준비가 끝났더라도 프로세스 풀이 깨져 다시 만드는 중이면 트래픽을 받지 않는다
+    from api.nlp_pool import nlp_pool
+    status = readiness.status()
+    status["nlp_pool_healthy"] = nlp_pool.healthy
+    return JSONResponse(status, status_code=200 if readiness.ready and nlp_pool.healthy else 503)
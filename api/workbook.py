@@ -0,0 +1,135 @@
+import asyncio
+import json
+import os
+from typing import Dict, List, Literal
+
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+
+from api import inserting, ordering, verbrewrite, vocablanks
+from api.generate_2224 import GENERATE_TYPES, GeneratePayload, generate_with_cache
+from api.nlp_pool import nlp_pool
+from api.precomputed import lookup
+from api.segmenter import Passage
+
+router = APIRouter()
+
+# 한 요청에서 받을 수 있는 지문 수와 동시에 처리할 지문 수
+MAX_PASSAGES = int(os.getenv("WORKBOOK_MAX_PASSAGES", "100"))
+CONCURRENCY = int(os.getenv("WORKBOOK_CONCURRENCY", "4"))
+
+ProblemType = Literal["inserting", "ordering", "verbrewrite", "vocablanks", "gist", "topic", "title"]
+
+class WorkbookPayload(BaseModel):
+    passages: List[str]
+    types: List[ProblemType]
+    mode: Literal["sequential", "parallel", "batch"] = "sequential"
+    force: bool = False
+    context: Literal["inline", "cached"] = "inline"
+
+LOCAL_GENERATORS = {
+    "inserting": inserting.problems_from_passage,
+    "ordering": ordering.problems_from_passage,
+    "verbrewrite": verbrewrite.problems_from_passage,
+    "vocablanks": vocablanks.problems_from_passage,
+}
+
+# spaCy 를 쓰는 유형. 프로세스 풀이 켜져 있으면 이 유형이 든 지문의 로컬 생성을 풀에서 돌려
+# 부모 프로세스가 모델을 불러오지 않게 한다
+SPACY_TYPES = {"verbrewrite", "vocablanks"}
+
+# 기본 옵션으로 만든 결과의 precomputed 저장소 키
+PRECOMPUTED_KEYS = {
+    "inserting": inserting.precomputed_key_for,
+    "ordering": ordering.precomputed_key_for,
+    "verbrewrite": verbrewrite.precomputed_key_for,
+    "vocablanks": vocablanks.precomputed_key_for,
+}
+
+def build_local_problems(text: str, types: List[str], use_precomputed: bool = True) -> Dict[str, object]:
+    # 지문은 한 번만 나누고, spaCy 파싱도 한 번만 해서 모든 유형이 같이 쓴다.
+    # vocablanks 프로필(parser 포함)로 먼저 파싱해 두면 verbrewrite도 그 Doc을 재사용한다.
+    passage = Passage(text)
+    results: Dict[str, object] = {}
+    if use_precomputed:
+        for t in types:
+            hit = lookup(PRECOMPUTED_KEYS[t](passage))
+            if hit is not None:
+                results[t] = hit
+    remaining = [t for t in types if t not in results]
+    if "vocablanks" in remaining and "verbrewrite" in remaining:
+        passage.docs("vocablanks")
+    for t in remaining:
+        results[t] = LOCAL_GENERATORS[t](passage)
+    return {t: results[t] for t in types}
+
+async def build_passage(index: int, text: str, payload: WorkbookPayload, semaphore: asyncio.Semaphore) -> Dict[str, object]:
+    types = list(dict.fromkeys(payload.types))
+    local_types = [t for t in types if t not in GENERATE_TYPES]
+    llm_types = [t for t in types if t in GENERATE_TYPES]
+
+    async with semaphore:
+        if nlp_pool.workers > 0 and SPACY_TYPES.intersection(local_types):
+            local_job = nlp_pool.run("/workbook", build_local_problems, text, local_types)
+        else:
+            local_job = asyncio.to_thread(build_local_problems, text, local_types)
+        jobs = [local_job]
+        jobs += [
+            generate_with_cache(
+                GeneratePayload(type=t, text=text, mode=payload.mode, force=payload.force, context=payload.context)
+            )
+            for t in llm_types
+        ]
+        done = await asyncio.gather(*jobs, return_exceptions=True)
+    # 취소는 return_exceptions 로도 결과에 담겨 오므로 오류로 바꾸지 않고 그대로 올려 보낸다
+    for outcome in done:
+        if isinstance(outcome, asyncio.CancelledError):
+            raise outcome
+
+    results: Dict[str, object] = {}
+    local = done[0]
+    for t in local_types:
+        if isinstance(local, BaseException):
+            results[t] = {"error": "문제 생성에 실패했습니다.", "detail": str(local)}
+        else:
+            results[t] = local[t]
+    for t, generated in zip(llm_types, done[1:]):
+        if isinstance(generated, BaseException):
+            results[t] = {"error": "문제 생성에 실패했습니다.", "detail": str(generated)}
+        else:
+            results[t] = generated[0]
+    return {"index": index, "results": {t: results[t] for t in types}}
+
+def check_payload(payload: WorkbookPayload) -> None:
+    if len(payload.passages) > MAX_PASSAGES:
+        raise HTTPException(status_code=413, detail=f"지문은 한 번에 {MAX_PASSAGES}개까지 보낼 수 있습니다.")
+
+@router.post("/workbook/batch")
+async def workbook_batch(payload: WorkbookPayload):
+    check_payload(payload)
+    semaphore = asyncio.Semaphore(CONCURRENCY)
+    passages = await asyncio.gather(
+        *(build_passage(i, text, payload, semaphore) for i, text in enumerate(payload.passages))
+    )
+    return {"passages": passages}
+
+@router.post("/workbook/batch/stream")
+async def workbook_batch_stream(payload: WorkbookPayload):
+    check_payload(payload)
+
+    async def lines():
+        semaphore = asyncio.Semaphore(CONCURRENCY)
+        tasks = [
+            asyncio.ensure_future(build_passage(i, text, payload, semaphore))
+            for i, text in enumerate(payload.passages)
+        ]
+        try:
+            # 끝나는 순서대로 한 줄씩 내보낸다 (index 로 원래 순서를 알 수 있음)
+            for next_done in asyncio.as_completed(tasks):
+                yield json.dumps(await next_done, ensure_ascii=False) + "\n"
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
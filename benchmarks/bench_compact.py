@@ -0,0 +1,62 @@
+# /ordering, /inserting 응답 크기를 full/compact 형식과 인코딩(JSON/msgpack, 압축 없음/gzip/br)별로 비교한다.
+# 서버를 띄우지 않고 생성기와 같은 직렬화만 돌린다. msgpack/brotli 가 없으면 그 열은 건너뛴다.
+#
+#   python -m benchmarks.bench_compact --sentences 9,12 --all-positions
+
+import argparse
+import gzip
+import json
+import time
+
+from api import compact
+from api.compact import expand
+from api.inserting import compact_insertion_problems, problems_from_passage as insertion_problems
+from api.ordering import compact_order_questions, generate_all_order_questions
+from api.segmenter import Passage
+from benchmarks.corpus import LONG
+
+def encodings(data):
+    body = json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    sizes = {"json": len(body), "json+gzip": len(gzip.compress(body, compact.GZIP_LEVEL))}
+    if compact.brotli is not None:
+        sizes["json+br"] = len(compact.brotli.compress(body, quality=compact.BROTLI_QUALITY))
+    if compact.msgpack is not None:
+        packed = compact.msgpack.packb(data, use_bin_type=True)
+        sizes["msgpack"] = len(packed)
+        sizes["msgpack+gzip"] = len(gzip.compress(packed, compact.GZIP_LEVEL))
+    return sizes
+
+def timed_ms(fn, repeat=20):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best * 1e3
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sentences", default="9,12", help="passage lengths taken from the start of corpus.LONG")
+    parser.add_argument("--all-positions", action="store_true", help="inserting with all_positions=True")
+    args = parser.parse_args()
+
+    all_sentences = Passage(LONG).sentences
+    for n in (int(v) for v in args.sentences.split(",")):
+        passage = Passage(" ".join(all_sentences[:n]))
+        cases = [
+            ("ordering", lambda: generate_all_order_questions(passage.sentences),
+             lambda: compact_order_questions(passage.sentences)),
+            ("inserting", lambda: insertion_problems(passage, args.all_positions),
+             lambda: compact_insertion_problems(passage, args.all_positions)),
+        ]
+        for kind, make_full, make_compact in cases:
+            full, packed = make_full(), make_compact()
+            assert expand(packed) == full
+            print(f"{kind:9s} n={n:<3d} problems={len(full):<4d} "
+                  f"build full {timed_ms(make_full):7.2f} ms  compact {timed_ms(make_compact):7.2f} ms")
+            for name, data in (("full", full), ("compact", packed)):
+                sizes = encodings(data)
+                print("    " + f"{name:8s}" + "  ".join(f"{k} {v / 1024:8.1f} KB" for k, v in sizes.items()))
+
+if __name__ == "__main__":
+    main()
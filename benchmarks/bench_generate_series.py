@@ -0,0 +1,116 @@
+# /generate 문제 생성 체인의 종단 지연 시간을 모드별로 측정한다 (로컬 Gemini 모의 서버 사용).
+# 마지막으로 지문을 매번 보내는 방식(inline)과 cachedContents 로 한 번만 올리는 방식(cached)의
+# 업로드 바이트와 입력 토큰을 비교한다. 모의 서버도 실제 API 처럼 최소 토큰 수보다 짧은 캐시는 거절하므로,
+# 보통 길이의 지문은 cached 로 요청해도 올리지 않고(skipped) 절약도 0 으로 나온다.
+#
+#   python -m benchmarks.bench_generate_series --latency 0.5 --repeat 3
+#   python -m benchmarks.bench_generate_series --contexts inline,cached --context-passage long --cache-min-tokens 512
+#
+# 끝으로 합쳐진 생성(single-flight)을 취소한 직후 같은 요청이 새로 생성되는지 확인한다.
+
+import argparse
+import asyncio
+import os
+import statistics
+import time
+
+from benchmarks import mock_gemini
+from benchmarks.corpus import CORPUS
+
+PASSAGE = (
+    "Your behaviors are usually a reflection of your identity. What you do is an indication "
+    "of the type of person you believe that you are, either consciously or nonconsciously."
+)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.5)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--modes", default="sequential,parallel,batch")
+    parser.add_argument("--contexts", default="inline,cached")
+    parser.add_argument("--context-passage", choices=list(CORPUS), default="typical")
+    parser.add_argument("--cache-min-tokens", type=int, default=mock_gemini.app.state.cache_min_tokens,
+                        help="minimum cachedContents size for both the mock and the client (GEMINI_CACHE_MIN_TOKENS)")
+    args = parser.parse_args()
+
+    mock_gemini.app.state.cache_min_tokens = args.cache_min_tokens
+    mock_gemini.start_in_thread(args.port, args.latency)
+    os.environ["GEMINI_API_URL"] = mock_gemini.url_for(args.port)
+    os.environ["GEMINI_CACHE_MIN_TOKENS"] = str(args.cache_min_tokens)
+    from api.generate_2224 import SeriesSession, generate_problem_series
+
+    for mode in args.modes.split(","):
+        timings = []
+        calls_before = len(mock_gemini.app.state.requests)
+        for _ in range(args.repeat):
+            started = time.perf_counter()
+            asyncio.run(generate_problem_series("const", "conste", PASSAGE, mode))
+            timings.append(time.perf_counter() - started)
+        calls = (len(mock_gemini.app.state.requests) - calls_before) / args.repeat
+        print(
+            f"{mode:10s} median {statistics.median(timings):6.3f}s | "
+            f"upstream calls {calls:.0f} | {statistics.median(timings) / args.latency:.1f} round-trips"
+        )
+
+    # 스트리밍 모드: 첫 내용(토큰 조각 또는 단계 완료)이 도착하기까지의 시간
+    for stream_tokens in (False, True):
+        first = []
+        for _ in range(args.repeat):
+            first.append(asyncio.run(time_to_first_content(generate_problem_series, stream_tokens)))
+        label = "stream tokens" if stream_tokens else "stream stages"
+        print(f"{label:14s} time to first content median {statistics.median(first):6.3f}s")
+
+    # 지문 전달 방식별 업로드 크기와 입력 토큰 (모의 서버가 기록한 요청 본문 크기 기준).
+    # 제값을 내는 입력 토큰 = 입력 토큰 - 캐시에서 읽은 토큰 + 캐시를 만들 때 올린 토큰.
+    # 절약은 inline 으로 돌렸을 때의 그 값과 비교한다 (캐시 저장 비용과 캐시 토큰 할인 요금은 빼고 센다).
+    passage = CORPUS[args.context_passage]
+    baseline = None
+    for context in ["inline"] + [c for c in args.contexts.split(",") if c != "inline"]:
+        calls_before = len(mock_gemini.app.state.requests)
+        session = SeriesSession(context)
+        asyncio.run(generate_problem_series("const", "conste", passage, "sequential", session=session))
+        sent = sum(r["bytes"] for r in mock_gemini.app.state.requests[calls_before:])
+        report = session.report()
+        billed = report["input_tokens"] - report["cached_tokens"] + report["uploaded_tokens"]
+        if baseline is None:
+            baseline = billed
+        if context not in args.contexts.split(","):
+            continue
+        status = "skipped (below minimum)" if report["skipped"] else "fallback" if report["fallback"] else "ok"
+        print(
+            f"{context:10s} sent {sent:7d} bytes | input tokens {report['input_tokens']:5d} "
+            f"(cached {report['cached_tokens']}, uploaded {report['uploaded_tokens']}) | "
+            f"full-rate input {billed:5d} | saved vs inline {baseline - billed:5d} | {status}"
+        )
+
+    for context in args.contexts.split(","):
+        asyncio.run(check_cancel_rejoin(context, args.latency))
+        print(f"{context:10s} cancel then rejoin ok")
+
+async def check_cancel_rejoin(context, latency):
+    # 기다리던 요청이 모두 떠나 취소된 생성에 같은 요청이 합류하면 CancelledError 를 받는다
+    from api.generate_2224 import GeneratePayload, generate_with_cache
+
+    payload = GeneratePayload(type="gist", text=PASSAGE, force=True, context=context)
+    leader = asyncio.ensure_future(generate_with_cache(payload))
+    await asyncio.sleep(latency / 2)
+    leader.cancel()
+    await asyncio.sleep(0)
+    result, _ = await generate_with_cache(payload)
+    assert result and leader.cancelled()
+
+async def time_to_first_content(generate_problem_series, stream_tokens):
+    started = time.perf_counter()
+    first = None
+
+    async def emit(event, data):
+        nonlocal first
+        if first is None:
+            first = time.perf_counter() - started
+
+    await generate_problem_series("const", "conste", PASSAGE, "sequential", emit, stream_tokens)
+    return first
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+# 문장 삽입 문제 생성 마이크로벤치마크: 기존 구현(문제마다 문장 목록을 자르고 두 번 생성)과
+# InsertionEngine 을 50문장 지문에서 비교한다.
+#
+#   python -m benchmarks.bench_inserting --sentences 50
+
+import argparse
+import timeit
+from typing import Dict, List
+
+from api.inserting import CIRCLED, InsertionEngine, problems_from_passage
+from api.segmenter import Passage
+
+def legacy_problem(sentences: List[str], insert_index: int) -> Dict[str, str]:
+    n = len(sentences)
+    given = sentences[insert_index]
+    rest = sentences[:insert_index] + sentences[insert_index + 1:]
+    paragraph = []
+    answer = None
+    if n == 5:
+        for i in range(len(rest) + 1):
+            if i < 5:
+                paragraph.append(f"( {CIRCLED[i]} )")
+            if i < len(rest):
+                paragraph.append(rest[i])
+        answer = CIRCLED[insert_index]
+    else:
+        base = n - 6
+        insertion_points = [base + i for i in range(5)]
+        label_map = {p: CIRCLED[i] for i, p in enumerate(insertion_points)}
+        if insert_index in insertion_points:
+            answer = CIRCLED[insertion_points.index(insert_index)]
+        for i in range(len(rest) + 1):
+            if i in label_map:
+                paragraph.append(f"( {label_map[i]} )")
+            if i < len(rest):
+                paragraph.append(rest[i])
+    text = "글의 흐름으로 보아, 주어진 문장이 들어가기에 가장 적절한 곳은?\n\n" + given + "\n\n" + " ".join(paragraph)
+    return {"text": text, "answer": answer}
+
+def legacy_all(sentences: List[str]):
+    eligible = list(range(5)) if len(sentences) == 5 else [len(sentences) - 6 + i for i in range(5)]
+    return [
+        {
+            "number": i + 1,
+            "problem": legacy_problem(sentences, idx)["text"],
+            "answer": legacy_problem(sentences, idx)["answer"],
+        }
+        for i, idx in enumerate(eligible)
+    ]
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sentences", type=int, default=50)
+    parser.add_argument("--number", type=int, default=2000)
+    args = parser.parse_args()
+
+    text = " ".join(
+        f"This is sentence number {i} of a fairly typical textbook passage about habits." for i in range(args.sentences)
+    )
+    passage = Passage(text)
+    assert legacy_all(passage.sentences) == problems_from_passage(passage)
+
+    legacy = timeit.timeit(lambda: legacy_all(passage.sentences), number=args.number) / args.number
+    engine = timeit.timeit(lambda: problems_from_passage(passage), number=args.number) / args.number
+    every = timeit.timeit(lambda: problems_from_passage(passage, True), number=args.number // 10) / (args.number // 10)
+    setup = timeit.timeit(lambda: InsertionEngine(passage.sentences), number=args.number) / args.number
+
+    print(f"legacy (last 5)        {legacy * 1e6:8.1f} us")
+    print(f"engine (last 5)        {engine * 1e6:8.1f} us  x{legacy / engine:.2f}")
+    print(f"engine (all {args.sentences:3d})       {every * 1e6:8.1f} us")
+    print(f"engine skeleton only   {setup * 1e6:8.1f} us")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+# 문장 단위 nlp(...) 반복 호출과 nlp.pipe 배치 처리의 처리량(문장/초)을 비교한다.
+#
+#   python -m benchmarks.bench_nlp_pipe --sentences 40 --batch-size 64
+
+import argparse
+import time
+
+from api.nlp import PROFILES, get_nlp, parse_cache, parse_many
+
+SAMPLE = [
+    "Your behaviors are usually a reflection of your identity.",
+    "What you do is an indication of the type of person you believe that you are.",
+    "Many people were waiting outside the museum when the doors finally opened.",
+    "The experiment was designed to show how quickly habits can be formed.",
+    "Scientists have long argued that sleep plays a central role in memory.",
+]
+
+def per_sentence(texts, profile):
+    nlp = get_nlp()
+    return [nlp(t, disable=PROFILES[profile]) for t in texts]
+
+def batched(texts, profile, batch_size, n_process):
+    return list(parse_many(texts, profile, batch_size, n_process))
+
+def measure(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sentences", type=int, default=40)
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--n-process", type=int, default=1)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    texts = [SAMPLE[i % len(SAMPLE)] for i in range(args.sentences)]
+    # SAMPLE 을 되풀이하므로 파싱 캐시를 켜 두면 두 번째 반복부터 pipe 쪽이 캐시 적중만 재게 된다
+    parse_cache.max_size = 0
+    parse_cache.clear()
+    get_nlp()
+
+    for profile in PROFILES:
+        loop = measure(lambda: per_sentence(texts, profile), args.repeat)
+        pipe = measure(lambda: batched(texts, profile, args.batch_size, args.n_process), args.repeat)
+        print(
+            f"{profile:12s} loop {len(texts) / loop:8.1f} sent/s | "
+            f"pipe {len(texts) / pipe:8.1f} sent/s | x{loop / pipe:.2f}"
+        )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+# /verbrewrite 의 full 엔진(spaCy 파이프라인)과 fast 엔진(어휘집 + 모르는 문장만 spaCy)을 비교한다.
+# 문장마다 두 엔진의 문제/정답이 같은지(일치율), 어휘집만으로 처리한 문장 비율, 문장/초를 보여 준다.
+# 파싱 캐시는 끄고 잰다. 어휘집은 --lexicon 파일을 쓰거나 --train 말뭉치로 바로 만든다
+# (--train 을 평가 말뭉치와 같게 주면 일치율이 실제보다 좋게 나온다).
+# 일치율이 --min-agreement 보다 낮으면 종료 코드 1 로 끝나므로 어휘집을 배포하기 전 검사로 쓸 수 있다.
+#
+#   python -m benchmarks.bench_verbrewrite_engines --train passages_train.jsonl --corpus passages_test.jsonl
+#   python -m benchmarks.bench_verbrewrite_engines --lexicon api/data/verb_lexicon.json
+
+import argparse
+import sys
+import time
+
+from api.nlp import get_nlp, parse_cache
+from api.segmenter import Passage
+from api.verb_lexicon import (
+    VERB_LEXICON_MIN_COUNT, build_lexicon, get_lexicon, iter_texts, load_lexicon, passage_sentences, set_lexicon,
+)
+from api.verbrewrite import generate_verbrewrite
+from benchmarks.corpus import CORPUS
+
+def measure(fn, repeat):
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - started)
+    return best, result
+
+def split_sentences(results):
+    return [
+        (problem, answer)
+        for result in results
+        for problem, answer in zip(result["problem"].split("\n\n\n\n"), result["answer"].split("\n"))
+    ]
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--corpus", help="evaluation passages (*.txt directory or JSONL); default: benchmarks.corpus")
+    parser.add_argument("--train", help="build the lexicon from these passages instead of loading --lexicon")
+    parser.add_argument("--lexicon", help="lexicon JSON (default: VERB_LEXICON_PATH)")
+    parser.add_argument("--min-count", type=int, default=VERB_LEXICON_MIN_COUNT)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--show", type=int, default=5, help="print this many disagreeing sentences")
+    parser.add_argument("--min-agreement", type=float, default=0.99,
+                        help="exit with status 1 when sentence agreement is below this fraction (0: no gate)")
+    args = parser.parse_args()
+
+    texts = list(iter_texts(args.corpus)) if args.corpus else list(CORPUS.values())
+    passages = [Passage(text).numbered() for text in texts]
+    sentences = [item for numbered in passages for item in numbered]
+    get_nlp()
+
+    if args.train:
+        lexicon, stats = build_lexicon(passage_sentences(iter_texts(args.train)), args.min_count)
+        print(
+            f"lexicon: {stats['forms_kept']} forms ({stats['ambiguous']} ambiguous, "
+            f"{stats['context_dependent']} context-dependent, {stats['rare']} rare dropped)"
+        )
+        set_lexicon(lexicon)
+    elif args.lexicon:
+        set_lexicon(load_lexicon(args.lexicon))
+    lexicon = get_lexicon()
+    if lexicon is None:
+        parser.error("no lexicon for this model: pass --train or build one with python -m api.verb_lexicon")
+
+    parse_cache.max_size = 0
+    parse_cache.clear()
+
+    # API 와 같이 지문 단위로 만들고, 비교는 문장 단위로 한다
+    full_time, full = measure(lambda: [generate_verbrewrite(p) for p in passages], args.repeat)
+    fast_time, fast = measure(lambda: [generate_verbrewrite(p, engine="fast") for p in passages], args.repeat)
+    full, fast = split_sentences(full), split_sentences(fast)
+
+    tokenizer = get_nlp().tokenizer
+    covered = sum(1 for s in sentences if lexicon.analyze(tokenizer(s["text"])) is not None)
+    disagree = [(s, a, b) for s, a, b in zip(sentences, full, fast) if a != b]
+    n = len(sentences)
+    agreement = (n - len(disagree)) / n
+    print(f"{n} sentences | lexicon-only {covered / n:.1%} | agreement {agreement:.2%}")
+    print(
+        f"full {n / full_time:8.1f} sent/s | fast {n / fast_time:8.1f} sent/s | x{full_time / fast_time:.2f}"
+    )
+    for s, a, b in disagree[:args.show]:
+        print(f"- {s['text']}\n  full: {a[0]}\n  fast: {b[0]}")
+    if agreement < args.min_agreement:
+        print(f"FAIL: agreement {agreement:.2%} is below --min-agreement {args.min_agreement:.2%}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+# 빈칸 후보 선택 벤치마크: 기존 구현(겹침 검사 O(후보²), 목표마다 전체 후보 min, 오프셋 문자열 치환)과
+# remove_overlaps / select_blanks / blank_sentence 를 긴 문장의 합성 후보로 비교한다. spaCy 모델은 쓰지 않는다.
+#
+#   python -m benchmarks.bench_vocablanks --tokens 400
+
+import argparse
+import random
+import timeit
+
+from api.vocablanks import blank_sentence, remove_overlaps, select_blanks
+
+def legacy_select(candidates, n_tokens, num_blanks, sent):
+    seen_ranges = set()
+    clean_candidates = []
+    for text, start, end, idx in sorted(candidates, key=lambda x: x[3]):
+        if any((s <= start < e) or (s < end <= e) for s, e in seen_ranges):
+            continue
+        seen_ranges.add((start, end))
+        clean_candidates.append((text, start, end, idx))
+
+    spacing = n_tokens / num_blanks
+    targets = [int(spacing * i + spacing / 2) for i in range(num_blanks)]
+    selected = []
+    used = set()
+    for target_idx in targets:
+        closest = min(
+            (c for c in clean_candidates if c[3] not in used),
+            key=lambda x: abs(x[3] - target_idx),
+            default=None
+        )
+        if closest:
+            selected.append(closest)
+            used.add(closest[3])
+
+    modified = sent
+    offset = 0
+    for phrase, start, end, _ in selected:
+        blank_phrase = " ".join(["____"] * len(phrase.split()))
+        modified = modified[:start - offset] + blank_phrase + modified[end - offset:]
+        offset += (end - start) - len(blank_phrase)
+    return clean_candidates, selected, modified
+
+def new_select(candidates, n_tokens, num_blanks, sent):
+    clean_candidates = remove_overlaps(candidates)
+    selected = select_blanks(clean_candidates, n_tokens, num_blanks)
+    return clean_candidates, selected, blank_sentence(sent, selected)
+
+def synthetic(n_tokens, rng):
+    # noun_chunks 처럼 여러 토큰에 걸친 후보를 먼저, 단일 토큰 후보를 뒤에 넣는다 (실제 수집 순서와 같음)
+    words = [rng.choice(["alpha", "beta", "gamma", "delta", "epsilon"]) for _ in range(n_tokens)]
+    starts, pos = [], 0
+    for w in words:
+        starts.append(pos)
+        pos += len(w) + 1
+    sent = " ".join(words)
+    candidates = []
+    i = 0
+    while i < n_tokens:
+        size = rng.randint(1, 3)
+        if rng.random() < 0.4 and i + size <= n_tokens:
+            text = " ".join(words[i + 1:i + size]) or words[i]
+            candidates.append((text, starts[i], starts[i + size - 1] + len(words[i + size - 1]), i))
+        i += size
+    for i, w in enumerate(words):
+        if rng.random() < 0.6:
+            candidates.append((w, starts[i], starts[i] + len(w), i))
+    return sent, candidates
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tokens", type=int, default=400)
+    parser.add_argument("--number", type=int, default=50)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    for _ in range(500):
+        n = rng.randint(1, 60)
+        sent, candidates = synthetic(n, rng)
+        num_blanks = min(5, max(1, n // 5))
+        old = legacy_select(candidates, n, num_blanks, sent)
+        new = new_select(candidates, n, num_blanks, sent)
+        assert old[:2] == new[:2]
+        # 선택이 문장 순서대로일 때는 빈칸 문장도 같다 (순서가 뒤섞이면 기존 오프셋 계산이 틀어졌다)
+        if [c[1] for c in old[1]] == sorted(c[1] for c in old[1]):
+            assert old[2] == new[2]
+
+    sent, candidates = synthetic(args.tokens, rng)
+    num_blanks = 5
+    legacy = timeit.timeit(lambda: legacy_select(candidates, args.tokens, num_blanks, sent), number=args.number)
+    new = timeit.timeit(lambda: new_select(candidates, args.tokens, num_blanks, sent), number=args.number)
+    print(f"{len(candidates)} candidates over {args.tokens} tokens")
+    print(f"legacy {legacy / args.number * 1e3:8.3f} ms")
+    print(f"new    {new / args.number * 1e3:8.3f} ms  x{legacy / new:.1f}")
+
+if __name__ == "__main__":
+    main()
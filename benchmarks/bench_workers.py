@@ -0,0 +1,141 @@
+# 워커 수별 메모리(PSS)와 처리량을 잰다. serve.py(부모에서 모델을 불러 fork, copy-on-write 공유)와
+# uvicorn --workers(워커마다 모델을 따로 불러옴)를 같은 부하로 비교한다.
+# PSS 는 공유 페이지를 공유한 프로세스 수로 나눠 센 값이라 워커 하나가 실제로 차지하는 몫에 가깝다 (리눅스 전용).
+#
+#   python -m benchmarks.bench_workers --workers 1,2,4 --target verbrewrite --requests 400 --concurrency 16
+#   python -m benchmarks.bench_workers --launchers serve --workers 4 --out workers.json
+
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+from typing import Dict, List, Optional
+
+from benchmarks.corpus import CORPUS
+from benchmarks.run import free_port, http_request, run_concurrent
+
+def read_kb(pid: int, field: str) -> Optional[int]:
+    # smaps_rollup 의 Pss/Rss 값 (kB)
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            for line in f:
+                if line.startswith(field + ":"):
+                    return int(line.split()[1])
+    except (OSError, ValueError):
+        pass
+    return None
+
+def children(pid: int) -> List[int]:
+    try:
+        with open(f"/proc/{pid}/task/{pid}/children") as f:
+            return [int(p) for p in f.read().split()]
+    except OSError:
+        return []
+
+def worker_pids(parent: int, expected: int) -> List[int]:
+    # uvicorn --workers 는 multiprocessing 보조 프로세스(resource tracker 등)도 자식으로 두므로 큰 것부터 고른다
+    pids = children(parent)
+    pids.sort(key=lambda pid: read_kb(pid, "Rss") or 0, reverse=True)
+    return pids[:expected]
+
+def start(launcher: str, workers: int, port: int, args) -> subprocess.Popen:
+    if launcher == "serve":
+        command = [sys.executable, "serve.py", "--workers", str(workers), "--host", "127.0.0.1", "--port", str(port),
+                   "--log-level", "warning", "--no-access-log"]
+    else:
+        command = [sys.executable, "-m", "uvicorn", "main:app", "--workers", str(workers), "--host", "127.0.0.1",
+                   "--port", str(port), "--log-level", "warning", "--no-access-log"]
+    env = {"PARSE_CACHE_SIZE": "0", "GENERATE_CACHE_BACKEND": "off", "NLP_POOL_WORKERS": "0",
+           "WARMUP_GEMINI_CONNECTIONS": "0"}
+    return subprocess.Popen(command, env={**os.environ, **env})
+
+def wait_ready(base_url: str, process: subprocess.Popen, workers: int, timeout: float = 180.0) -> None:
+    # /ready 는 요청을 받은 워커의 상태이므로 워커 수보다 넉넉히 연속으로 200 이 나올 때까지 기다린다
+    import httpx
+
+    deadline = time.monotonic() + timeout
+    streak = 0
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"server exited with {process.returncode}")
+        try:
+            ok = httpx.get(base_url + "/ready", timeout=1.0, headers={"Connection": "close"}).status_code == 200
+        except httpx.HTTPError:
+            ok = False
+        streak = streak + 1 if ok else 0
+        if streak >= workers * 4:
+            return
+        time.sleep(0.05 if ok else 0.2)
+    raise TimeoutError(f"server at {base_url} did not become ready within {timeout}s")
+
+async def load(base_url: str, args) -> Dict[str, float]:
+    import httpx
+
+    path, body = http_request(args.target, CORPUS[args.passage], "sequential")
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60.0) as client:
+        async def call():
+            res = await client.post(path, json=body)
+            res.raise_for_status()
+        return await run_concurrent(call, args.requests, args.concurrency, args.concurrency)
+
+def measure(launcher: str, workers: int, args) -> Dict[str, object]:
+    port = free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    process = start(launcher, workers, port, args)
+    try:
+        wait_ready(base_url, process, workers)
+        result = asyncio.run(load(base_url, args))
+        # 부하를 준 뒤에 재야 요청 처리 중에 복사된 페이지까지 포함된다
+        # uvicorn 은 워커가 하나면 fork 하지 않고 그 프로세스가 직접 요청을 받는다
+        pids = worker_pids(process.pid, workers) or [process.pid]
+        pss = [read_kb(pid, "Pss") or 0 for pid in pids]
+        rss = [read_kb(pid, "Rss") or 0 for pid in pids]
+        parent_pss = read_kb(process.pid, "Pss") or 0 if process.pid not in pids else 0
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=40)
+        except subprocess.TimeoutExpired:
+            process.kill()
+    return {
+        "launcher": launcher,
+        "workers": workers,
+        **result,
+        "worker_pss_mb": round(sum(pss) / len(pss) / 1024, 1) if pss else None,
+        "worker_rss_mb": round(sum(rss) / len(rss) / 1024, 1) if rss else None,
+        "total_pss_mb": round((sum(pss) + parent_pss) / 1024, 1),
+    }
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--launchers", default="serve,uvicorn")
+    parser.add_argument("--workers", default="1,2,4")
+    parser.add_argument("--target", choices=["inserting", "ordering", "verbrewrite", "vocablanks"], default="verbrewrite")
+    parser.add_argument("--passage", choices=list(CORPUS), default="typical")
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--out")
+    args = parser.parse_args()
+
+    rows = []
+    for launcher in args.launchers.split(","):
+        for workers in (int(n) for n in args.workers.split(",")):
+            row = measure(launcher, workers, args)
+            rows.append(row)
+            print(
+                f"{launcher:8s} workers={workers:<3d} {row['throughput_rps']:8.1f} req/s  "
+                f"p50 {row['p50_ms']:8.2f}  p99 {row['p99_ms']:8.2f} ms | "
+                f"PSS/worker {row['worker_pss_mb']} MB  RSS/worker {row['worker_rss_mb']} MB  "
+                f"total PSS {row['total_pss_mb']} MB",
+                flush=True,
+            )
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump({"target": args.target, "passage": args.passage, "results": rows}, f, indent=2)
+
+if __name__ == "__main__":
+    main()
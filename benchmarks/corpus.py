@@ -0,0 +1,65 @@
+# 벤치마크용 고정 지문. 결과를 커밋 사이에 비교할 수 있도록 내용을 바꾸지 않는다
+# (바꿔야 하면 CORPUS_VERSION 을 올린다).
+
+from typing import Dict, List
+
+CORPUS_VERSION = "1"
+
+SHORT = (
+    "Your behaviors are usually a reflection of your identity. "
+    "What you do is an indication of the type of person you believe that you are. "
+    "Research has shown that once a person believes in a particular aspect of their identity, "
+    "they are more likely to act in alignment with that belief. "
+    "People who identify as athletes, for example, exercise more regularly. "
+    "Changing your habits is therefore a matter of changing your beliefs about yourself."
+)
+
+TYPICAL = (
+    "When the first public libraries opened in the nineteenth century, many critics worried about what people would read. "
+    "Novels in particular were seen as a waste of time, and some feared that they would corrupt young readers. "
+    "Librarians responded by promoting books that were thought to improve the mind. "
+    "Yet borrowing records show that readers kept choosing stories over sermons. "
+    "Over time, libraries began to accept that pleasure reading had value of its own. "
+    "It encouraged the habit of reading, which in turn led many people to more demanding texts. "
+    "Today, few librarians would question the place of fiction on their shelves. "
+    "The debate has simply moved on to newer forms of entertainment, such as video games and social media. "
+    "History suggests that these worries, too, may fade as the new media become familiar. "
+    "What seems threatening to one generation often becomes ordinary to the next."
+)
+
+LONG = " ".join([
+    "Scientists have long argued that sleep plays a central role in memory.",
+    "During the day, the brain takes in far more information than it can keep.",
+    "At night, some of that information is replayed and strengthened, while the rest is allowed to fade.",
+    "Early studies relied on asking people to learn word lists before and after a night of rest.",
+    "Those who slept remembered more words than those who stayed awake for the same period.",
+    "Critics pointed out, however, that tired participants might simply have performed worse.",
+    "To address this problem, researchers began to compare naps taken at different times of day.",
+    "The results were consistent: learning followed by sleep led to better recall.",
+    "More recent work has used recordings of brain activity to watch this process as it happens.",
+    "Patterns of firing observed while an animal explores a maze reappear while the animal sleeps.",
+    "When those patterns are disrupted, the animal has more trouble finding its way the next day.",
+    "In humans, short bursts of activity known as sleep spindles appear to be especially important.",
+    "People who produce more spindles after learning tend to remember more of what they learned.",
+    "Sounds played quietly during sleep can even strengthen specific memories.",
+    "If a tone was linked to a fact during learning, replaying the tone at night improves recall of that fact.",
+    "These findings have practical implications for students who stay up late before exams.",
+    "Cutting sleep to gain extra study time may undo much of the benefit of studying.",
+    "Teachers have also begun to ask whether school schedules should take sleep into account.",
+    "Some schools that moved their start times later reported better attendance and grades.",
+    "Not every study has found such clear effects, and the size of the benefit varies.",
+    "Still, the overall picture is that sleep is an active process rather than a simple pause.",
+    "The brain uses those hours to decide what to keep and what to discard.",
+    "Understanding this process may help people with memory problems in the future.",
+    "For now, the simplest advice remains the oldest: get a good night's rest.",
+    "Your memory, it seems, depends on it more than you might think.",
+    "Researchers continue to explore how dreams fit into this picture.",
+    "Some believe that dreams reflect the brain sorting through the day's experiences.",
+    "Others argue that dreams are a side effect with no function of their own.",
+])
+
+CORPUS: Dict[str, str] = {"short": SHORT, "typical": TYPICAL, "long": LONG}
+
+def numbered_sentences(text: str) -> List[Dict[str, object]]:
+    from api.segmenter import Passage
+    return Passage(text).numbered()
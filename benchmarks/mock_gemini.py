@@ -0,0 +1,134 @@
+# 벤치마크용 로컬 Gemini 모의 서버.
+# generateContent 요청을 받아 지정한 지연 시간 후 짧은 선택지 문장을 돌려준다.
+# cachedContents 생성/삭제도 흉내 내며, 받은 요청마다 본문 크기를 app.state.requests 에 남긴다.
+#
+#   python -m benchmarks.mock_gemini --port 8765 --latency 0.8
+#   GEMINI_API_URL=http://127.0.0.1:8765/v1beta/models/mock:generateContent uvicorn main:app
+
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import random
+import threading
+import time
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+app = FastAPI()
+
+app.state.latency = float(os.getenv("MOCK_GEMINI_LATENCY", "0.5"))
+# 이 비율만큼 generateContent 요청에 503 으로 답한다 (재시도/서킷 브레이커 확인용)
+app.state.error_rate = float(os.getenv("MOCK_GEMINI_ERROR_RATE", "0"))
+# 실제 API 처럼 이보다 적은 토큰으로 cachedContents 를 만들려 하면 400 으로 답한다
+app.state.cache_min_tokens = int(os.getenv("MOCK_GEMINI_CACHE_MIN_TOKENS", "4096"))
+app.state.requests = []
+app.state.caches = {}
+
+_counter = itertools.count(1)
+
+def mock_text(prompt: str) -> str:
+    # 오답 네 개를 한 번에 요청하는 프롬프트에는 네 줄로 답한다
+    lines = 4 if "한 줄에 하나씩" in prompt else 1
+    return "\n".join(f"mock option {next(_counter)}" for _ in range(lines))
+
+def estimate_tokens(text: str) -> int:
+    # 실제 토크나이저 대신 대략 네 글자당 한 토큰으로 센다
+    return max(1, len(text) // 4)
+
+def contents_text(body: dict) -> str:
+    return "".join(part.get("text", "") for content in body.get("contents", []) for part in content.get("parts", []))
+
+def usage_for(body: dict, reply: str, cached_tokens: int = 0) -> dict:
+    # 실제 API 와 같이 promptTokenCount 에는 캐시에서 읽은 토큰도 포함된다
+    usage = {
+        "promptTokenCount": estimate_tokens(contents_text(body)) + cached_tokens,
+        "candidatesTokenCount": estimate_tokens(reply),
+    }
+    if cached_tokens:
+        usage["cachedContentTokenCount"] = cached_tokens
+    return usage
+
+def chunk_payload(text: str, usage: dict) -> str:
+    chunk = {"candidates": [{"content": {"parts": [{"text": text}]}}], "usageMetadata": usage}
+    return "data: " + json.dumps(chunk) + "\r\n\r\n"
+
+async def stream_chunks(text: str, latency: float, usage: dict):
+    # 첫 조각은 전체 지연의 30% 뒤에, 나머지는 남은 시간 동안 고르게 나눠 보낸다
+    words = text.split(" ")
+    pieces = [" ".join(words[:1]), " " + " ".join(words[1:])] if len(words) > 1 else [text]
+    await asyncio.sleep(latency * 0.3)
+    for i, piece in enumerate(pieces):
+        if i:
+            await asyncio.sleep(latency * 0.7 / (len(pieces) - 1))
+        yield chunk_payload(piece, usage)
+
+@app.post("/v1beta/cachedContents")
+async def create_cached_content(request: Request):
+    raw = await request.body()
+    body = await request.json()
+    app.state.requests.append({"path": "cachedContents", "bytes": len(raw), "at": time.time()})
+    tokens = estimate_tokens(contents_text(body))
+    if tokens < app.state.cache_min_tokens:
+        message = (
+            f"Cached content is too small. total_token_count={tokens}, "
+            f"min_total_token_count={app.state.cache_min_tokens}"
+        )
+        return JSONResponse({"error": {"code": 400, "message": message, "status": "INVALID_ARGUMENT"}}, status_code=400)
+    name = f"cachedContents/mock-{next(_counter)}"
+    app.state.caches[name] = tokens
+    return {"name": name, "model": body.get("model"), "usageMetadata": {"totalTokenCount": tokens}}
+
+@app.delete("/v1beta/cachedContents/{cache_id}")
+async def delete_cached_content(cache_id: str):
+    app.state.requests.append({"path": "cachedContents:delete", "bytes": 0, "at": time.time()})
+    app.state.caches.pop(f"cachedContents/{cache_id}", None)
+    return {}
+
+@app.post("/v1beta/models/{model_action}")
+async def generate_content(model_action: str, request: Request):
+    raw = await request.body()
+    body = await request.json()
+    prompt = body["contents"][-1]["parts"][0]["text"]
+    app.state.requests.append({"path": model_action, "bytes": len(raw), "at": time.time()})
+    if app.state.error_rate and random.random() < app.state.error_rate:
+        await asyncio.sleep(app.state.latency)
+        return JSONResponse({"error": {"code": 503, "message": "overloaded"}}, status_code=503)
+    cached_tokens = 0
+    if body.get("cachedContent"):
+        if body["cachedContent"] not in app.state.caches:
+            return JSONResponse({"error": {"code": 404, "message": "cached content not found"}}, status_code=404)
+        cached_tokens = app.state.caches[body["cachedContent"]]
+    reply = mock_text(prompt)
+    usage = usage_for(body, reply, cached_tokens)
+    if model_action.endswith(":streamGenerateContent"):
+        return StreamingResponse(stream_chunks(reply, app.state.latency, usage), media_type="text/event-stream")
+    await asyncio.sleep(app.state.latency)
+    return {"candidates": [{"content": {"parts": [{"text": reply}]}}], "usageMetadata": usage}
+
+def start_in_thread(port: int = 8765, latency: float = 0.5) -> uvicorn.Server:
+    app.state.latency = latency
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.01)
+    return server
+
+def url_for(port: int) -> str:
+    return f"http://127.0.0.1:{port}/v1beta/models/mock:generateContent"
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.5)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--cache-min-tokens", type=int, default=app.state.cache_min_tokens)
+    args = parser.parse_args()
+    app.state.latency = args.latency
+    app.state.error_rate = args.error_rate
+    app.state.cache_min_tokens = args.cache_min_tokens
+    uvicorn.run(app, host="127.0.0.1", port=args.port, log_level="warning")
@@ -0,0 +1,289 @@
+# 고정 지문(benchmarks/corpus.py)으로 각 생성기의 처리량과 p50/p95/p99 지연 시간을 재서 JSON 으로 남긴다.
+# 같은 설정으로 커밋마다 돌린 결과 파일을 --compare 로 비교하면 회귀를 찾을 수 있다.
+# generate 는 로컬 Gemini 모의 서버(benchmarks/mock_gemini.py)를 지연 시간을 주고 띄워서 잰다.
+#
+#   python -m benchmarks.run --out before.json
+#   python -m benchmarks.run --out after.json --compare before.json --threshold 0.1
+#   python -m benchmarks.run --transport http --concurrency 8 --targets verbrewrite,vocablanks
+#
+# 기본값은 파싱 캐시와 /generate 결과 캐시를 끈 채로 잰다 (반복 측정이 캐시 적중만 재지 않도록).
+# 캐시가 켜진 상태를 재려면 --warm-caches 를 준다.
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import platform
+import socket
+import subprocess
+import sys
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+from benchmarks import mock_gemini
+from benchmarks.corpus import CORPUS, CORPUS_VERSION, numbered_sentences
+
+TARGETS = ["inserting", "ordering", "verbrewrite", "vocablanks", "generate"]
+COMPARED = ("p50_ms", "p95_ms", "p99_ms")
+
+def percentile(sorted_values: List[float], p: float) -> float:
+    # nearest-rank 방식: 표본 수가 적어도 실제로 관측된 값 하나를 돌려준다
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(p / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+def summarize(latencies: List[float], wall: float) -> Dict[str, float]:
+    values = sorted(latencies)
+    return {
+        "iterations": len(values),
+        "throughput_rps": round(len(values) / wall, 3) if wall > 0 else 0.0,
+        "mean_ms": round(sum(values) / len(values) * 1e3, 3) if values else 0.0,
+        "p50_ms": round(percentile(values, 50) * 1e3, 3),
+        "p95_ms": round(percentile(values, 95) * 1e3, 3),
+        "p99_ms": round(percentile(values, 99) * 1e3, 3),
+        "max_ms": round(values[-1] * 1e3, 3) if values else 0.0,
+    }
+
+# ---------------------------------------------------------------- in-process
+
+def inprocess_call(target: str, text: str, generate_mode: str) -> Callable:
+    # 엔드포인트가 하는 전처리(문장 분리 등)는 미리 해 두고 생성기 호출만 잰다
+    if target == "inserting":
+        from api.inserting import generate_all_insertion_problems
+        return lambda: generate_all_insertion_problems(text)
+    if target == "ordering":
+        from api.ordering import generate_all_order_questions
+        from api.segmenter import split_paragraph_into_sentences
+        sentences = split_paragraph_into_sentences(text)
+        return lambda: generate_all_order_questions(sentences)
+    if target == "verbrewrite":
+        from api.verbrewrite import generate_verbrewrite
+        numbered = numbered_sentences(text)
+        return lambda: generate_verbrewrite(numbered)
+    if target == "vocablanks":
+        from api.vocablanks import SentenceItem, generate_vocablanks
+        items = [SentenceItem(**item) for item in numbered_sentences(text)]
+        return lambda: generate_vocablanks(items)
+    if target == "generate":
+        from api.generate_2224 import GENERATE_TYPES, generate_problem_series
+        base_key, explanation_key = GENERATE_TYPES["gist"]
+        return lambda: generate_problem_series(base_key, explanation_key, text, generate_mode)
+    raise ValueError(f"unknown target: {target}")
+
+def run_sync(fn: Callable, iterations: int, warmup: int) -> Dict[str, float]:
+    for _ in range(warmup):
+        fn()
+    latencies = []
+    started = time.perf_counter()
+    for _ in range(iterations):
+        t0 = time.perf_counter()
+        fn()
+        latencies.append(time.perf_counter() - t0)
+    return summarize(latencies, time.perf_counter() - started)
+
+async def run_concurrent(call, iterations: int, warmup: int, concurrency: int) -> Dict[str, float]:
+    # call 은 한 번의 요청을 보내는 코루틴 함수. concurrency 개의 작업자가 iterations 번을 나눠 보낸다.
+    for _ in range(warmup):
+        await call()
+    latencies: List[float] = []
+    remaining = iterations
+
+    async def worker():
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            t0 = time.perf_counter()
+            await call()
+            latencies.append(time.perf_counter() - t0)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(max(1, concurrency))))
+    return summarize(latencies, time.perf_counter() - started)
+
+def run_inprocess(target: str, text: str, args) -> Dict[str, float]:
+    fn = inprocess_call(target, text, args.generate_mode)
+    if target == "generate":
+        return asyncio.run(run_concurrent(fn, args.generate_iterations, args.warmup, args.concurrency))
+    return run_sync(fn, args.iterations, args.warmup)
+
+# ---------------------------------------------------------------- HTTP
+
+def http_request(target: str, text: str, generate_mode: str) -> Tuple[str, Dict]:
+    if target == "vocablanks":
+        return "/vocablanks", {"sentences": numbered_sentences(text)}
+    if target == "generate":
+        # force 로 결과 캐시를 건너뛰어 매번 Gemini 호출 체인을 거치게 한다
+        return "/generate", {"type": "gist", "text": text, "mode": generate_mode, "force": True}
+    return f"/{target}", {"text": text}
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def start_server(port: int, env: Dict[str, str]) -> subprocess.Popen:
+    command = [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port),
+               "--log-level", "warning"]
+    return subprocess.Popen(command, env={**os.environ, **env})
+
+def wait_until_up(base_url: str, process: subprocess.Popen, timeout: float = 120.0) -> None:
+    import httpx
+
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"server exited with {process.returncode}")
+        try:
+            # /ready 는 시작 시 준비(모델 로드, 생성기 한 번씩 실행)가 끝나야 200 이 된다
+            if httpx.get(base_url + "/ready", timeout=1.0).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise TimeoutError(f"server at {base_url} did not come up within {timeout}s")
+
+async def run_http_target(base_url: str, target: str, text: str, args) -> Dict[str, float]:
+    import httpx
+
+    path, body = http_request(target, text, args.generate_mode)
+    iterations = args.generate_iterations if target == "generate" else args.iterations
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=300.0) as client:
+        async def call():
+            response = await client.post(path, json=body)
+            response.raise_for_status()
+
+        # 첫 요청에서 spaCy 모델을 불러오므로 측정 전에 한 번은 꼭 보낸다
+        await call()
+        return await run_concurrent(call, iterations, args.warmup, args.concurrency)
+
+# ---------------------------------------------------------------- 결과 파일
+
+def git_revision() -> Dict[str, Optional[str]]:
+    def git(*argv):
+        try:
+            return subprocess.run(["git", *argv], capture_output=True, text=True, check=True).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+
+    status = git("status", "--porcelain", "--untracked-files=no")
+    return {"commit": git("rev-parse", "HEAD"), "dirty": bool(status) if status is not None else None}
+
+def compare(results: List[Dict], baseline: Dict, threshold: float) -> List[str]:
+    # 같은 (대상, 지문, 전송 방식, 동시성) 끼리 비교해 threshold 비율 이상 느려진 지표를 돌려준다
+    def key(row):
+        return row["target"], row["passage"], row["transport"], row["concurrency"]
+
+    before = {key(row): row for row in baseline.get("results", [])}
+    regressions = []
+    for row in results:
+        old = before.get(key(row))
+        if old is None:
+            continue
+        for metric in COMPARED:
+            if old[metric] > 0 and row[metric] > old[metric] * (1 + threshold):
+                regressions.append(
+                    f"{'/'.join(map(str, key(row)))} {metric}: {old[metric]:.3f} -> {row[metric]:.3f} ms "
+                    f"(+{(row[metric] / old[metric] - 1) * 100:.0f}%)"
+                )
+    return regressions
+
+def print_row(row: Dict) -> None:
+    print(
+        f"{row['transport']:9s} {row['target']:12s} {row['passage']:8s} c={row['concurrency']:<3d} "
+        f"{row['throughput_rps']:10.1f} req/s  p50 {row['p50_ms']:9.3f}  p95 {row['p95_ms']:9.3f}  "
+        f"p99 {row['p99_ms']:9.3f} ms"
+    )
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--targets", default=",".join(TARGETS))
+    parser.add_argument("--passages", default=",".join(CORPUS))
+    parser.add_argument("--transport", choices=["inprocess", "http", "both"], default="inprocess")
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--generate-iterations", type=int, default=10)
+    parser.add_argument("--warmup", type=int, default=3)
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--generate-mode", choices=["sequential", "parallel", "batch"], default="sequential")
+    parser.add_argument("--gemini-latency", type=float, default=0.05)
+    parser.add_argument("--gemini-port", type=int, default=0)
+    parser.add_argument("--warm-caches", action="store_true")
+    parser.add_argument("--out")
+    parser.add_argument("--compare", help="baseline JSON written by an earlier run")
+    parser.add_argument("--threshold", type=float, default=0.10)
+    args = parser.parse_args()
+
+    targets = [t for t in args.targets.split(",") if t]
+    passages = [p for p in args.passages.split(",") if p]
+    transports = ["inprocess", "http"] if args.transport == "both" else [args.transport]
+
+    gemini_port = args.gemini_port or free_port()
+    mock_gemini.start_in_thread(gemini_port, args.gemini_latency)
+    env = {"GEMINI_API_URL": mock_gemini.url_for(gemini_port), "GEMINI_API_KEY": "bench"}
+    if not args.warm_caches:
+        env.update({"PARSE_CACHE_SIZE": "0", "PARSE_CACHE_PATH": "", "GENERATE_CACHE_BACKEND": "off"})
+    # api 모듈은 import 시점에 환경 변수를 읽으므로 측정 대상을 불러오기 전에 설정한다
+    os.environ.update(env)
+
+    results = []
+    for transport in transports:
+        server = None
+        base_url = None
+        if transport == "http":
+            port = free_port()
+            base_url = f"http://127.0.0.1:{port}"
+            server = start_server(port, env)
+        try:
+            if server is not None:
+                wait_until_up(base_url, server)
+            for target in targets:
+                for name in passages:
+                    text = CORPUS[name]
+                    if transport == "http":
+                        stats = asyncio.run(run_http_target(base_url, target, text, args))
+                    else:
+                        stats = run_inprocess(target, text, args)
+                    row = {
+                        "target": target,
+                        "passage": name,
+                        "transport": transport,
+                        "concurrency": args.concurrency if transport == "http" or target == "generate" else 1,
+                        **stats,
+                    }
+                    results.append(row)
+                    print_row(row)
+        finally:
+            if server is not None:
+                server.terminate()
+                server.wait(timeout=30)
+
+    report = {
+        "meta": {
+            "corpus_version": CORPUS_VERSION,
+            **git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "spacy_model": os.getenv("SPACY_MODEL", "en_core_web_sm"),
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "args": vars(args),
+            "gemini_upstream_calls": len(mock_gemini.app.state.requests),
+        },
+        "results": results,
+    }
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        for line in regressions:
+            print("REGRESSION", line)
+        if regressions:
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
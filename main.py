@@ -1,4 +1,8 @@
-from fastapi import FastAPI
+import asyncio
+import time
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 
 # 각 워크북 API 라우터 불러오기
@@ -6,11 +10,28 @@ from api.inserting import router as inserting_router
 from api.ordering import router as ordering_router
 from api.verbrewrite import router as verbrewrite_router
 from api.vocablanks import router as vocablanks_router
-from api.generate_2224 import router as gen2224_router
+from api.generate_2224 import router as gen2224_router, gemini
+from api.nlp import router as nlp_router
+from api.nlp_pool import nlp_pool
+from api.workbook import router as workbook_router
+from api.warmup import readiness, router as warmup_router, warm_up
+from api.metrics import REQUEST_SECONDS, router as metrics_router
 
 # 앞으로 추가될 유형들도 여기에 계속 include 하면 됨
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # 연결은 바로 받되, spaCy 프로세스 풀/생성기/Gemini 커넥션 준비는 뒤에서 하고 끝나면 /ready 가 200 이 된다
+    warming = asyncio.create_task(warm_up())
+    yield
+    # 종료 중인 워커로 트래픽이 오지 않도록 먼저 준비 상태를 내린다
+    readiness.mark(False)
+    warming.cancel()
+    # Gemini 커넥션 풀 정리
+    await gemini.aclose()
+    nlp_pool.shutdown()
+
+app = FastAPI(lifespan=lifespan)
 
 # CORS 설정 - 티스토리에서 호출할 수 있도록 허용
 app.add_middleware(
@@ -27,3 +48,25 @@ app.include_router(ordering_router)
 app.include_router(verbrewrite_router)
 app.include_router(vocablanks_router)
 app.include_router(gen2224_router)
+app.include_router(workbook_router)
+app.include_router(nlp_router)
+app.include_router(metrics_router)
+app.include_router(warmup_router)
+
+# 라우트별 요청 지연 시간 기록 (스트리밍 응답은 헤더를 보낼 때까지의 시간)
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    started = time.perf_counter()
+    status = "500"
+    try:
+        response = await call_next(request)
+        status = str(response.status_code)
+        return response
+    finally:
+        route = request.scope.get("route")
+        REQUEST_SECONDS.observe(
+            time.perf_counter() - started,
+            method=request.method,
+            route=route.path if route is not None else "unmatched",
+            status=status,
+        )
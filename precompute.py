@@ -0,0 +1,163 @@
+# 자주 쓰이는 지문 모음(교과서/모의고사 등)을 미리 모든 유형의 문제로 만들어 저장소에 넣는다.
+# 저장소는 zlib 으로 압축한 JSON 을 담는 SQLite 파일이고, API 는 PRECOMPUTED_PATH 로 같은 파일을 가리키면
+# 해시가 맞는 요청에 생성 없이 바로 답한다 (api/precomputed.py).
+# 키에 지문 내용과 생성기/템플릿 버전이 들어가므로, 다시 돌리면 아직 없거나 바뀐 것만 새로 만든다.
+# 지문 하나가 끝날 때마다 저장하므로 중간에 멈춰도 이어서 돌릴 수 있다.
+#
+#   python precompute.py passages/ --store precomputed.sqlite3          # 디렉터리의 *.txt
+#   python precompute.py passages.jsonl --types inserting,ordering,gist  # 한 줄에 {"id": ..., "text": ...}
+#   PRECOMPUTED_PATH=precomputed.sqlite3 uvicorn main:app
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Dict, Iterator, List, Tuple
+
+from api.generate_2224 import (
+    GENERATE_TYPES, GeneratePayload, SeriesSession, gemini, generate_cache_key, generate_problem_series,
+)
+from api.nlp_pool import init_worker
+from api.precomputed import PrecomputedStore
+from api.segmenter import Passage
+from api.workbook import LOCAL_GENERATORS, PRECOMPUTED_KEYS, build_local_problems
+
+ALL_TYPES = list(LOCAL_GENERATORS) + list(GENERATE_TYPES)
+
+def load_passages(source: str) -> Iterator[Tuple[str, str]]:
+    # (지문 id, 본문) 을 돌려준다. 디렉터리면 *.txt 파일 하나가 지문 하나, 아니면 JSONL 한 줄이 지문 하나.
+    if os.path.isdir(source):
+        for name in sorted(os.listdir(source)):
+            if name.endswith(".txt"):
+                with open(os.path.join(source, name), encoding="utf-8") as f:
+                    yield name, f.read()
+        return
+    with open(source, encoding="utf-8") as f:
+        for lineno, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            yield str(item.get("id") or f"{os.path.basename(source)}:{lineno}"), item["text"]
+
+def passage_keys(text: str, types: List[str], mode: str, context: str) -> Dict[str, str]:
+    # API 가 같은 지문을 받았을 때 찾는 키와 같아야 한다
+    passage = Passage(text)
+    keys = {}
+    for t in types:
+        if t in GENERATE_TYPES:
+            keys[t] = generate_cache_key(GeneratePayload(type=t, text=text, mode=mode, context=context))
+        else:
+            keys[t] = PRECOMPUTED_KEYS[t](passage)
+    return keys
+
+async def generate_one(problem_type: str, text: str, mode: str, context: str) -> Dict[str, object]:
+    base_key, explanation_key = GENERATE_TYPES[problem_type]
+    return await generate_problem_series(
+        base_key, explanation_key, text, mode, session=SeriesSession(context)
+    )
+
+async def precompute_passage(
+    text: str,
+    args: argparse.Namespace,
+    store: PrecomputedStore,
+    executor: Executor,
+    semaphore: asyncio.Semaphore,
+) -> Tuple[str, List[str], List[str]]:
+    keys = passage_keys(text, args.types, args.mode, args.context)
+    missing = store.missing(keys.values())
+    todo = [t for t in args.types if keys[t] in missing]
+    if not todo:
+        return "skipped", [], []
+
+    local = [t for t in todo if t in LOCAL_GENERATORS]
+    llm = [t for t in todo if t in GENERATE_TYPES]
+    async with semaphore:
+        jobs = []
+        if local:
+            # spaCy 작업은 프로세스 풀에서, Gemini 호출은 이벤트 루프에서 함께 돌린다
+            loop = asyncio.get_running_loop()
+            jobs.append(loop.run_in_executor(executor, build_local_problems, text, local, False))
+        jobs += [generate_one(t, text, args.mode, args.context) for t in llm]
+        done = await asyncio.gather(*jobs, return_exceptions=True)
+
+    results: Dict[str, object] = {}
+    failed: List[str] = []
+    if local:
+        local_done = done.pop(0)
+        if isinstance(local_done, Exception):
+            failed += local
+        else:
+            results.update(local_done)
+    for t, generated in zip(llm, done):
+        if isinstance(generated, Exception):
+            failed.append(t)
+        else:
+            results[t] = generated
+
+    for t, value in results.items():
+        store.put(keys[t], t, value)
+    # 실패한 유형은 저장하지 않았으므로 다음 실행에서 다시 만든다
+    store.commit()
+    return ("failed" if failed else "done"), list(results), failed
+
+def make_executor(workers: int) -> Executor:
+    if workers <= 0:
+        return ThreadPoolExecutor(max_workers=1)
+    return ProcessPoolExecutor(
+        max_workers=workers, mp_context=multiprocessing.get_context("spawn"), initializer=init_worker
+    )
+
+async def run(args: argparse.Namespace) -> int:
+    store = PrecomputedStore(args.store)
+    executor = make_executor(args.workers)
+    semaphore = asyncio.Semaphore(args.concurrency)
+    counts = {"done": 0, "skipped": 0, "failed": 0}
+    started = time.perf_counter()
+
+    async def one(passage_id: str, text: str) -> None:
+        status, made, failed = await precompute_passage(text, args, store, executor, semaphore)
+        counts[status] += 1
+        if status != "skipped" or args.verbose:
+            detail = f" made {','.join(made)}" if made else ""
+            detail += f" failed {','.join(failed)}" if failed else ""
+            print(f"{passage_id}: {status}{detail}", flush=True)
+
+    try:
+        await asyncio.gather(*(one(passage_id, text) for passage_id, text in load_passages(args.input)))
+    finally:
+        executor.shutdown(wait=True)
+        await gemini.aclose()
+        stats = store.stats()
+        store.close()
+
+    elapsed = time.perf_counter() - started
+    print(
+        f"{counts['done']} computed, {counts['skipped']} unchanged, {counts['failed']} with failures "
+        f"in {elapsed:.1f}s | store {stats['size']} entries, {stats['bytes'] / 1024:.0f} KB"
+    )
+    return 1 if counts["failed"] else 0
+
+def main():
+    parser = argparse.ArgumentParser(description="Pregenerate workbook problems for a passage corpus.")
+    parser.add_argument("input", help="directory of *.txt passages or a JSONL file with {id, text} per line")
+    parser.add_argument("--store", default=os.getenv("PRECOMPUTED_PATH", "precomputed.sqlite3"))
+    parser.add_argument("--types", default=",".join(ALL_TYPES))
+    parser.add_argument("--mode", choices=["sequential", "parallel", "batch"], default="sequential")
+    parser.add_argument("--context", choices=["inline", "cached"], default="inline")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="spaCy processes (0: one thread)")
+    parser.add_argument("--concurrency", type=int, default=4, help="passages processed at the same time")
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+
+    args.types = [t for t in args.types.split(",") if t]
+    unknown = [t for t in args.types if t not in ALL_TYPES]
+    if unknown:
+        parser.error(f"unknown types: {', '.join(unknown)}")
+    sys.exit(asyncio.run(run(args)))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+# 여러 워커로 API 를 띄우는 실행 진입점 (pre-fork).
+# 부모 프로세스가 spaCy 모델을 불러 생성기를 한 번씩 돌려 둔 뒤 gc.freeze() 로 그 객체들을 GC 대상에서 빼고,
+# 소켓을 열어 둔 채로 워커를 fork 한다. 워커들은 모델 메모리를 copy-on-write 로 공유하고 같은 소켓에서 accept 한다
+# (uvicorn --workers 는 워커마다 모델을 따로 불러 워커 수만큼 메모리를 쓴다).
+#
+#   python serve.py --workers 4 --port 8000 --limit-concurrency 64
+#   kill -HUP <부모 pid>    # 워커를 하나씩 새로 띄우고 기존 워커는 처리 중인 요청을 끝낸 뒤 내린다
+#   kill -TERM <부모 pid>   # 모든 워커를 graceful 하게 내리고 끝낸다
+#
+# 워커가 곧 병렬 처리 단위이므로 spaCy 프로세스 풀은 기본으로 끈다 (NLP_POOL_WORKERS=0, 스레드에서 실행).
+# 풀을 켜려면 NLP_POOL_WORKERS 와 함께 NLP_POOL_START_METHOD=fork 를 주어야 풀 워커도 모델을 공유한다.
+# HUP 은 워커만 바꾸므로 코드/모델 변경을 반영하려면 부모를 다시 시작한다.
+# 지표(/metrics)는 워커마다 따로 모인다. SQLite 연결(결과 캐시, 미리 만든 결과 저장소)은 부모의 것을
+# 물려 쓰지 않고 워커마다 처음 쓸 때 새로 연다 (api/result_cache.py 의 SQLiteConnection).
+
+import argparse
+import gc
+import os
+import signal
+import socket
+import sys
+import time
+from typing import Dict, Optional
+
+os.environ.setdefault("NLP_POOL_WORKERS", "0")
+
+def bind_socket(host: str, port: int, backlog: int) -> socket.socket:
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+def preload() -> None:
+    # 워커가 물려받을 것들을 부모에서 미리 만들어 둔다 (모델, 분할 표, 정규식/lemmatizer 표 등)
+    from api.warmup import WARMUP, warm_local_generators
+    from api.nlp import get_nlp
+    if WARMUP:
+        warm_local_generators()
+    else:
+        get_nlp()
+    # 지금 있는 객체를 GC 가 훑지 않게 해 워커에서 참조 정보가 바뀌며 페이지가 복사되는 것을 줄인다
+    gc.collect()
+    gc.freeze()
+
+class Supervisor:
+    def __init__(self, app, sock: socket.socket, args: argparse.Namespace):
+        self.app = app
+        self.sock = sock
+        self.args = args
+        self.workers: Dict[int, float] = {}  # pid -> 시작 시각
+        self.retiring: Dict[int, float] = {}  # HUP 으로 내리는 중인 pid -> TERM 보낸 시각
+        self.stopping = False
+        self.reload_requested = False
+
+    def spawn(self) -> int:
+        pid = os.fork()
+        if pid == 0:
+            self._run_worker()
+        self.workers[pid] = time.monotonic()
+        return pid
+
+    def _run_worker(self) -> None:
+        import uvicorn
+
+        # 부모의 신호 처리기를 지우고 uvicorn 의 처리기(TERM/INT 에 graceful shutdown)를 쓴다
+        for sig in (signal.SIGHUP, signal.SIGTERM, signal.SIGINT, signal.SIGCHLD):
+            signal.signal(sig, signal.SIG_DFL)
+        config = uvicorn.Config(
+            self.app,
+            limit_concurrency=self.args.limit_concurrency or None,
+            limit_max_requests=self.args.max_requests or None,
+            timeout_keep_alive=self.args.keep_alive,
+            timeout_graceful_shutdown=self.args.graceful_timeout,
+            log_level=self.args.log_level,
+            access_log=self.args.access_log,
+        )
+        code = 0
+        try:
+            uvicorn.Server(config).run(sockets=[self.sock])
+        except BaseException:
+            code = 1
+        finally:
+            os._exit(code)
+
+    def reap(self) -> None:
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            started = self.workers.pop(pid, None)
+            if self.retiring.pop(pid, None) is not None or self.stopping:
+                continue
+            if started is not None:
+                # --max-requests 로 끝났거나 죽은 워커는 새로 띄운다 (바로 죽기를 반복하면 잠깐 쉰다)
+                code = os.waitstatus_to_exitcode(status)
+                print(f"worker {pid} exited ({code}), respawning", file=sys.stderr, flush=True)
+                if time.monotonic() - started < 1.0:
+                    time.sleep(1.0)
+                self.spawn()
+
+    def reload(self) -> None:
+        # 새 워커를 먼저 띄우고 기존 워커에 TERM 을 보내 하나씩 교체한다 (교체 중에도 소켓은 계속 열려 있다)
+        for pid in list(self.workers):
+            if pid in self.retiring:
+                continue
+            self.spawn()
+            time.sleep(self.args.reload_interval)
+            self.retiring[pid] = time.monotonic()
+            self._kill(pid, signal.SIGTERM)
+
+    def _kill(self, pid: int, sig: int) -> None:
+        try:
+            os.kill(pid, sig)
+        except ProcessLookupError:
+            pass
+
+    def enforce_graceful_timeout(self) -> None:
+        deadline = self.args.graceful_timeout + 5
+        now = time.monotonic()
+        for pid, since in list(self.retiring.items()):
+            if now - since > deadline:
+                self._kill(pid, signal.SIGKILL)
+
+    def stop(self) -> None:
+        self.stopping = True
+        for pid in list(self.workers):
+            self._kill(pid, signal.SIGTERM)
+        deadline = time.monotonic() + self.args.graceful_timeout + 5
+        while self.workers and time.monotonic() < deadline:
+            self.reap()
+            time.sleep(0.1)
+        for pid in list(self.workers):
+            self._kill(pid, signal.SIGKILL)
+
+    def run(self) -> None:
+        signal.signal(signal.SIGHUP, lambda *_: setattr(self, "reload_requested", True))
+        signal.signal(signal.SIGTERM, lambda *_: setattr(self, "stopping", True))
+        signal.signal(signal.SIGINT, lambda *_: setattr(self, "stopping", True))
+        for _ in range(self.args.workers):
+            self.spawn()
+        print(
+            f"serving on {self.args.host}:{self.args.port} with {self.args.workers} workers "
+            f"(parent {os.getpid()})", file=sys.stderr, flush=True,
+        )
+        while not self.stopping:
+            if self.reload_requested:
+                self.reload_requested = False
+                self.reload()
+            self.reap()
+            self.enforce_graceful_timeout()
+            time.sleep(0.2)
+        self.stop()
+
+def main(argv: Optional[list] = None):
+    parser = argparse.ArgumentParser(description="Pre-fork launcher: load models once, then fork API workers.")
+    parser.add_argument("--host", default=os.getenv("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", "8000")))
+    parser.add_argument("--workers", type=int, default=int(os.getenv("WEB_CONCURRENCY", str(os.cpu_count() or 1))))
+    parser.add_argument("--limit-concurrency", type=int, default=int(os.getenv("WORKER_LIMIT_CONCURRENCY", "0")),
+                        help="max concurrent connections per worker before answering 503 (0: unlimited)")
+    parser.add_argument("--max-requests", type=int, default=int(os.getenv("WORKER_MAX_REQUESTS", "0")),
+                        help="recycle a worker after this many requests (0: never)")
+    parser.add_argument("--backlog", type=int, default=2048)
+    parser.add_argument("--keep-alive", type=int, default=5)
+    parser.add_argument("--graceful-timeout", type=int, default=30,
+                        help="seconds a stopping worker gets to finish in-flight requests")
+    parser.add_argument("--reload-interval", type=float, default=1.0,
+                        help="seconds between replacing workers on SIGHUP")
+    parser.add_argument("--log-level", default="info")
+    parser.add_argument("--no-access-log", dest="access_log", action="store_false")
+    args = parser.parse_args(argv)
+
+    from main import app
+    preload()
+    sock = bind_socket(args.host, args.port, args.backlog)
+    Supervisor(app, sock, args).run()
+
+if __name__ == "__main__":
+    main()